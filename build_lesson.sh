@@ -38,12 +38,23 @@ if [ -f "../../.env" ]; then
     export $(cat ../../.env | grep -v '^#' | xargs)
 fi
 
+# Manim 渲染质量对应的输出目录（MANIM_QUALITY=l 为 480p15 预览）
+case "${MANIM_QUALITY:-h}" in
+    l) QUALITY_DIR="480p15" ;;
+    m) QUALITY_DIR="720p30" ;;
+    p) QUALITY_DIR="1440p60" ;;
+    k) QUALITY_DIR="2160p60" ;;
+    *) QUALITY_DIR="1080p60" ;;
+esac
+# 成品文件名中的分辨率（与 lessonflow post 按视频高度命名一致）
+VIDEO_LABEL="${QUALITY_DIR%%p*}p"
+
 # Step 1-3: 已完成（Planner, Animator, Builder）
 echo -e "${GREEN}✅ [1-3/6] 策划+代码+渲染 - 已完成${NC}"
 echo "   - outline.md"
 echo "   - storyboard.json"
 echo "   - scenes/*.py"
-echo "   - media/videos/full_animation/1080p60/*.mp4"
+echo "   - media/videos/full_animation/${QUALITY_DIR}/*.mp4"
 echo ""
 
 # Step 4: 生成配音字幕文本（不需要实际TTS，用文本描述代替）
@@ -51,64 +62,60 @@ echo -e "${YELLOW}[4/6] 📝 生成字幕文本...${NC}"
 mkdir -p subs
 mkdir -p audio
 
-# 从 storyboard 提取旁白文本
+# 从 storyboard 提取旁白文本，有配音时间戳时按字级时间戳对齐
 python3 << 'EOF'
 import json
 from pathlib import Path
 
-with open('storyboard.json', 'r', encoding='utf-8') as f:
-    data = json.load(f)
+from lessonflow.audio import lesson_slots
+from lessonflow.storyboard import Storyboard
+from lessonflow.subtitles import align_cues, estimate_timestamps, offset_cues, write_srt, write_vtt
+
+storyboard = Storyboard.load('storyboard.json')
+
+# 有配音时字幕与整课旁白音轨（lessonflow audio --video-timeline）使用同一组场景时间槽
+try:
+    slots = {slot.scene_id: slot for slot in lesson_slots(Path('.'), storyboard, video_timeline=True)}
+except RuntimeError:
+    slots = {}
+
+glossary = None
+if Path('glossary.json').exists():
+    with open('glossary.json', 'r', encoding='utf-8') as f:
+        glossary = json.load(f)
+
+# 各场景字幕（场景内相对时间）与场景起始时间
+scene_cues = []
+
+for scene in storyboard.scenes:
+    text = scene.narration.vo_text
+    duration = scene.duration_s
+
+    timestamps = []
+    timestamps_path = Path('audio') / f"{scene.id}.timestamps.json"
+    if timestamps_path.exists():
+        with open(timestamps_path, 'r', encoding='utf-8') as f:
+            timestamps = json.load(f).get('subtitles', [])
+    if not timestamps:
+        timestamps = estimate_timestamps(text, duration)
+    elif scene.id in slots:
+        # 换算到场景时间（前置停顿、加速），超出场景的配音已被截断
+        slot = slots[scene.id]
+        timestamps = [
+            {
+                **stamp,
+                'begin_time': round(min(slot.map_time(stamp['begin_time'] / 1000), duration) * 1000),
+                'end_time': round(min(slot.map_time(stamp['end_time'] / 1000), duration) * 1000),
+            }
+            for stamp in timestamps
+        ]
+
+    cues = list(align_cues(text, timestamps, total_duration_s=duration, glossary=glossary))
+    scene_cues.append((scene.start_s, cues))
 
 # 生成合并字幕文件
-subs_dir = Path('subs')
-subs_dir.mkdir(exist_ok=True)
-
-full_srt = subs_dir / 'full_lesson.srt'
-full_vtt = subs_dir / 'full_lesson.vtt'
-
-# SRT 格式
-with open(full_srt, 'w', encoding='utf-8') as srt:
-    idx = 1
-    current_time = 0
-    
-    for scene in data.get('scenes', []):
-        narration = scene.get('narration', {})
-        text = narration.get('text', '')
-        duration = scene.get('duration', 30)
-        
-        if not text:
-            current_time += duration
-            continue
-        
-        # 简单分句
-        sentences = text.replace('。', '。\n').strip().split('\n')
-        sentence_duration = duration / len(sentences)
-        
-        for sentence in sentences:
-            if not sentence.strip():
-                continue
-            
-            start_ms = int(current_time * 1000)
-            end_ms = int((current_time + sentence_duration) * 1000)
-            
-            start_time = f"{start_ms//3600000:02d}:{(start_ms%3600000)//60000:02d}:{(start_ms%60000)//1000:02d},{start_ms%1000:03d}"
-            end_time = f"{end_ms//3600000:02d}:{(end_ms%3600000)//60000:02d}:{(end_ms%60000)//1000:02d},{end_ms%1000:03d}"
-            
-            srt.write(f"{idx}\n")
-            srt.write(f"{start_time} --> {end_time}\n")
-            srt.write(f"{sentence.strip()}\n\n")
-            
-            idx += 1
-            current_time += sentence_duration
-
-# VTT 格式
-with open(full_vtt, 'w', encoding='utf-8') as vtt:
-    vtt.write("WEBVTT\n\n")
-    with open(full_srt, 'r', encoding='utf-8') as srt:
-        content = srt.read()
-        # 转换时间戳格式 (,→.)
-        content = content.replace(',', '.')
-        vtt.write(content)
+full_srt = write_srt(offset_cues(scene_cues), Path('subs') / 'full_lesson.srt')
+full_vtt = write_vtt(offset_cues(scene_cues), Path('subs') / 'full_lesson.vtt')
 
 print(f"✅ 字幕文件已生成")
 print(f"   - {full_srt}")
@@ -123,33 +130,31 @@ echo -e "${YELLOW}[5/6] 🎬 合成带字幕视频...${NC}"
 mkdir -p final
 
 # 找到源视频
-SOURCE_VIDEO="media/videos/full_animation/1080p60/PythagoreanTheorem.mp4"
+SOURCE_VIDEO="media/videos/full_animation/${QUALITY_DIR}/PythagoreanTheorem.mp4"
 
 if [ ! -f "$SOURCE_VIDEO" ]; then
     echo -e "${RED}❌ 源视频不存在: $SOURCE_VIDEO${NC}"
     exit 1
 fi
 
-# 方案1: 硬字幕（字幕烧入视频）
-echo "   烧入硬字幕..."
-ffmpeg -y -i "$SOURCE_VIDEO" \
-    -vf "subtitles=subs/full_lesson.srt:force_style='FontName=PingFang SC,FontSize=24,PrimaryColour=&HFFFFFF&,OutlineColour=&H000000&,BackColour=&H80000000,Outline=2,Shadow=1,MarginV=50'" \
-    -c:v libx264 -crf 18 -preset medium \
-    -c:a copy \
-    final/${LESSON_NAME}_1080p_hardsub.mp4 \
-    2>&1 | grep -E "(frame|time|speed)" | tail -3
-
-# 方案2: 软字幕（独立字幕轨）
-echo "   添加软字幕轨..."
-ffmpeg -y -i "$SOURCE_VIDEO" \
-    -i subs/full_lesson.srt \
-    -c copy -c:s mov_text \
-    -metadata:s:s:0 language=chi \
-    final/${LESSON_NAME}_1080p_softsub.mp4 \
-    2>&1 | grep -E "(frame|time|speed)" | tail -3
-
-# 复制无字幕版本
-cp "$SOURCE_VIDEO" final/${LESSON_NAME}_1080p.mp4
+# 整课旁白音轨：有场景配音时拼接并做响度标准化（源视频本身没有旁白）
+# BACKGROUND_MUSIC 指定时混入背景音乐，旁白期间自动压低
+AUDIO_ARGS=()
+if compgen -G "audio/*.timestamps.json" > /dev/null; then
+    echo "   生成整课旁白音轨..."
+    python3 -m lessonflow.cli audio . --video-timeline ${BACKGROUND_MUSIC:+--music "$BACKGROUND_MUSIC"}
+    AUDIO_ARGS=(--audio audio/full_lesson.wav)
+fi
+
+# 一次 FFmpeg 调用：源视频只解码一次，同时输出硬字幕版、软字幕版、无字幕版与封面
+# POST_RESOLUTIONS（如 "720 480"）指定时额外输出对应分辨率的硬字幕版
+RESOLUTION_ARGS=()
+for height in ${POST_RESOLUTIONS:-}; do
+    RESOLUTION_ARGS+=(--resolution "$height")
+done
+echo "   合成硬字幕/软字幕/无字幕版与封面..."
+python3 -m lessonflow.cli post . --source "$SOURCE_VIDEO" --plain \
+    "${AUDIO_ARGS[@]}" "${RESOLUTION_ARGS[@]}"
 
 echo -e "${GREEN}✅ [5/6] 视频合成完成${NC}"
 echo ""
@@ -157,12 +162,7 @@ echo ""
 # Step 6: 生成缩略图和报告
 echo -e "${YELLOW}[6/6] 📊 生成缩略图和报告...${NC}"
 
-# 生成缩略图
-ffmpeg -y -i "final/${LESSON_NAME}_1080p.mp4" \
-    -ss 00:00:25 -vframes 1 -q:v 2 \
-    final/thumbnail.jpg \
-    2>&1 | tail -1
-
+# 缩略图已在第 5 步与视频一同生成
 # 生成报告
 cat > final/REPORT.md << EOFR
 # ${LESSON_NAME} - 生成报告
@@ -174,9 +174,9 @@ cat > final/REPORT.md << EOFR
 
 | 文件 | 大小 | 说明 |
 |------|------|------|
-| ${LESSON_NAME}_1080p.mp4 | $(ls -lh final/${LESSON_NAME}_1080p.mp4 | awk '{print $5}') | 无字幕原版 |
-| ${LESSON_NAME}_1080p_hardsub.mp4 | $(ls -lh final/${LESSON_NAME}_1080p_hardsub.mp4 | awk '{print $5}') | 硬字幕版（推荐） |
-| ${LESSON_NAME}_1080p_softsub.mp4 | $(ls -lh final/${LESSON_NAME}_1080p_softsub.mp4 | awk '{print $5}') | 软字幕版 |
+| ${LESSON_NAME}_${VIDEO_LABEL}.mp4 | $(ls -lh final/${LESSON_NAME}_${VIDEO_LABEL}.mp4 | awk '{print $5}') | 无字幕原版 |
+| ${LESSON_NAME}_${VIDEO_LABEL}_hardsub.mp4 | $(ls -lh final/${LESSON_NAME}_${VIDEO_LABEL}_hardsub.mp4 | awk '{print $5}') | 硬字幕版（推荐） |
+| ${LESSON_NAME}_${VIDEO_LABEL}_softsub.mp4 | $(ls -lh final/${LESSON_NAME}_${VIDEO_LABEL}_softsub.mp4 | awk '{print $5}') | 软字幕版 |
 | thumbnail.jpg | $(ls -lh final/thumbnail.jpg | awk '{print $5}') | 视频封面 |
 | full_lesson.srt | $(ls -lh subs/full_lesson.srt | awk '{print $5}') | SRT字幕 |
 | full_lesson.vtt | $(ls -lh subs/full_lesson.vtt | awk '{print $5}') | VTT字幕 |
@@ -184,15 +184,15 @@ cat > final/REPORT.md << EOFR
 ## 🎯 使用建议
 
 ### 在线平台上传
-推荐使用 **${LESSON_NAME}_1080p_hardsub.mp4**（硬字幕版）
+推荐使用 **${LESSON_NAME}_${VIDEO_LABEL}_hardsub.mp4**（硬字幕版）
 
 ### 本地播放器
-使用 **${LESSON_NAME}_1080p_softsub.mp4**（软字幕版），可自由开关字幕
+使用 **${LESSON_NAME}_${VIDEO_LABEL}_softsub.mp4**（软字幕版），可自由开关字幕
 
 ### 嵌入网页
 \`\`\`html
 <video controls>
-  <source src="${LESSON_NAME}_1080p.mp4" type="video/mp4">
+  <source src="${LESSON_NAME}_${VIDEO_LABEL}.mp4" type="video/mp4">
   <track kind="subtitles" src="full_lesson.vtt" srclang="zh" label="中文">
 </video>
 \`\`\`
@@ -212,9 +212,9 @@ echo ""
 echo -e "${GREEN}📁 输出目录:${NC} $(pwd)/final/"
 echo ""
 echo -e "${GREEN}📹 视频文件:${NC}"
-echo "   - ${LESSON_NAME}_1080p_hardsub.mp4 (带硬字幕，推荐)"
-echo "   - ${LESSON_NAME}_1080p_softsub.mp4 (带软字幕)"
-echo "   - ${LESSON_NAME}_1080p.mp4 (无字幕)"
+echo "   - ${LESSON_NAME}_${VIDEO_LABEL}_hardsub.mp4 (带硬字幕，推荐)"
+echo "   - ${LESSON_NAME}_${VIDEO_LABEL}_softsub.mp4 (带软字幕)"
+echo "   - ${LESSON_NAME}_${VIDEO_LABEL}.mp4 (无字幕)"
 echo ""
 echo -e "${GREEN}📝 字幕文件:${NC}"
 echo "   - subs/full_lesson.srt"
@@ -224,5 +224,5 @@ echo -e "${GREEN}📊 详细报告:${NC}"
 echo "   - final/REPORT.md"
 echo ""
 echo -e "${YELLOW}💡 预览视频:${NC}"
-echo "   open final/${LESSON_NAME}_1080p_hardsub.mp4"
+echo "   open final/${LESSON_NAME}_${VIDEO_LABEL}_hardsub.mp4"
 echo ""
@@ -16,3 +16,4 @@ PROJECT_ROOT = Path(__file__).parent.parent
 TEMPLATES_DIR = PROJECT_ROOT / "templates"
 SCHEMA_DIR = PROJECT_ROOT / "schema"
 COURSES_DIR = PROJECT_ROOT / "courses"
+SCRIPTS_DIR = PROJECT_ROOT / "scripts"
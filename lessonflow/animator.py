@@ -0,0 +1,201 @@
+"""
+LessonFlowAI - Storyboard 场景编译器
+
+把 storyboard 的 visual.elements 与 animation.steps 预编译为每个场景一个扁平的操作列表，
+由 StoryboardScene（templates/manim_snippets/base/storyboard_scene.py）直接解释执行，
+不需要为每个场景生成和导入完整的 Manim 代码：
+
+    {"op": "build", "id": "title", "type": "text", ...}    构造元素并注册
+    {"op": "play", "action": "write", "targets": [...], "run_time": 1.0, "params": {...}}
+    {"op": "wait", "run_time": 0.5}
+
+编译阶段完成所有校验（目标元素、动作参数、箭头端点），执行阶段只做分派。
+动画总时长不足 duration_s 时末尾补 wait，使场景时长与 storyboard 一致。
+
+scenes/<scene_id>.py 只是一个很小的入口文件（供 manim 命令行与 QA 定位类名），
+手写的场景文件不会被覆盖。
+"""
+
+import json
+import os
+import re
+from pathlib import Path
+
+# 编译结果格式版本
+OPS_VERSION = 1
+
+# 生成的场景入口文件标记（没有该标记的文件视为手写，不覆盖）
+GENERATED_MARKER = "# lessonflow.animator: generated"
+
+# 支持的元素类型
+ELEMENT_TYPES = ("text", "formula", "box", "circle", "arrow")
+
+# 动作 -> 需要的目标数量（None 表示至少一个）
+ACTION_TARGETS = {
+    "create": None,
+    "draw": None,
+    "write": None,
+    "fade_in": None,
+    "fade_out": None,
+    "undraw": None,
+    "indicate": None,
+    "highlight": None,
+    "scale": None,
+    "rotate": None,
+    "move_to": None,
+    "transform": 2,
+    "wait": 0,
+}
+
+# 时长浮点误差
+EPSILON_S = 1e-3
+
+SCENE_TEMPLATE = '''{marker}
+# 由 storyboard.json 编译，修改 storyboard 后重新构建即可，不要手动编辑
+from manim_snippets.base.storyboard_scene import StoryboardScene
+
+
+class {class_name}(StoryboardScene):
+    ops_path = "{ops_path}"
+
+    def construct(self):
+        self.run_ops()
+'''
+
+
+def _build_op(element) -> dict:
+    """元素 -> build 操作"""
+    if element.type not in ELEMENT_TYPES:
+        raise ValueError(f"元素 {element.id} 的类型 {element.type} 暂不支持自动生成")
+    op = {
+        "op": "build",
+        "id": element.id,
+        "type": element.type,
+        "content": element.content,
+        "label": element.label,
+        "anchor": element.anchor,
+        "color": element.color,
+        "size": element.size,
+    }
+    if element.type == "arrow":
+        if not element.from_ or not element.to:
+            raise ValueError(f"箭头 {element.id} 缺少 from / to")
+        op.update({"from": element.from_, "to": element.to, "style": element.style})
+    elif element.type in ("text", "formula") and not element.content:
+        raise ValueError(f"元素 {element.id} 缺少 content")
+    return op
+
+
+def _play_op(index: int, step, built: set) -> dict:
+    """动画步骤 -> play / wait 操作"""
+    if step.action not in ACTION_TARGETS:
+        raise ValueError(f"步骤 {index}: 不支持的动作 {step.action}")
+    if step.action == "wait":
+        return {"op": "wait", "run_time": step.duration_s}
+
+    targets = step.targets
+    expected = ACTION_TARGETS[step.action]
+    if not targets or (expected and len(targets) != expected):
+        count = f" {expected} 个" if expected else "至少一个"
+        raise ValueError(f"步骤 {index}: {step.action} 需要{count}目标元素")
+    unknown = [t for t in targets if t not in built]
+    if unknown:
+        raise ValueError(f"步骤 {index}: 目标元素不存在 {', '.join(unknown)}")
+    if step.action == "move_to" and not step.params.get("to_anchor"):
+        raise ValueError(f"步骤 {index}: move_to 缺少 params.to_anchor")
+
+    return {
+        "op": "play",
+        "action": step.action,
+        "targets": targets,
+        "run_time": step.duration_s,
+        "params": dict(step.params),
+    }
+
+
+def compile_scene(scene, style: str = "tech-minimal") -> dict:
+    """
+    编译单个场景
+
+    Args:
+        scene: storyboard.Scene
+        style: 风格名（StyleMixin 预设）
+
+    Returns:
+        dict: {"version", "scene_id", "style", "duration_s", "ops"}
+
+    Raises:
+        ValueError: 元素或步骤无法编译
+    """
+    ops, built = [], set()
+    elements = list(scene.visual.elements)
+    # 箭头依赖端点元素，放在其余元素之后构造
+    for element in sorted(elements, key=lambda e: e.type == "arrow"):
+        if element.id in built:
+            raise ValueError(f"元素 ID 重复: {element.id}")
+        op = _build_op(element)
+        if element.type == "arrow":
+            missing = [end for end in (op["from"], op["to"]) if end not in built]
+            if missing:
+                raise ValueError(f"箭头 {element.id} 的端点不存在: {', '.join(missing)}")
+        ops.append(op)
+        built.add(element.id)
+
+    total = 0.0
+    for index, step in enumerate(scene.animation.steps, 1):
+        op = _play_op(index, step, built)
+        ops.append(op)
+        total += op["run_time"]
+
+    if scene.duration_s > total + EPSILON_S:
+        ops.append({"op": "wait", "run_time": round(scene.duration_s - total, 3)})
+        total = scene.duration_s
+
+    return {
+        "version": OPS_VERSION,
+        "scene_id": scene.id,
+        "style": style,
+        "duration_s": round(total, 3),
+        "ops": ops,
+    }
+
+
+def scene_class_name(scene_id: str) -> str:
+    """场景 ID -> 合法的类名（scene_001 -> Scene001）"""
+    name = "".join(part.capitalize() for part in re.split(r"[^0-9A-Za-z]+", scene_id) if part)
+    return name if name and not name[0].isdigit() else f"Scene{name}"
+
+
+def is_generated(scene_file: Path) -> bool:
+    """场景文件是否由本模块生成（不存在也视为可生成）"""
+    scene_file = Path(scene_file)
+    if not scene_file.is_file():
+        return True
+    with open(scene_file, "r", encoding="utf-8") as f:
+        return f.readline().strip() == GENERATED_MARKER
+
+
+def write_scene(compiled: dict, ops_file: Path, scene_file: Path) -> bool:
+    """
+    写出操作列表与场景入口文件
+
+    Returns:
+        bool: 是否写出了场景入口（手写场景文件不覆盖）
+    """
+    ops_file, scene_file = Path(ops_file), Path(scene_file)
+    ops_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(ops_file, "w", encoding="utf-8") as f:
+        json.dump(compiled, f, ensure_ascii=False, indent=2)
+
+    if not is_generated(scene_file):
+        return False
+    source = SCENE_TEMPLATE.format(
+        marker=GENERATED_MARKER,
+        class_name=scene_class_name(compiled["scene_id"]),
+        ops_path=Path(os.path.relpath(ops_file.resolve(), scene_file.parent.resolve())).as_posix(),
+    )
+    scene_file.parent.mkdir(parents=True, exist_ok=True)
+    if not scene_file.is_file() or scene_file.read_text(encoding="utf-8") != source:
+        scene_file.write_text(source, encoding="utf-8")
+    return True
+
@@ -0,0 +1,438 @@
+"""
+LessonFlowAI - 整课旁白音轨
+
+把各场景配音（audio/<scene_id>.wav）按时间轴拼成一条整课旁白音轨：
+- 场景时间槽与前置停顿取自时间计划（timing/<scene_id>.timing.json），
+  没有时间计划时按 storyboard 的 pause_before_s / pause_after_s / duration_s 排列
+- 响度按 EBU R128 / ITU-R BS.1770 方式测量（K 计权、400ms 门限块、绝对/相对门限），
+  整体增益到目标响度，并受峰值上限约束
+- 可选背景音乐：循环铺满整课，按已知的旁白区间自动压低（ducking）
+
+全程按场景/固定长度分块处理 NumPy 数组，内存占用与课程总时长无关：
+第一遍只测量响度，第二遍施加增益、混入音乐并流式写出。
+"""
+
+import os
+import wave
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from lessonflow.storyboard import Storyboard
+from lessonflow.timing import load_timing_plan, plan_timing, wav_duration
+from lessonflow.tts import WavStreamWriter
+
+# 目标响度（LUFS，在线课程常用 -16；广播标准 EBU R128 为 -23）
+TARGET_LUFS = float(os.getenv("LESSONFLOW_TARGET_LUFS", "-16"))
+
+# 采样峰值上限（dBFS）
+PEAK_CEILING_DB = -1.0
+
+# 背景音乐相对旁白目标响度的电平（LU）与旁白期间的额外压低（dB）
+MUSIC_LEVEL_LU = -12.0
+DUCK_DB = -10.0
+
+# ducking 起落时间（秒）
+DUCK_ATTACK_S = 0.3
+DUCK_RELEASE_S = 0.8
+
+# 混音分块长度（秒）
+CHUNK_S = 10.0
+
+# BS.1770 门限
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+
+# 响度测量子块（100ms，400ms 门限块 = 4 个子块，75% 重叠）
+SUB_BLOCK_S = 0.1
+BLOCK_SUB_BLOCKS = 4
+
+
+@dataclass
+class SceneSlot:
+    """单个场景在整课音轨中的位置"""
+    scene_id: str
+    audio: Path
+    start_s: float  # 场景在整课中的开始时间
+    slot_s: float  # 场景片段时长
+    pause_before_s: float = 0.0  # 配音在场景内的开始时间
+    tempo: float = 1.0  # 配音加速倍数
+
+    @property
+    def speech_start_s(self) -> float:
+        return self.start_s + self.pause_before_s
+
+    def map_time(self, t: float) -> float:
+        """配音内时间 → 场景内时间（用于字幕）"""
+        return self.pause_before_s + t / self.tempo
+
+
+# ---------- WAV 读写 ----------
+
+def read_wav(path: Path) -> tuple:
+    """
+    读取 16 位 PCM WAV 为单声道 float32（-1 ~ 1）
+
+    Returns:
+        tuple: (samples, sample_rate)
+    """
+    with wave.open(str(path), "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"只支持 16 位 PCM WAV: {path}")
+        channels = wav.getnchannels()
+        sample_rate = wav.getframerate()
+        data = np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2")
+    samples = data.astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples, sample_rate
+
+
+def resample(samples: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    """线性插值重采样（用于对齐不同采样率的配音/音乐）"""
+    if source_rate == target_rate or not len(samples):
+        return samples
+    length = int(round(len(samples) * target_rate / source_rate))
+    positions = np.arange(length) * (source_rate / target_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def load_music(path: Path, sample_rate: int) -> np.ndarray:
+    """
+    读取背景音乐为单声道 float32
+
+    WAV 直接读取；其他格式（mp3 / m4a 等）通过 pydub（需要 FFmpeg）解码。
+    """
+    path = Path(path)
+    if path.suffix.lower() == ".wav":
+        samples, rate = read_wav(path)
+        return resample(samples, rate, sample_rate)
+
+    try:
+        from pydub import AudioSegment
+    except ImportError:
+        raise RuntimeError(f"读取 {path.suffix} 背景音乐需要 pydub: pip install pydub")
+    segment = AudioSegment.from_file(str(path)).set_channels(1).set_frame_rate(sample_rate)
+    samples = np.array(segment.get_array_of_samples(), dtype=np.float32)
+    return samples / float(1 << (8 * segment.sample_width - 1))
+
+
+# ---------- 变速不变调 ----------
+
+def time_stretch(samples: np.ndarray, tempo: float, sample_rate: int) -> np.ndarray:
+    """
+    WSOLA 变速（不改变音高），tempo > 1 加快
+
+    与 FFmpeg atempo 同类算法：按分析步长取帧，在容差范围内寻找与上一帧
+    自然延续最相似的位置，加窗重叠相加。
+    """
+    if abs(tempo - 1.0) < 1e-3 or len(samples) == 0:
+        return samples
+    frame = int(sample_rate * 0.04) // 2 * 2
+    hop = frame // 2
+    tolerance = hop // 2
+    if len(samples) < frame + 2 * tolerance:
+        return resample(samples, int(round(sample_rate * tempo)), sample_rate)
+
+    window = np.hanning(frame).astype(np.float32)
+    padded = np.concatenate([np.zeros(tolerance, np.float32), samples,
+                             np.zeros(frame + 2 * tolerance, np.float32)])
+    count = int((len(samples) - frame) / (hop * tempo)) + 1
+    output = np.zeros((count - 1) * hop + frame, np.float32)
+    norm = np.zeros_like(output)
+
+    previous = 0
+    for k in range(count):
+        nominal = int(k * hop * tempo)
+        if k == 0:
+            position = nominal
+        else:
+            # 上一帧的自然延续与候选区间做互相关，选最相似的偏移
+            natural = padded[previous + tolerance + hop: previous + tolerance + hop + hop]
+            region = padded[nominal: nominal + hop + 2 * tolerance]
+            scores = np.correlate(region, natural, mode="valid")
+            position = nominal + int(np.argmax(scores)) - tolerance
+            position = max(position, 0)
+        chunk = padded[position + tolerance: position + tolerance + frame]
+        output[k * hop: k * hop + frame] += chunk * window
+        norm[k * hop: k * hop + frame] += window
+        previous = position
+
+    output /= np.maximum(norm, 1e-3)
+    return output[: int(round(len(samples) / tempo))]
+
+
+# ---------- 响度测量 ----------
+
+def _biquad_power(b: tuple, a: tuple, frequencies: np.ndarray, sample_rate: int) -> np.ndarray:
+    """二阶 IIR 滤波器在给定频率上的功率响应 |H|²"""
+    z = np.exp(-1j * 2 * np.pi * frequencies / sample_rate)
+    numerator = b[0] + b[1] * z + b[2] * z ** 2
+    denominator = a[0] + a[1] * z + a[2] * z ** 2
+    return np.abs(numerator / denominator) ** 2
+
+
+def k_weighting_power(frequencies: np.ndarray, sample_rate: int) -> np.ndarray:
+    """BS.1770 K 计权（高频搁架 + RLB 高通）的功率响应，系数按采样率推导"""
+    # 高频搁架：+4dB @ 1500Hz
+    gain = 10 ** (4.0 / 40)
+    w0 = 2 * np.pi * 1500 / sample_rate
+    alpha = np.sin(w0) / (2 / np.sqrt(2))
+    cos, root = np.cos(w0), 2 * np.sqrt(gain) * alpha
+    shelf = _biquad_power(
+        (gain * ((gain + 1) + (gain - 1) * cos + root),
+         -2 * gain * ((gain - 1) + (gain + 1) * cos),
+         gain * ((gain + 1) + (gain - 1) * cos - root)),
+        ((gain + 1) - (gain - 1) * cos + root,
+         2 * ((gain - 1) - (gain + 1) * cos),
+         (gain + 1) - (gain - 1) * cos - root),
+        frequencies, sample_rate,
+    )
+    # RLB 高通：38Hz
+    w0 = 2 * np.pi * 38 / sample_rate
+    alpha, cos = np.sin(w0) / (2 * 0.5), np.cos(w0)
+    highpass = _biquad_power(
+        ((1 + cos) / 2, -(1 + cos), (1 + cos) / 2),
+        (1 + alpha, -2 * cos, 1 - alpha),
+        frequencies, sample_rate,
+    )
+    return shelf * highpass
+
+
+class LoudnessMeter:
+    """
+    分块累积的积分响度测量（BS.1770 门限算法）
+
+    每 100ms 子块在频域施加 K 计权求均方能量（不跨块保留滤波器状态，
+    对积分响度的影响可忽略），门限块由 4 个相邻子块平均得到。
+    """
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self.block = int(sample_rate * SUB_BLOCK_S)
+        frequencies = np.fft.rfftfreq(self.block, 1 / sample_rate)
+        weights = k_weighting_power(frequencies, sample_rate)
+        # rfft 单边谱：除直流与奈奎斯特外的分量计两次
+        weights[1:(self.block + 1) // 2] *= 2
+        self.weights = weights / self.block ** 2
+        self.energies = []
+        self.peak = 0.0
+        self._remainder = np.zeros(0, np.float32)
+
+    def add(self, samples: np.ndarray):
+        if not len(samples):
+            return
+        self.peak = max(self.peak, float(np.max(np.abs(samples))))
+        samples = np.concatenate([self._remainder, samples])
+        usable = len(samples) // self.block * self.block
+        self._remainder = samples[usable:]
+        if usable:
+            blocks = samples[:usable].reshape(-1, self.block)
+            spectrum = np.abs(np.fft.rfft(blocks, axis=1)) ** 2
+            self.energies.extend((spectrum @ self.weights).tolist())
+
+    def integrated(self) -> float:
+        """积分响度（LUFS）；全部低于绝对门限时返回 -inf"""
+        energies = np.asarray(self.energies)
+        if len(energies) < BLOCK_SUB_BLOCKS:
+            return float("-inf")
+        kernel = np.ones(BLOCK_SUB_BLOCKS) / BLOCK_SUB_BLOCKS
+        blocks = np.convolve(energies, kernel, mode="valid")
+        loudness = -0.691 + 10 * np.log10(np.maximum(blocks, 1e-12))
+
+        gated = blocks[loudness > ABSOLUTE_GATE_LUFS]
+        if not len(gated):
+            return float("-inf")
+        relative = -0.691 + 10 * np.log10(gated.mean()) + RELATIVE_GATE_LU
+        gated = blocks[(loudness > ABSOLUTE_GATE_LUFS) & (loudness > relative)]
+        return float(-0.691 + 10 * np.log10(gated.mean()))
+
+    @property
+    def peak_db(self) -> float:
+        return 20 * np.log10(self.peak) if self.peak > 0 else float("-inf")
+
+
+def measure_loudness(samples: np.ndarray, sample_rate: int) -> float:
+    meter = LoudnessMeter(sample_rate)
+    meter.add(samples)
+    return meter.integrated()
+
+
+# ---------- 时间轴 ----------
+
+def lesson_slots(lesson_dir: Path, storyboard: Storyboard = None,
+                 video_timeline: bool = False) -> list:
+    """
+    计算各场景配音在整课中的位置
+
+    有时间计划时与 mux 片段完全一致（片段时长、前置停顿、加速倍数），
+    否则按 storyboard 估算：场景时长至少容纳前后停顿与整段配音。
+
+    video_timeline=True 用于整段渲染的源视频（画面不能按场景延长）：
+    场景严格按 storyboard 的 start_s / duration_s 排列，配音过长时在 MAX_TEMPO 以内加速，
+    仍超出的部分在场景结束处截断。字幕应使用同一组时间槽（SceneSlot.map_time）。
+    """
+    lesson_dir = Path(lesson_dir)
+    storyboard = storyboard or Storyboard.load(lesson_dir / "storyboard.json")
+    slots, start = [], 0.0
+    for scene in storyboard.scenes:
+        audio = lesson_dir / "audio" / f"{scene.id}.wav"
+        if not audio.is_file():
+            raise RuntimeError(f"场景配音不存在，请先运行 lessonflow build: {audio}")
+        plan_path = lesson_dir / "timing" / f"{scene.id}.timing.json"
+        narration = scene.narration
+        if video_timeline:
+            plan = plan_timing(scene.id, scene.duration_s, wav_duration(audio),
+                               narration.pause_before_s, narration.pause_after_s)
+            if plan.video_pad_s > 0:
+                print(f"   ⚠️ {scene.id}: 配音超出场景 {plan.video_pad_s:.2f}s，超出部分被截断")
+            slot = SceneSlot(scene.id, audio, scene.start_s, scene.duration_s,
+                             narration.pause_before_s, plan.tempo)
+        elif plan_path.is_file():
+            plan = load_timing_plan(plan_path)
+            slot = SceneSlot(scene.id, audio, start, plan.target_s, plan.pause_before_s, plan.tempo)
+        else:
+            speech_s = narration.pause_before_s + wav_duration(audio) + narration.pause_after_s
+            slot = SceneSlot(scene.id, audio, start, max(scene.duration_s, speech_s),
+                             narration.pause_before_s)
+        slots.append(slot)
+        start += slot.slot_s
+    return slots
+
+
+def _narration_chunks(slots: list, sample_rate: int):
+    """按场景生成整课旁白（float32），场景边界按整课时间取整，避免累积误差"""
+    for slot in slots:
+        samples, rate = read_wav(slot.audio)
+        samples = time_stretch(resample(samples, rate, sample_rate), slot.tempo, sample_rate)
+        begin = int(round(slot.start_s * sample_rate))
+        end = int(round((slot.start_s + slot.slot_s) * sample_rate))
+        chunk = np.zeros(end - begin, np.float32)
+        offset = min(int(round(slot.pause_before_s * sample_rate)), len(chunk))
+        speech = samples[: len(chunk) - offset]
+        chunk[offset: offset + len(speech)] = speech
+        yield begin, chunk
+
+
+def _split(chunks, size: int):
+    """把场景块切成固定长度的块（长场景也不会一次处理过多样本）"""
+    for begin, chunk in chunks:
+        for i in range(0, len(chunk), size):
+            yield begin + i, chunk[i: i + size]
+
+
+def duck_envelope(begin: int, length: int, intervals: list, sample_rate: int) -> np.ndarray:
+    """
+    旁白区间的压低程度（0 = 不压低，1 = 完全压低），区间前后按起落时间线性过渡
+
+    Args:
+        begin: 块起始样本
+        intervals: 旁白区间 [(开始样本, 结束样本)]
+    """
+    t = np.arange(begin, begin + length, dtype=np.float64)
+    envelope = np.zeros(length, np.float32)
+    attack, release = DUCK_ATTACK_S * sample_rate, DUCK_RELEASE_S * sample_rate
+    for start, end in intervals:
+        if end + release < begin or start - attack > begin + length:
+            continue
+        rising = np.clip((t - (start - attack)) / attack, 0, 1)
+        falling = np.clip(((end + release) - t) / release, 0, 1)
+        np.maximum(envelope, np.minimum(rising, falling), out=envelope)
+    return envelope
+
+
+# ---------- 整课音轨 ----------
+
+def build_narration_track(
+    lesson_dir: str,
+    output: Path = None,
+    target_lufs: float = TARGET_LUFS,
+    music: Path = None,
+    music_level_lu: float = MUSIC_LEVEL_LU,
+    duck_db: float = DUCK_DB,
+    video_timeline: bool = False,
+) -> dict:
+    """
+    生成整课旁白音轨（可选混入背景音乐）
+
+    Args:
+        lesson_dir: 课程目录
+        output: 输出 WAV（默认 audio/full_lesson.wav）
+        target_lufs: 旁白目标响度
+        music: 可选背景音乐（WAV，或 pydub 可解码的格式）
+        music_level_lu: 无旁白时音乐相对目标响度的电平
+        duck_db: 旁白期间音乐额外压低的分贝数（负数）
+        video_timeline: 按 storyboard 场景时间排列（整段源视频），见 lesson_slots
+
+    Returns:
+        dict: 输出路径、时长、测得响度、施加的增益等
+    """
+    lesson_dir = Path(lesson_dir)
+    output = Path(output) if output else lesson_dir / "audio" / "full_lesson.wav"
+    slots = lesson_slots(lesson_dir, video_timeline=video_timeline)
+    if not slots:
+        raise RuntimeError("storyboard 中没有场景")
+
+    _, sample_rate = read_wav(slots[0].audio)
+    chunk_size = int(CHUNK_S * sample_rate)
+
+    # 第一遍：测量旁白响度与峰值
+    meter = LoudnessMeter(sample_rate)
+    for _, chunk in _split(_narration_chunks(slots, sample_rate), chunk_size):
+        meter.add(chunk)
+    measured = meter.integrated()
+    gain_db = target_lufs - measured if np.isfinite(measured) else 0.0
+    if np.isfinite(meter.peak_db):
+        gain_db = min(gain_db, PEAK_CEILING_DB - meter.peak_db)
+    gain = np.float32(10 ** (gain_db / 20))
+
+    music_samples, music_gain_db = None, None
+    if music:
+        music_samples = load_music(music, sample_rate)
+        if not len(music_samples):
+            raise RuntimeError(f"背景音乐为空: {music}")
+        music_loudness = measure_loudness(music_samples, sample_rate)
+        music_gain_db = (target_lufs + music_level_lu - music_loudness
+                         if np.isfinite(music_loudness) else 0.0)
+    # 旁白区间（加速后的配音时长，不超出场景）
+    intervals = []
+    for slot in slots:
+        duration_s = min(wav_duration(slot.audio) / slot.tempo, slot.slot_s - slot.pause_before_s)
+        start = int(round(slot.speech_start_s * sample_rate))
+        intervals.append((start, start + int(round(duration_s * sample_rate))))
+
+    # 第二遍：增益、混音、流式写出
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output.with_suffix(f".{os.getpid()}.tmp")
+    total = 0
+    try:
+        with WavStreamWriter(tmp_path, sample_rate=sample_rate) as writer:
+            for begin, chunk in _split(_narration_chunks(slots, sample_rate), chunk_size):
+                mixed = chunk * gain
+                if music_samples is not None:
+                    indices = np.arange(begin, begin + len(chunk)) % len(music_samples)
+                    duck = duck_envelope(begin, len(chunk), intervals, sample_rate)
+                    level_db = music_gain_db + duck_db * duck
+                    mixed += music_samples[indices] * (10 ** (level_db / 20)).astype(np.float32)
+                pcm = np.clip(mixed * 32767, -32768, 32767).astype("<i2")
+                writer.write(pcm.tobytes())
+                total += len(chunk)
+        os.replace(tmp_path, output)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+    peak_db = meter.peak_db + gain_db
+    return {
+        "output": str(output),
+        "duration_s": round(total / sample_rate, 3),
+        "sample_rate": sample_rate,
+        "scenes": len(slots),
+        "measured_lufs": round(measured, 2) if np.isfinite(measured) else None,
+        "target_lufs": target_lufs,
+        "gain_db": round(float(gain_db), 2),
+        "peak_dbfs": round(float(peak_db), 2) if np.isfinite(peak_db) else None,
+        "music": str(music) if music else None,
+    }
+
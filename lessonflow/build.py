@@ -0,0 +1,475 @@
+"""
+LessonFlowAI - 增量构建引擎
+
+基于场景内容哈希的增量构建：
+- 规范化每个场景（视觉、动画、旁白、风格、涉及的术语）并计算哈希
+- 每个阶段只依赖场景的部分字段、输入文件和上游阶段的 key
+- manifest 记录每个场景每个阶段的输入 key 与产物路径
+- 输入未变化且产物仍存在的阶段直接跳过
+- 需要审核的阶段（如最终渲染）只对已批准的场景执行，其余场景记为 held
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+from lessonflow import TEMPLATES_DIR
+from lessonflow.storyboard import Scene, Storyboard
+
+# manifest 存放位置（相对于课程目录）
+MANIFEST_PATH = Path(".lessonflow") / "manifest.json"
+MANIFEST_VERSION = 1
+
+# 场景审核记录（相对于课程目录）
+APPROVALS_PATH = Path(".lessonflow") / "approvals.json"
+
+# 哈希长度（十六进制字符数）
+HASH_LENGTH = 16
+
+# 参与场景哈希的字段
+SCENE_FIELDS = ("duration_s", "visual", "animation", "narration", "subtitle", "checks")
+
+
+def canonical_json(data) -> str:
+    """规范化 JSON 序列化（键排序、无多余空白），保证相同内容得到相同文本"""
+    return json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def content_hash(data) -> str:
+    """计算任意 JSON 兼容数据的内容哈希"""
+    return hashlib.sha256(canonical_json(data).encode("utf-8")).hexdigest()[:HASH_LENGTH]
+
+
+def file_hash(path: Path) -> Optional[str]:
+    """计算文件内容哈希，文件不存在时返回 None"""
+    path = Path(path)
+    if not path.is_file():
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def _strip_private(data):
+    """去掉以下划线开头的键（如 _hash），避免哈希自引用"""
+    if isinstance(data, dict):
+        return {k: _strip_private(v) for k, v in data.items() if not k.startswith("_")}
+    if isinstance(data, list):
+        return [_strip_private(v) for v in data]
+    return data
+
+
+def scene_texts(scene: dict) -> list:
+    """收集场景中所有可能出现术语的文本"""
+    texts = [
+        scene.get("narration", {}).get("vo_text", ""),
+        scene.get("subtitle", {}).get("text", ""),
+    ]
+    for elem in scene.get("visual", {}).get("elements", []):
+        texts.append(elem.get("content", ""))
+        texts.append(elem.get("label", ""))
+    return [t for t in texts if t]
+
+
+def touched_terms(scene: dict, glossary: dict = None) -> dict:
+    """返回场景涉及的术语（只有这些术语的变更会影响该场景）"""
+    terms = (glossary or {}).get("terms", {})
+    if not terms:
+        return {}
+    haystack = "\n".join(scene_texts(scene))
+    return {term: info for term, info in terms.items() if term in haystack}
+
+
+def canonical_scene(scene: dict, style: dict = None, glossary: dict = None) -> dict:
+    """
+    规范化场景
+
+    只保留影响产物的字段，并附带风格与涉及的术语，
+    作为各阶段计算输入 key 的数据源。
+    """
+    canonical = {"id": scene.get("id")}
+    for field_name in SCENE_FIELDS:
+        canonical[field_name] = _strip_private(scene.get(field_name, {}))
+    canonical["style"] = style or {}
+    canonical["terms"] = touched_terms(scene, glossary)
+    return canonical
+
+
+def scene_hash(scene: dict, style: dict = None, glossary: dict = None) -> str:
+    """计算场景内容哈希（即 storyboard 中的 _hash 字段）"""
+    return content_hash(canonical_scene(scene, style, glossary))
+
+
+def load_style(style_name: str) -> dict:
+    """加载风格配置，找不到风格文件时只记录风格名"""
+    style_path = TEMPLATES_DIR / "style_guides" / f"{style_name}.json"
+    if style_path.is_file():
+        with open(style_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"name": style_name}
+
+
+class SceneContext:
+    """单个场景在某一阶段执行时的上下文"""
+
+    def __init__(self, lesson_dir: Path, scene: Scene, canonical: dict, index: int):
+        self.lesson_dir = lesson_dir
+        self.scene = scene
+        self.canonical = canonical
+        self.index = index
+        self.artifacts = {}  # 阶段名 -> 产物字典（相对课程目录的路径）
+        self.approval = None  # 审核通过时记录的场景渲染 key
+
+    @property
+    def scene_id(self) -> str:
+        return self.scene.id
+
+    def path(self, relative: str) -> Path:
+        """将相对课程目录的路径转为绝对路径"""
+        return self.lesson_dir / relative
+
+    def artifact(self, stage: str, name: str) -> Path:
+        """获取上游阶段的产物路径"""
+        return self.path(self.artifacts[stage][name])
+
+
+class Stage:
+    """
+    构建阶段基类
+
+    子类通过类属性声明依赖：
+    - inputs: 依赖的规范化场景字段
+    - deps: 依赖的上游阶段
+    - gates: 必须先成功、但不参与 key 计算的上游阶段（如 QA 检查）
+    - version: 阶段实现版本，修改产物格式时递增以使旧缓存失效
+    """
+
+    name: str = ""
+    inputs: tuple = ()
+    deps: tuple = ()
+    gates: tuple = ()
+    version: str = "1"
+
+    def params(self, ctx: SceneContext) -> dict:
+        """影响产物的额外参数（如渲染质量、TTS 配置）"""
+        return {}
+
+    def input_files(self, ctx: SceneContext) -> list:
+        """影响产物的输入文件（相对课程目录，如手写的 scenes/*.py）"""
+        return []
+
+    def key(self, ctx: SceneContext, dep_keys: dict) -> str:
+        """计算阶段输入 key"""
+        return content_hash({
+            "stage": self.name,
+            "version": self.version,
+            "inputs": {name: ctx.canonical.get(name) for name in self.inputs},
+            "params": self.params(ctx),
+            "files": {str(p): file_hash(ctx.path(p)) for p in self.input_files(ctx)},
+            "deps": dep_keys,
+        })
+
+    def hold(self, ctx: SceneContext) -> Optional[str]:
+        """需要执行时是否暂缓（如等待审核），返回原因；None 表示可以执行"""
+        return None
+
+    def run(self, ctx: SceneContext) -> dict:
+        """执行阶段，返回产物字典 {产物名: 相对路径}"""
+        raise NotImplementedError
+
+    def run_many(self, contexts: list) -> list:
+        """
+        批量执行阶段
+
+        默认逐个执行；子类可覆盖以实现并行。
+        返回与 contexts 等长的列表，元素为产物字典或异常。
+        """
+        results = []
+        for ctx in contexts:
+            try:
+                results.append(self.run(ctx))
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+class BuildManifest:
+    """构建清单：记录每个场景每个阶段的输入 key 与产物"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.data = {"version": MANIFEST_VERSION, "scenes": {}}
+        if self.path.is_file():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == MANIFEST_VERSION:
+                    self.data = data
+            except (json.JSONDecodeError, OSError):
+                pass  # 损坏的 manifest 视为空，全部重建
+
+    def scene(self, scene_id: str) -> dict:
+        return self.data["scenes"].setdefault(scene_id, {"hash": None, "stages": {}})
+
+    def get_stage(self, scene_id: str, stage: str) -> Optional[dict]:
+        return self.data["scenes"].get(scene_id, {}).get("stages", {}).get(stage)
+
+    def set_stage(self, scene_id: str, stage: str, key: str, artifacts: dict, elapsed_s: float):
+        self.scene(scene_id)["stages"][stage] = {
+            "key": key,
+            "artifacts": artifacts,
+            "built_at": time.time(),
+            "elapsed_s": round(elapsed_s, 3),
+        }
+
+    def retain(self, scene_ids: set):
+        """移除已不在 storyboard 中的场景记录（产物文件保留在磁盘）"""
+        for scene_id in list(self.data["scenes"]):
+            if scene_id not in scene_ids:
+                del self.data["scenes"][scene_id]
+
+    def save(self):
+        """原子写入 manifest，避免中断时留下半个文件"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class Approvals:
+    """
+    场景审核记录 {scene_id: 批准时的场景渲染 key}
+
+    批准针对的是预览所用的同一份渲染输入；场景改动后 key 变化，批准自动失效。
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.data = {}
+        if self.path.is_file():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.data = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                pass
+
+    def get(self, scene_id: str) -> Optional[str]:
+        return self.data.get(scene_id, {}).get("key")
+
+    def approve(self, scene_id: str, key: str):
+        self.data[scene_id] = {"key": key, "approved_at": time.time()}
+
+    def revoke(self, scene_id: str):
+        self.data.pop(scene_id, None)
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class IncrementalBuilder:
+    """
+    增量构建器
+
+    按阶段顺序执行：每个阶段先筛出输入 key 变化（或产物缺失）的场景，
+    再交给阶段批量执行，其余场景直接复用 manifest 中的产物。
+    """
+
+    def __init__(
+        self,
+        lesson_dir: str,
+        stages: list = None,
+        storyboard: Union[Storyboard, dict] = None,
+        glossary: dict = None,
+    ):
+        self.lesson_dir = Path(lesson_dir).resolve()
+        self.storyboard_path = self.lesson_dir / "storyboard.json"
+
+        if storyboard is None:
+            storyboard = Storyboard.load(self.storyboard_path)
+        elif isinstance(storyboard, dict):
+            storyboard = Storyboard.from_dict(storyboard, self.storyboard_path)
+        self.storyboard = storyboard
+
+        if glossary is None:
+            glossary_path = self.lesson_dir / "glossary.json"
+            glossary = {}
+            if glossary_path.is_file():
+                with open(glossary_path, "r", encoding="utf-8") as f:
+                    glossary = json.load(f)
+        self.glossary = glossary
+
+        if stages is None:
+            from lessonflow.stages import default_stages
+            stages = default_stages()
+        self.stages = stages
+
+        self.style = load_style(self.storyboard.meta.style)
+        self.manifest = BuildManifest(self.lesson_dir / MANIFEST_PATH)
+        self.approvals = Approvals(self.lesson_dir / APPROVALS_PATH)
+
+    def _contexts(self) -> list:
+        contexts = []
+        for index, scene in enumerate(self.storyboard.scenes):
+            canonical = canonical_scene(scene.raw, self.style, self.glossary)
+            ctx = SceneContext(self.lesson_dir, scene, canonical, index)
+            ctx.approval = self.approvals.get(scene.id)
+            contexts.append(ctx)
+        return contexts
+
+    def approve(self, scene_ids: list = None, revoke: bool = False) -> list:
+        """
+        批准（或撤销）场景进入最终渲染
+
+        批准记录当前的场景渲染 key（与预览共用），场景改动后需要重新批准。
+
+        Returns:
+            list: 处理的场景 ID
+        """
+        render = next((s for s in self.stages if hasattr(s, "scene_key")), None)
+        if render is None:
+            raise RuntimeError("流水线中没有需要审核的渲染阶段")
+
+        contexts = self._contexts()
+        known = {ctx.scene_id for ctx in contexts}
+        unknown = [scene_id for scene_id in scene_ids or [] if scene_id not in known]
+        if unknown:
+            raise ValueError(f"场景不存在: {', '.join(unknown)}")
+
+        selected = [ctx for ctx in contexts if not scene_ids or ctx.scene_id in scene_ids]
+        for ctx in selected:
+            if revoke:
+                self.approvals.revoke(ctx.scene_id)
+            else:
+                self.approvals.approve(ctx.scene_id, render.scene_key(ctx))
+        self.approvals.save()
+        return [ctx.scene_id for ctx in selected]
+
+    def scene_hashes(self) -> dict:
+        """计算所有场景的内容哈希"""
+        return {ctx.scene_id: content_hash(ctx.canonical) for ctx in self._contexts()}
+
+    def _is_fresh(self, entry: Optional[dict], key: str) -> bool:
+        """manifest 记录的 key 一致且产物全部存在"""
+        if not entry or entry.get("key") != key:
+            return False
+        return all((self.lesson_dir / p).exists() for p in entry.get("artifacts", {}).values())
+
+    def build(
+        self,
+        force: bool = False,
+        only_stages: list = None,
+        only_scenes: list = None,
+        dry_run: bool = False,
+    ) -> dict:
+        """
+        执行增量构建
+
+        Args:
+            force: 忽略 manifest，强制执行所有阶段
+            only_stages: 只执行指定阶段（其余阶段仅复用已有产物）
+            only_scenes: 只构建指定场景
+            dry_run: 只计算需要执行的阶段，不实际执行
+
+        Returns:
+            dict: 包含 ran/skipped/failed/blocked/held/pending 列表与耗时
+        """
+        started = time.time()
+        contexts = self._contexts()
+        if only_scenes:
+            contexts = [ctx for ctx in contexts if ctx.scene_id in set(only_scenes)]
+
+        report = {"ran": [], "skipped": [], "failed": [], "blocked": [], "held": [], "pending": []}
+        keys = {ctx.scene_id: {} for ctx in contexts}
+        broken = {ctx.scene_id: set() for ctx in contexts}  # 失败或被阻塞的阶段
+
+        for stage in self.stages:
+            selected = only_stages is None or stage.name in only_stages
+            dirty = []
+
+            for ctx in contexts:
+                scene_id = ctx.scene_id
+                if broken[scene_id] & (set(stage.deps) | set(stage.gates)):
+                    broken[scene_id].add(stage.name)
+                    report["blocked"].append((scene_id, stage.name))
+                    continue
+
+                dep_keys = {dep: keys[scene_id].get(dep) for dep in stage.deps}
+                key = stage.key(ctx, dep_keys)
+                keys[scene_id][stage.name] = key
+                entry = self.manifest.get_stage(scene_id, stage.name)
+                fresh = not force and self._is_fresh(entry, key)
+                held = None if fresh else stage.hold(ctx)
+
+                if fresh:
+                    ctx.artifacts[stage.name] = entry["artifacts"]
+                    report["skipped"].append((scene_id, stage.name))
+                elif held:
+                    # 暂缓的阶段没有可用产物，下游阶段同样等待
+                    broken[scene_id].add(stage.name)
+                    report["held"].append((scene_id, stage.name, held))
+                elif dry_run:
+                    report["pending"].append((scene_id, stage.name))
+                elif not selected:
+                    # 未选中的过期阶段：下游阶段不能基于旧产物构建
+                    broken[scene_id].add(stage.name)
+                    report["pending"].append((scene_id, stage.name))
+                else:
+                    dirty.append((ctx, key))
+
+            if not dirty:
+                continue
+
+            stage_started = time.time()
+            results = stage.run_many([ctx for ctx, _ in dirty])
+            elapsed = (time.time() - stage_started) / len(dirty)
+
+            for (ctx, key), result in zip(dirty, results):
+                if isinstance(result, Exception):
+                    broken[ctx.scene_id].add(stage.name)
+                    report["failed"].append((ctx.scene_id, stage.name, str(result)))
+                    continue
+                ctx.artifacts[stage.name] = result
+                self.manifest.set_stage(ctx.scene_id, stage.name, key, result, elapsed)
+                report["ran"].append((ctx.scene_id, stage.name))
+
+            self.manifest.save()
+
+        if not dry_run:
+            for ctx in contexts:
+                self.manifest.scene(ctx.scene_id)["hash"] = content_hash(ctx.canonical)
+            if not only_scenes:
+                self.manifest.retain({ctx.scene_id for ctx in contexts})
+            self.manifest.save()
+
+        report["elapsed_s"] = round(time.time() - started, 3)
+        return report
+
+    def stamp_hashes(self) -> list:
+        """
+        将场景哈希写回 storyboard.json 的 _hash 字段
+
+        Returns:
+            list: 哈希发生变化的场景 ID
+        """
+        changed = []
+        hashes = self.scene_hashes()
+        for scene in self.storyboard.scenes:
+            new_hash = hashes.get(scene.id)
+            if new_hash and scene.hash_ != new_hash:
+                scene.hash_ = new_hash
+                scene.raw["_hash"] = new_hash
+                changed.append(scene.id)
+
+        if changed:
+            self.storyboard.save(self.storyboard_path)
+        return changed
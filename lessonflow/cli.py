@@ -28,16 +28,324 @@ def create(
 
 @app.command()
 def validate(
-    storyboard: str = typer.Argument(..., help="storyboard.json 文件路径")
+    storyboards: list[str] = typer.Argument(
+        None, help="storyboard.json 路径、目录或 glob（可多个）"
+    ),
+    schema: str = typer.Option(
+        None, "--schema", help="Schema 文件路径（默认 schema/storyboard.schema.json）"
+    ),
+    jobs: int = typer.Option(None, "--jobs", "-j", help="并行验证进程数（--all 时默认 CPU 核数）"),
+    all_documents: bool = typer.Option(
+        False, "--all", help="验证课程目录下所有 storyboard / glossary / style guide"
+    ),
+    root: str = typer.Option(None, "--root", help="--all 扫描的根目录（默认 COURSES_DIR）"),
+    report: str = typer.Option(None, "--report", help="输出 JSON Lines 报告（- 表示标准输出）"),
 ):
-    """验证分镜脚本"""
-    from pathlib import Path
-    import subprocess
+    """验证分镜脚本（单进程内批量验证，Schema 只编译一次）"""
     import sys
-    
-    script_path = Path(__file__).parent.parent / "scripts" / "validate_storyboard.py"
-    result = subprocess.run([sys.executable, str(script_path), storyboard])
-    raise typer.Exit(result.returncode)
+    import time
+    from lessonflow import COURSES_DIR
+    from lessonflow.validation import expand_paths, report_line, validate_paths, validate_tree
+
+    started = time.time()
+    if all_documents:
+        results = validate_tree(root or COURSES_DIR, workers=jobs)
+    else:
+        if not storyboards:
+            typer.echo("❌ 请指定 storyboard.json 路径，或使用 --all")
+            raise typer.Exit(1)
+        paths = expand_paths(storyboards)
+        results = validate_paths(paths, schema_path=schema, workers=jobs)
+
+    report_file = None
+    if report:
+        report_file = sys.stdout if report == "-" else open(report, "w", encoding="utf-8")
+    quiet = report == "-"
+
+    total = failed = 0
+    try:
+        for result in results:
+            total += 1
+            if report_file:
+                report_file.write(report_line(result) + "\n")
+            if result["ok"]:
+                if not quiet and not all_documents:
+                    stats = result["stats"]
+                    typer.echo(
+                        f"✅ {result['path']}（{stats['scene_count']} 个场景，"
+                        f"{stats['total_duration_s']}s，{stats['total_elements']} 个元素）"
+                    )
+                continue
+            failed += 1
+            if quiet:
+                continue
+            typer.echo(f"❌ {result['path']}: {len(result['diagnostics'])} 个问题")
+            for i, diagnostic in enumerate(result["diagnostics"], 1):
+                typer.echo(f"   {i}. {diagnostic}")
+    finally:
+        if report_file and report_file is not sys.stdout:
+            report_file.close()
+
+    if not total:
+        typer.echo("❌ 没有找到需要验证的文件", err=quiet)
+        raise typer.Exit(1)
+    if total > 1 or all_documents:
+        typer.echo(
+            f"\n📊 共 {total} 个文件，通过 {total - failed}，失败 {failed}，"
+            f"耗时 {time.time() - started:.2f}s",
+            err=quiet,
+        )
+    raise typer.Exit(1 if failed else 0)
+
+
+@app.command()
+def build(
+    lesson_dir: str = typer.Argument(..., help="课程目录（包含 storyboard.json）"),
+    force: bool = typer.Option(False, "--force", "-f", help="忽略缓存，重建所有阶段"),
+    stage: list[str] = typer.Option(None, "--stage", help="只执行指定阶段（可多次指定）"),
+    scene: list[str] = typer.Option(None, "--scene", help="只构建指定场景（可多次指定）"),
+    dry_run: bool = typer.Option(False, "--dry-run", help="只列出需要执行的阶段"),
+    workers: int = typer.Option(None, "--workers", "-j", help="并行渲染进程数（默认 CPU 核数）"),
+    tts: str = typer.Option(
+        None, "--tts", help="TTS 后端: aliyun / offline（默认读取 LESSONFLOW_TTS_BACKEND）"
+    ),
+    quality: str = typer.Option(
+        None, "--quality", "-q", help="最终渲染质量 l/m/h/k（默认读取 MANIM_QUALITY）"
+    ),
+):
+    """增量构建课程：只重新执行输入发生变化的场景阶段（最终渲染只针对已批准的场景）"""
+    from lessonflow.build import IncrementalBuilder
+    from lessonflow.stages import DEFAULT_QUALITY, default_stages
+
+    stages = default_stages(quality=quality or DEFAULT_QUALITY, workers=workers, tts_backend=tts)
+    builder = IncrementalBuilder(lesson_dir, stages=stages)
+    typer.echo(f"🔨 增量构建: {builder.lesson_dir}")
+
+    report = builder.build(
+        force=force,
+        only_stages=stage or None,
+        only_scenes=scene or None,
+        dry_run=dry_run,
+    )
+
+    if dry_run:
+        typer.echo(f"\n📋 需要执行 {len(report['pending'])} 个阶段:")
+        for scene_id, stage_name in report["pending"]:
+            typer.echo(f"   - {scene_id} / {stage_name}")
+        raise typer.Exit(0)
+
+    changed = builder.stamp_hashes()
+    if changed:
+        typer.echo(f"🔖 更新 _hash: {', '.join(changed)}")
+
+    for scene_id, stage_name in report["ran"]:
+        typer.echo(f"   ✅ {scene_id} / {stage_name}")
+    for scene_id, stage_name, error in report["failed"]:
+        typer.echo(f"   ❌ {scene_id} / {stage_name}: {error}")
+    for scene_id, stage_name, reason in report["held"]:
+        typer.echo(f"   ⏸️ {scene_id} / {stage_name}: {reason}")
+
+    voice_stage = next((s for s in stages if s.name == "voice"), None)
+    tts_stats = voice_stage.cache_stats() if voice_stage else None
+    if tts_stats:
+        typer.echo(
+            f"🎙️ TTS 请求 {tts_stats['misses']} 次，缓存命中 {tts_stats['hits']} 次，"
+            f"节省 {tts_stats['characters_saved']} 字符（约 ¥{tts_stats['cost_saved_cny']}）"
+        )
+
+    typer.echo(
+        f"\n📊 执行 {len(report['ran'])}，跳过 {len(report['skipped'])}，"
+        f"失败 {len(report['failed'])}，阻塞 {len(report['blocked'])}，"
+        f"待审核 {len(report['held'])}，"
+        f"耗时 {report['elapsed_s']}s"
+    )
+    raise typer.Exit(1 if report["failed"] else 0)
+
+
+@app.command()
+def approve(
+    lesson_dir: str = typer.Argument(..., help="课程目录"),
+    scenes: list[str] = typer.Argument(None, help="批准的场景 ID（默认全部）"),
+    revoke: bool = typer.Option(False, "--revoke", help="撤销批准"),
+):
+    """审核预览后批准场景进入最终质量渲染"""
+    from lessonflow.build import IncrementalBuilder
+
+    builder = IncrementalBuilder(lesson_dir)
+    try:
+        scene_ids = builder.approve(scenes or None, revoke=revoke)
+    except (RuntimeError, ValueError) as e:
+        typer.echo(f"❌ {e}")
+        raise typer.Exit(1)
+
+    action = "撤销批准" if revoke else "已批准"
+    typer.echo(f"✅ {action} {len(scene_ids)} 个场景: {', '.join(scene_ids)}")
+    if not revoke:
+        typer.echo(f"   运行 lessonflow build {lesson_dir} 进行最终渲染")
+
+
+@app.command()
+def post(
+    lesson_dir: str = typer.Argument(..., help="课程目录（需先运行 lessonflow build）"),
+    hardsub: bool = typer.Option(True, "--hardsub/--no-hardsub", help="输出硬字幕版"),
+    softsub: bool = typer.Option(True, "--softsub/--no-softsub", help="输出软字幕版"),
+    plain: bool = typer.Option(False, "--plain", help="额外输出无字幕版"),
+    thumbnail_at: float = typer.Option(25.0, "--thumbnail-at", help="封面截取时间（秒）"),
+    resolution: list[int] = typer.Option(
+        None, "--resolution", "-r", help="额外输出的硬字幕分辨率高度，如 720（可多次指定）"
+    ),
+    source: str = typer.Option(
+        None, "--source", help="直接处理完整源视频（不使用增量构建的场景片段）"
+    ),
+    audio: str = typer.Option(
+        None, "--audio", help="配合 --source：替换源音轨的整课旁白（lessonflow audio 生成）"
+    ),
+    hls: bool = typer.Option(
+        False, "--hls", help="同时输出 HLS 码率阶梯（1080p/720p/480p + WebVTT，按场景增量编码）"
+    ),
+):
+    """后期合成：一次 FFmpeg 调用输出最终视频、其他分辨率、整课字幕和封面"""
+    from lessonflow.post import assemble_lesson, post_source
+
+    if hls and source:
+        typer.echo("❌ --hls 基于增量构建的场景片段，不能与 --source 同时使用")
+        raise typer.Exit(1)
+
+    typer.echo(f"🎬 后期合成: {lesson_dir}")
+    try:
+        if source:
+            result = post_source(
+                source,
+                lesson_dir,
+                subtitle=f"{lesson_dir}/subs/full_lesson.srt",
+                audio=audio,
+                hardsub=hardsub,
+                softsub=softsub,
+                plain=plain,
+                thumbnail_at_s=thumbnail_at,
+                resolutions=resolution or None,
+            )
+        else:
+            result = assemble_lesson(
+                lesson_dir,
+                hardsub=hardsub,
+                softsub=softsub,
+                plain=plain,
+                thumbnail_at_s=thumbnail_at,
+                resolutions=resolution or None,
+            )
+    except (RuntimeError, ValueError) as e:
+        typer.echo(f"❌ {e}")
+        raise typer.Exit(1)
+
+    for warning in result["warnings"]:
+        typer.echo(f"⚠️ {warning}")
+    mode = "流复制" if result["stream_copy"] else "重新编码"
+    typer.echo(f"✅ 合成完成（{mode}，总时长 {result['duration_s']}s）")
+    for name, path in result["outputs"].items():
+        typer.echo(f"   - {name}: {path}")
+
+    if hls:
+        from lessonflow.hls import build_hls
+
+        typer.echo("📡 生成 HLS 码率阶梯...")
+        try:
+            ladder = build_hls(lesson_dir)
+        except (RuntimeError, ValueError) as e:
+            typer.echo(f"❌ {e}")
+            raise typer.Exit(1)
+        for warning in ladder["warnings"]:
+            if warning not in result["warnings"]:
+                typer.echo(f"⚠️ {warning}")
+        typer.echo(
+            f"✅ HLS 完成（{' / '.join(ladder['renditions'])}，"
+            f"重新编码 {len(ladder['encoded'])} 个场景，复用 {len(ladder['reused'])} 个）"
+        )
+        typer.echo(f"   - master: {ladder['master']}")
+
+
+@app.command()
+def audio(
+    lesson_dir: str = typer.Argument(..., help="课程目录（需先运行 lessonflow build 生成配音）"),
+    output: str = typer.Option(
+        None, "--output", "-o", help="输出 WAV（默认 audio/full_lesson.wav）"
+    ),
+    target_lufs: float = typer.Option(
+        None, "--target-lufs", help="目标响度（默认读取 LESSONFLOW_TARGET_LUFS）"
+    ),
+    music: str = typer.Option(None, "--music", help="背景音乐（旁白期间自动压低）"),
+    duck_db: float = typer.Option(None, "--duck-db", help="旁白期间音乐压低的分贝数（负数）"),
+    video_timeline: bool = typer.Option(
+        False, "--video-timeline", help="按 storyboard 场景时间排列（配合 post --source）"
+    ),
+):
+    """生成整课旁白音轨：按时间轴拼接场景配音、响度标准化、可选混入背景音乐"""
+    from lessonflow.audio import DUCK_DB, TARGET_LUFS, build_narration_track
+
+    typer.echo(f"🎧 整课音轨: {lesson_dir}")
+    try:
+        result = build_narration_track(
+            lesson_dir,
+            output=output,
+            target_lufs=TARGET_LUFS if target_lufs is None else target_lufs,
+            music=music,
+            duck_db=DUCK_DB if duck_db is None else duck_db,
+            video_timeline=video_timeline,
+        )
+    except (RuntimeError, ValueError, OSError) as e:
+        typer.echo(f"❌ {e}")
+        raise typer.Exit(1)
+
+    typer.echo(
+        f"✅ {result['scenes']} 个场景，总时长 {result['duration_s']}s，"
+        f"响度 {result['measured_lufs']} → {result['target_lufs']} LUFS"
+        f"（增益 {result['gain_db']} dB）"
+    )
+    if result["music"]:
+        typer.echo(f"   🎵 背景音乐: {result['music']}")
+    typer.echo(f"   - {result['output']}")
+
+
+cache_app = typer.Typer(help="TTS 音频缓存管理")
+app.add_typer(cache_app, name="cache")
+
+
+@cache_app.command("stats")
+def cache_stats():
+    """显示 TTS 缓存统计"""
+    from lessonflow.tts_cache import TTSCache
+
+    stats = TTSCache().stats()
+    typer.echo(f"📦 缓存目录: {stats['path']}")
+    typer.echo(f"   条目数: {stats['entries']}")
+    typer.echo(
+        f"   占用: {stats['size_bytes'] / 1024 / 1024:.1f} MB"
+        f" / {stats['max_bytes'] / 1024 / 1024:.0f} MB"
+    )
+    typer.echo(
+        f"   命中: {stats['hits']}，未命中: {stats['misses']}"
+        f"（命中率 {stats['hit_rate']:.1%}）"
+    )
+    typer.echo(f"   累计节省: {stats['characters_saved']} 字符（约 ¥{stats['cost_saved_cny']}）")
+
+
+@cache_app.command("prune")
+def cache_prune(
+    max_mb: float = typer.Option(None, "--max-mb", help="淘汰到不超过该大小（MB）"),
+    older_than_days: float = typer.Option(
+        None, "--older-than-days", help="删除超过该天数未使用的条目"
+    ),
+    clear: bool = typer.Option(False, "--all", help="清空全部缓存"),
+):
+    """按 LRU 清理 TTS 缓存"""
+    from lessonflow.tts_cache import TTSCache
+
+    max_bytes = 0 if clear else (int(max_mb * 1024 * 1024) if max_mb is not None else None)
+    removed = TTSCache().prune(max_bytes=max_bytes, older_than_days=older_than_days)
+    typer.echo(
+        f"🧹 删除 {removed['entries']} 个条目（{removed['bytes'] / 1024 / 1024:.1f} MB），"
+        f"{removed['orphans']} 个孤立文件"
+    )
 
 
 @app.command()
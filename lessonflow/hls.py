@@ -0,0 +1,287 @@
+"""
+LessonFlowAI - HLS 多码率输出
+
+把增量构建产出的场景片段（segments/<scene_id>.mp4）编码为 HLS 码率阶梯：
+- 每个场景只解码一次，split 后同时编码 1080p / 720p / 480p（不超过源分辨率）
+- 各码率使用相同的强制关键帧时间点、关闭场景切换关键帧，分片边界完全对齐；
+  场景边界一定是分片边界，场景之间以 EXT-X-DISCONTINUITY 衔接
+- 以场景为单位增量：片段内容与编码参数不变的场景直接复用已有分片，
+  修改一个场景只重新编码该场景
+- 字幕为 WebVTT 播放列表，每个场景一个分片，X-TIMESTAMP-MAP 对齐该场景的 TS 时间戳
+
+输出目录 final/hls/：master.m3u8、<码率>/index.m3u8 与分片、subs/index.m3u8 与 VTT。
+"""
+
+import json
+import math
+import os
+import shutil
+import tempfile
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from lessonflow.build import content_hash, file_hash
+from lessonflow.post import STREAM_KEYS, built_lesson, probe, run_ffmpeg, video_encoder_args
+from lessonflow.subtitles import load_cues, write_vtt
+
+# 目标分片时长（秒）；每个场景按自身时长均分，分片时长接近该值
+SEGMENT_S = float(os.getenv("LESSONFLOW_HLS_SEGMENT_S", "4"))
+
+# 增量状态文件（相对 HLS 输出目录）
+STATE_FILE = ".state.json"
+
+# 关键帧只由 force_key_frames 决定（GOP 上限取足够大的值）
+MAX_GOP = 9999
+
+
+@dataclass
+class Rendition:
+    """码率阶梯中的一档"""
+    height: int
+    maxrate: str  # 视频码率上限（CRF 编码 + VBV 限制峰值）
+    audio_bitrate: str = "128k"
+
+    @property
+    def name(self) -> str:
+        return f"{self.height}p"
+
+    @property
+    def bufsize(self) -> str:
+        """VBV 缓冲：两倍码率上限"""
+        value, unit = self.maxrate[:-1], self.maxrate[-1]
+        return f"{int(float(value) * 2)}{unit}"
+
+
+# 默认码率阶梯
+LADDER = (
+    Rendition(1080, "5000k"),
+    Rendition(720, "2800k"),
+    Rendition(480, "1400k", "96k"),
+)
+
+
+def select_ladder(source_height: int, ladder: tuple = LADDER) -> list:
+    """去掉高于源分辨率的档位（不放大），至少保留最低一档"""
+    selected = [r for r in ladder if r.height <= source_height]
+    return selected or [min(ladder, key=lambda r: r.height)]
+
+
+def keyframe_times(duration_s: float, segment_s: float = SEGMENT_S) -> list:
+    """场景内的关键帧（即分片起点）时间：按场景时长均分，分片时长接近 segment_s"""
+    count = max(1, round(duration_s / segment_s))
+    step = duration_s / count
+    return [round(i * step, 3) for i in range(count)]
+
+
+def scene_encode_args(segment: Path, out_dir: Path, scene_id: str, renditions: list,
+                      keyframes: list, playlist_dir: Path) -> list:
+    """
+    单个场景的编码参数：解码一次，split 到各码率，每档输出一组 TS 分片
+
+    各档的场景播放列表写入 playlist_dir（只用于读取分片时长）。
+    """
+    names = [f"v{r.height}" for r in renditions]
+    split = f"split={len(renditions)}" + "".join(f"[{name}]" for name in names)
+    scales = [f"[v{r.height}]scale=-2:{r.height}[o{r.height}]" for r in renditions]
+    args = ["-i", str(segment), "-filter_complex", ";".join([f"[0:v]{split}", *scales])]
+
+    # 分片时长阈值取最短关键帧间隔的一半：每个强制关键帧都会切出新分片
+    gaps = [b - a for a, b in zip(keyframes, keyframes[1:])] or [SEGMENT_S]
+    hls_time = max(min(gaps) / 2, 0.1)
+    for rendition in renditions:
+        target = out_dir / rendition.name
+        args += [
+            "-map", f"[o{rendition.height}]", "-map", "0:a?",
+            *video_encoder_args(),
+            "-maxrate", rendition.maxrate, "-bufsize", rendition.bufsize,
+            "-force_key_frames", ",".join(f"{t:.3f}" for t in keyframes),
+            "-g", str(MAX_GOP), "-sc_threshold", "0",
+            "-c:a", "aac", "-b:a", rendition.audio_bitrate, "-ac", "2",
+            "-f", "hls", "-hls_time", f"{hls_time:.3f}", "-hls_playlist_type", "vod",
+            "-hls_segment_filename", str(target / f"{scene_id}_%03d.ts"),
+            str(playlist_dir / f"{rendition.name}.m3u8"),
+        ]
+    return args
+
+
+def read_playlist(path: Path) -> list:
+    """读取 FFmpeg 写出的播放列表，返回 [(分片文件名, 时长)]"""
+    segments, duration = [], None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("#EXTINF:"):
+                duration = float(line[len("#EXTINF:"):].split(",")[0])
+            elif line and not line.startswith("#"):
+                segments.append((Path(line).name, duration))
+    return segments
+
+
+def write_media_playlist(path: Path, scenes: list):
+    """
+    写出媒体播放列表
+
+    Args:
+        scenes: 按场景分组的分片 [[(URI, 时长), ...], ...]，场景之间插入 EXT-X-DISCONTINUITY
+    """
+    durations = [duration for scene in scenes for _, duration in scene]
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        f"#EXT-X-TARGETDURATION:{math.ceil(max(durations, default=0))}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+    ]
+    for i, scene in enumerate(scenes):
+        if i:
+            lines.append("#EXT-X-DISCONTINUITY")
+        for uri, duration in scene:
+            lines += [f"#EXTINF:{duration:.3f},", uri]
+    lines.append("#EXT-X-ENDLIST")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def _bandwidth(directory: Path, segments: list) -> tuple:
+    """按实际分片大小计算峰值与平均码率（bit/s）"""
+    peak, total_bits, total_s = 0, 0, 0.0
+    for name, duration in segments:
+        bits = (directory / name).stat().st_size * 8
+        peak = max(peak, int(bits / max(duration, 1e-3)))
+        total_bits += bits
+        total_s += duration
+    return peak, int(total_bits / max(total_s, 1e-3))
+
+
+def build_hls(lesson_dir: str, ladder: tuple = LADDER, segment_s: float = SEGMENT_S,
+              force: bool = False) -> dict:
+    """
+    生成（或增量更新）整课 HLS 码率阶梯
+
+    依赖 `lessonflow build` 产出的 mux / subtitles 阶段产物。
+
+    Returns:
+        dict: master 播放列表路径、各档位、重新编码/复用的场景与警告
+    """
+    lesson_dir, scene_ids, artifact, warnings = built_lesson(lesson_dir, ["mux", "subtitles"])
+    out_dir = lesson_dir / "final" / "hls"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    state_path = out_dir / STATE_FILE
+    state = {}
+    if state_path.is_file() and not force:
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+
+    first = probe(artifact(scene_ids[0], "mux", "segment"))
+    width_index, height_index = STREAM_KEYS.index("width"), STREAM_KEYS.index("height")
+    source = next(s for s in first["streams"] if s[0] == "video")
+    renditions = select_ladder(source[height_index], ladder)
+    aspect = source[width_index] / source[height_index]
+
+    encoded, reused = [], []
+    for scene_id in scene_ids:
+        segment = artifact(scene_id, "mux", "segment")
+        key = content_hash({
+            "segment": file_hash(segment),
+            "ladder": [asdict(r) for r in renditions],
+            "segment_s": segment_s,
+            "encoder": video_encoder_args(),
+        })
+        entry = state.get(scene_id)
+        fresh = entry and entry["key"] == key and all(
+            (out_dir / name / uri).is_file()
+            for name, segments in entry["renditions"].items() for uri, _ in segments
+        )
+        if fresh:
+            reused.append(scene_id)
+            continue
+
+        for rendition in renditions:
+            (out_dir / rendition.name).mkdir(exist_ok=True)
+            for old in (out_dir / rendition.name).glob(f"{scene_id}_*.ts"):
+                old.unlink()
+        keyframes = keyframe_times(probe(segment)["duration"], segment_s)
+        with tempfile.TemporaryDirectory(prefix="lessonflow-hls-") as tmp_dir:
+            run_ffmpeg(scene_encode_args(
+                segment, out_dir, scene_id, renditions, keyframes, Path(tmp_dir)
+            ))
+            playlists = {
+                r.name: read_playlist(Path(tmp_dir) / f"{r.name}.m3u8") for r in renditions
+            }
+        first_ts = out_dir / renditions[0].name / playlists[renditions[0].name][0][0]
+        state[scene_id] = {
+            "key": key,
+            "renditions": playlists,
+            # 场景 TS 的起始时间戳（90kHz），字幕分片据此对齐
+            "mpegts": round(probe(first_ts)["start"] * 90000),
+        }
+        encoded.append(scene_id)
+
+        counts = {len(segments) for segments in playlists.values()}
+        if len(counts) > 1:
+            warnings.append(f"{scene_id} 各码率分片数不一致: {counts}")
+
+    # 删除已不在 storyboard 中的场景
+    for scene_id in set(state) - set(scene_ids):
+        for name in state[scene_id]["renditions"]:
+            for uri, _ in state[scene_id]["renditions"][name]:
+                (out_dir / name / uri).unlink(missing_ok=True)
+        (out_dir / "subs" / f"{scene_id}.vtt").unlink(missing_ok=True)
+        del state[scene_id]
+
+    # 媒体播放列表
+    variants = []
+    for rendition in renditions:
+        scenes = [state[scene_id]["renditions"][rendition.name] for scene_id in scene_ids]
+        write_media_playlist(out_dir / rendition.name / "index.m3u8", scenes)
+        peak, average = _bandwidth(
+            out_dir / rendition.name, [s for scene in scenes for s in scene]
+        )
+        width = round(rendition.height * aspect / 2) * 2
+        variants.append((rendition, width, peak, average))
+
+    # 字幕：每个场景一个 VTT 分片（场景内相对时间）
+    subtitle_scenes = []
+    for scene_id in scene_ids:
+        vtt = write_vtt(
+            load_cues(artifact(scene_id, "subtitles", "cues")),
+            out_dir / "subs" / f"{scene_id}.vtt",
+            timestamp_map=f"MPEGTS:{state[scene_id]['mpegts']},LOCAL:00:00:00.000",
+        )
+        duration = sum(d for _, d in state[scene_id]["renditions"][renditions[0].name])
+        subtitle_scenes.append([(vtt.name, duration)])
+    write_media_playlist(out_dir / "subs" / "index.m3u8", subtitle_scenes)
+
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        "#EXT-X-INDEPENDENT-SEGMENTS",
+        '#EXT-X-MEDIA:TYPE=SUBTITLES,GROUP-ID="subs",NAME="中文",LANGUAGE="zh",'
+        'DEFAULT=YES,AUTOSELECT=YES,URI="subs/index.m3u8"',
+    ]
+    for rendition, width, peak, average in variants:
+        lines += [
+            f"#EXT-X-STREAM-INF:BANDWIDTH={peak},AVERAGE-BANDWIDTH={average},"
+            f'RESOLUTION={width}x{rendition.height},SUBTITLES="subs"',
+            f"{rendition.name}/index.m3u8",
+        ]
+    master = out_dir / "master.m3u8"
+    master.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    tmp_path = state_path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, state_path)
+
+    # 不再使用的档位（如源分辨率降低）
+    for stale in out_dir.iterdir():
+        if stale.is_dir() and stale.name not in {r.name for r in renditions} | {"subs"}:
+            shutil.rmtree(stale)
+
+    return {
+        "master": str(master),
+        "renditions": [r.name for r in renditions],
+        "encoded": encoded,
+        "reused": reused,
+        "warnings": warnings,
+    }
@@ -0,0 +1,216 @@
+"""
+LessonFlowAI - LaTeX 公式批量排版
+
+渲染前收集 storyboard 中所有 formula 元素，只启动一次 LaTeX：
+- 所有公式写入同一个文档，每个公式单独一页（standalone multi 模式）
+- 一次 latex + 一次 dvisvgm 输出多页 SVG
+- 按 Manim 的 tex 哈希文件名放入共享 SVG 缓存（tex_dir），
+  场景中的 MathTex 构造时直接命中缓存，不再逐个调用 LaTeX
+
+LaTeX 编译失败不影响渲染：未命中缓存的公式由 Manim 照常逐个排版。
+缓存文件名依赖 Manim 内部的表达式规范化（SingleStringMathTex._get_modified_expression），
+只支持 pyproject.toml 中固定的 Manim 版本范围；版本或接口不符时直接报错，
+而不是静默退回逐个排版。
+"""
+
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+
+from lessonflow.render import SVG_CACHE_DIR
+
+# 批量文档中每页公式的环境名
+BATCH_ENVIRONMENT = "lfformula"
+
+# MathTex 使用的公式环境
+MATH_ENVIRONMENT = "align*"
+
+# 批量排版超时（秒）
+DEFAULT_TIMEOUT_S = 300
+
+# 已验证的 Manim 版本范围 [最低, 最高)，与 pyproject.toml 一致
+SUPPORTED_MANIM = ((0, 18), (0, 20))
+
+
+def formula_expressions(scenes: list) -> list:
+    """收集场景中所有 formula 元素的 LaTeX（去重，保持出现顺序）"""
+    expressions = {}
+    for scene in scenes:
+        for element in scene.visual.elements:
+            if element.type == "formula" and element.content:
+                expressions.setdefault(element.content, None)
+    return list(expressions)
+
+
+def svg_cache_dir() -> Path:
+    """与渲染进程一致的 Tex SVG 缓存目录"""
+    return Path(os.getenv("LESSONFLOW_SVG_CACHE_DIR", SVG_CACHE_DIR)).expanduser() / "Tex"
+
+
+def check_manim_tex_api(single_string_math_tex) -> str:
+    """
+    检查 Manim 版本与批量排版依赖的内部接口
+
+    Returns:
+        str: Manim 版本号
+
+    Raises:
+        RuntimeError: 版本不在 SUPPORTED_MANIM 范围内，或内部接口已变化
+    """
+    try:
+        manim_version = version("manim")
+    except PackageNotFoundError:
+        manim_version = "unknown"
+    parsed = tuple(int(part) for part in re.findall(r"\d+", manim_version)[:2])
+    low, high = SUPPORTED_MANIM
+    supported = "{}.{} ~ {}.{}".format(*low, *high)
+    if not low <= parsed < high:
+        raise RuntimeError(
+            f"公式批量排版不支持 Manim {manim_version}（支持 {supported}，不含上限），"
+            "请安装 pyproject.toml 中固定的版本"
+        )
+    if not callable(getattr(single_string_math_tex, "_get_modified_expression", None)):
+        raise RuntimeError(
+            f"Manim {manim_version} 缺少 SingleStringMathTex._get_modified_expression，"
+            "公式批量排版无法计算缓存文件名"
+        )
+    return manim_version
+
+
+def _batch_document(tex_template, expressions: list) -> str:
+    """将多个公式写入同一文档，每个公式一页"""
+    documentclass = tex_template.documentclass
+    if "{standalone}" not in documentclass:
+        raise ValueError(f"不支持的 LaTeX 文档类: {documentclass}")
+    if "[" in documentclass:
+        documentclass = documentclass.replace("[", f"[multi={BATCH_ENVIRONMENT},", 1)
+    else:
+        documentclass = documentclass.replace(
+            "{standalone}", f"[multi={BATCH_ENVIRONMENT}]{{standalone}}"
+        )
+
+    pages = "\n".join(
+        f"\\begin{{{BATCH_ENVIRONMENT}}}\n"
+        f"\\begin{{{MATH_ENVIRONMENT}}}\n{expression}\n\\end{{{MATH_ENVIRONMENT}}}\n"
+        f"\\end{{{BATCH_ENVIRONMENT}}}"
+        for expression in expressions
+    )
+    body = tex_template.body.replace(tex_template.documentclass, documentclass, 1)
+    return body.replace(tex_template.placeholder_text, pages)
+
+
+def _compile_command(tex_template, tex_file: Path) -> list:
+    """LaTeX 编译命令（与 Manim 的编译参数一致）"""
+    compiler = tex_template.tex_compiler
+    output_format = tex_template.output_format.lstrip(".")
+    if compiler in ("latex", "pdflatex") and output_format == "dvi":
+        extra = ["-output-format=dvi"]
+    elif compiler == "xelatex" and output_format == "xdv":
+        extra = ["-no-pdf"]
+    else:
+        raise ValueError(f"不支持的 LaTeX 编译器: {compiler} ({output_format})")
+    return [
+        compiler, "-interaction=batchmode", "-halt-on-error", *extra,
+        f"-output-directory={tex_file.parent}", str(tex_file),
+    ]
+
+
+def typeset_batch(expressions: list, timeout_s: float = DEFAULT_TIMEOUT_S) -> dict:
+    """
+    批量排版公式并写入共享 SVG 缓存
+
+    Returns:
+        dict: {"total", "cached", "typeset", "error"}；error 非空时表示已退回逐个排版
+
+    Raises:
+        RuntimeError: Manim 版本或内部接口不受支持（见 check_manim_tex_api）
+    """
+    result = {"total": len(expressions), "cached": 0, "typeset": 0, "error": None}
+    if not expressions:
+        return result
+
+    try:
+        from manim import config, tempconfig
+        from manim.mobject.text.tex_mobject import SingleStringMathTex
+        from manim.utils.tex_file_writing import generate_tex_file
+    except ImportError as e:
+        result["error"] = f"未安装 Manim: {e}"
+        return result
+
+    check_manim_tex_api(SingleStringMathTex)
+    tex_dir = svg_cache_dir()
+    tex_dir.mkdir(parents=True, exist_ok=True)
+    # 只借用表达式规范化逻辑，不构造 Mobject
+    normalizer = SingleStringMathTex.__new__(SingleStringMathTex)
+
+    with tempconfig({"tex_dir": str(tex_dir)}):
+        tex_template = config.tex_template
+        pending = []
+        for expression in expressions:
+            modified = normalizer._get_modified_expression(expression)
+            # 文件名即 Manim 构造 MathTex 时查找的 tex 哈希
+            tex_file = generate_tex_file(modified, MATH_ENVIRONMENT, tex_template)
+            svg_file = Path(tex_file).with_suffix(".svg")
+            if svg_file.is_file():
+                result["cached"] += 1
+            else:
+                pending.append((modified, svg_file))
+
+        if not pending:
+            return result
+
+        with tempfile.TemporaryDirectory(prefix="lessonflow-tex-") as work_dir:
+            try:
+                document = _batch_document(tex_template, [modified for modified, _ in pending])
+                pages = _run_batch(tex_template, document, len(pending), Path(work_dir), timeout_s)
+            except (OSError, ValueError, RuntimeError, subprocess.TimeoutExpired) as e:
+                result["error"] = str(e)
+                return result
+
+            for page, (_, svg_file) in zip(pages, pending):
+                tmp_path = svg_file.with_suffix(f".svg.{os.getpid()}.tmp")
+                shutil.copyfile(page, tmp_path)
+                os.replace(tmp_path, svg_file)  # 并发构建时不会读到半个文件
+                result["typeset"] += 1
+
+    return result
+
+
+def _run_batch(tex_template, document: str, page_count: int, work_dir: Path,
+               timeout_s: float) -> list:
+    """编译批量文档并拆分为单页 SVG，返回按页码排序的 SVG 路径"""
+    tex_file = work_dir / "batch.tex"
+    tex_file.write_text(document, encoding="utf-8")
+
+    compiled = subprocess.run(
+        _compile_command(tex_template, tex_file),
+        cwd=work_dir, capture_output=True, text=True, timeout=timeout_s,
+    )
+    dvi_file = tex_file.with_suffix(tex_template.output_format)
+    if compiled.returncode != 0 or not dvi_file.is_file():
+        log = tex_file.with_suffix(".log")
+        errors = [
+            line for line in (log.read_text(errors="replace").splitlines() if log.is_file() else [])
+            if line.startswith("!")
+        ]
+        raise RuntimeError(f"LaTeX 批量编译失败: {'; '.join(errors[:3]) or compiled.returncode}")
+
+    converted = subprocess.run(
+        ["dvisvgm", str(dvi_file), "--page=1-", "--no-fonts", "--verbosity=0",
+         f"--output={work_dir / 'page-%p.svg'}"],
+        cwd=work_dir, capture_output=True, text=True, timeout=timeout_s,
+    )
+    if converted.returncode != 0:
+        raise RuntimeError(f"dvisvgm 转换失败: {converted.stderr.strip()[-300:]}")
+
+    pages = sorted(
+        work_dir.glob("page-*.svg"),
+        key=lambda p: int(re.search(r"(\d+)", p.stem).group(1)),
+    )
+    if len(pages) != page_count:
+        raise RuntimeError(f"批量排版页数不符: 期望 {page_count} 页，得到 {len(pages)} 页")
+    return pages
@@ -0,0 +1,491 @@
+"""
+LessonFlowAI - 后期合成
+
+将增量构建产出的单场景片段拼接为整课视频：
+- 片段编码参数一致时使用 concat demuxer 流复制拼接，不重新编码
+- 硬字幕按场景烧录（由构建阶段 hardsub 完成，字幕未变的场景复用已有片段）
+- 软字幕在拼接时直接封装为 mov_text 字幕轨，不额外写出无字幕副本
+- 所有版本、其他分辨率与封面由一次 FFmpeg 调用产出（single_pass_args），源画面最多解码一次
+"""
+
+import json
+import os
+import subprocess
+import tempfile
+from pathlib import Path
+
+from lessonflow.build import MANIFEST_PATH, BuildManifest, IncrementalBuilder
+from lessonflow.subtitles import load_cues, offset_cues, write_ass, write_srt, write_vtt
+
+# 硬字幕样式（ASS force_style）
+HARDSUB_STYLE = (
+    "FontName=PingFang SC,FontSize=24,PrimaryColour=&HFFFFFF&,OutlineColour=&H000000&,"
+    "BackColour=&H80000000,Outline=2,Shadow=1,MarginV=50"
+)
+
+# 需要一致才能流复制拼接的流参数
+STREAM_KEYS = (
+    "codec_type", "codec_name", "profile", "width", "height", "pix_fmt",
+    "time_base", "r_frame_rate", "sample_rate", "channels",
+)
+
+
+def ffmpeg_binary() -> str:
+    """FFmpeg 可执行文件（可通过 FFMPEG_PATH 指定）"""
+    return os.getenv("FFMPEG_PATH", "ffmpeg")
+
+
+def ffprobe_binary() -> str:
+    """FFprobe 可执行文件（默认与 FFmpeg 同目录）"""
+    ffmpeg = ffmpeg_binary()
+    if os.sep in ffmpeg:
+        return str(Path(ffmpeg).with_name("ffprobe"))
+    return "ffprobe"
+
+
+def video_encoder_args() -> list:
+    """视频编码参数（可通过 VIDEO_ENCODER / VIDEO_CRF 配置）"""
+    return [
+        "-c:v", os.getenv("VIDEO_ENCODER", "libx264"),
+        "-crf", os.getenv("VIDEO_CRF", "18"),
+        "-preset", "medium",
+    ]
+
+
+def run_ffmpeg(args: list, cwd: Path = None):
+    """执行 FFmpeg，失败时抛出 RuntimeError"""
+    result = subprocess.run(
+        [ffmpeg_binary(), "-y", "-hide_banner", "-loglevel", "error", *args],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"FFmpeg 执行失败: {result.stderr.strip()[-500:]}")
+
+
+def probe(path: Path) -> dict:
+    """读取媒体文件的流参数与时长"""
+    result = subprocess.run(
+        [
+            ffprobe_binary(), "-v", "error",
+            "-show_entries", "format=duration,start_time:stream=" + ",".join(STREAM_KEYS),
+            "-of", "json", str(path),
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"FFprobe 执行失败: {path}: {result.stderr.strip()}")
+    info = json.loads(result.stdout)
+    return {
+        "duration": float(info.get("format", {}).get("duration", 0)),
+        "start": float(info.get("format", {}).get("start_time", 0)),
+        "streams": [
+            tuple(stream.get(key) for key in STREAM_KEYS)
+            for stream in info.get("streams", [])
+        ],
+    }
+
+
+def burn_subtitles(segment: Path, srt: Path, output: Path, cwd: Path = None):
+    """为单个场景片段烧录硬字幕（音频流直接复制）"""
+    output.parent.mkdir(parents=True, exist_ok=True)
+    run_ffmpeg([
+        "-i", str(segment),
+        "-vf", f"subtitles={srt}:force_style='{HARDSUB_STYLE}'",
+        *video_encoder_args(),
+        "-c:a", "copy",
+        str(output),
+    ], cwd=cwd)
+
+
+def concat_input(segments: list, list_path: Path) -> list:
+    """写出 concat demuxer 列表，返回对应的 FFmpeg 输入参数"""
+    with open(list_path, "w", encoding="utf-8") as f:
+        for segment in segments:
+            escaped = str(Path(segment).resolve()).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    return ["-f", "concat", "-safe", "0", "-i", str(list_path)]
+
+
+def stream_compatible(probes: list) -> bool:
+    """所有片段流参数一致（可以流复制拼接）"""
+    return len({tuple(p["streams"]) for p in probes}) == 1
+
+
+def concat_segments(
+    segments: list,
+    output: Path,
+    subtitle: Path = None,
+    probes: list = None,
+) -> bool:
+    """
+    拼接场景片段
+
+    所有片段流参数一致时使用 concat demuxer 流复制，否则回退到 concat 滤镜重新编码。
+
+    Args:
+        segments: 按顺序排列的片段路径
+        output: 输出文件
+        subtitle: 可选，封装为软字幕轨的 SRT 文件
+        probes: 可选，已有的 probe() 结果（避免重复探测）
+
+    Returns:
+        bool: 是否使用了流复制
+    """
+    probes = probes or [probe(p) for p in segments]
+    stream_copy = stream_compatible(probes)
+
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if stream_copy:
+            args = concat_input(segments, Path(tmp_dir) / "concat.txt")
+            maps = ["-map", "0:v", "-map", "0:a?"]
+            codecs = ["-c", "copy"]
+        else:
+            args = []
+            for segment in segments:
+                args += ["-i", str(segment)]
+            inputs = "".join(f"[{i}:v][{i}:a]" for i in range(len(segments)))
+            args += ["-filter_complex", f"{inputs}concat=n={len(segments)}:v=1:a=1[v][a]"]
+            maps = ["-map", "[v]", "-map", "[a]"]
+            codecs = [*video_encoder_args(), "-c:a", "aac", "-b:a", "192k"]
+
+        if subtitle:
+            args += ["-i", str(subtitle)]
+            maps += ["-map", f"{len(segments) if not stream_copy else 1}:s"]
+            codecs += ["-c:s", "mov_text", "-metadata:s:s:0", "language=chi"]
+
+        run_ffmpeg([*args, *maps, *codecs, "-movflags", "+faststart", str(output)])
+
+    return stream_copy
+
+
+def _fan_out(names: list) -> str:
+    """滤镜链末尾分流到多个输出标签（只有一个时不需要 split）"""
+    if len(names) == 1:
+        return f"[{names[0]}]"
+    return f",split={len(names)}" + "".join(f"[{name}]" for name in names)
+
+
+def single_pass_args(
+    video: list,
+    outputs: dict,
+    burn: str = None,
+    hardsub_video: list = None,
+    subtitle: Path = None,
+    audio: Path = None,
+    variants: dict = None,
+    thumbnail_at_s: float = 0.0,
+) -> list:
+    """
+    构建一次 FFmpeg 调用输出全部后期产物的参数
+
+    源画面最多解码一次：硬字幕在滤镜图中烧录后用 split 分给各分辨率编码；
+    无字幕版与软字幕版直接流复制；封面来自同一进程中按时间 seek 的输入，
+    只解码封面附近的一个 GOP。
+
+    Args:
+        video: 源画面输入参数（["-i", 路径] 或 concat demuxer 参数）
+        outputs: 输出名 -> 路径，可包含 plain / softsub / hardsub / thumbnail
+        burn: 需要烧录的 SRT（相对 FFmpeg 工作目录，免转义）；提供 hardsub_video 时不需要
+        hardsub_video: 已烧录硬字幕的画面输入参数（如按场景烧录的片段）
+        subtitle: 封装为软字幕轨的 SRT
+        audio: 替换源音轨的音频（如整课旁白音轨）
+        variants: 硬字幕的其他分辨率 {高度: 路径}
+        thumbnail_at_s: 封面截取时间（秒）
+
+    Raises:
+        ValueError: 需要烧录硬字幕但没有提供字幕
+    """
+    variants = variants or {}
+    args = list(video)
+    count = 1
+
+    def add_input(input_args: list) -> int:
+        nonlocal count
+        args.extend(input_args)
+        count += 1
+        return count - 1
+
+    hard_input = add_input(hardsub_video) if hardsub_video else None
+    audio_input = add_input(["-i", str(audio)]) if audio else None
+    sub_input = add_input(["-i", str(subtitle)]) if subtitle and "softsub" in outputs else None
+    thumb_input = (
+        add_input(["-ss", f"{thumbnail_at_s:.3f}", *video]) if "thumbnail" in outputs else None
+    )
+    if "softsub" in outputs and sub_input is None:
+        raise ValueError("输出软字幕版需要提供字幕文件")
+
+    # 滤镜图：烧录（或读取已烧录的）硬字幕画面，分流到各分辨率
+    filters = []
+    consumers = [f"v{height}" for height in variants]
+    if hard_input is None and ("hardsub" in outputs or variants):
+        if not burn:
+            raise ValueError("输出硬字幕版需要提供烧录的字幕文件")
+        if "hardsub" in outputs:
+            consumers.insert(0, "hardsub")
+        filters.append(f"[0:v]subtitles={burn}:force_style='{HARDSUB_STYLE}'{_fan_out(consumers)}")
+    elif variants:
+        filters.append(f"[{hard_input}:v]null{_fan_out(consumers)}")
+    for height in variants:
+        filters.append(f"[v{height}]scale=-2:{height}[s{height}]")
+    if filters:
+        args += ["-filter_complex", ";".join(filters)]
+
+    if audio_input is not None:
+        source_audio = ["-map", f"{audio_input}:a", "-c:a", "aac", "-b:a", "192k", "-shortest"]
+    else:
+        source_audio = ["-map", "0:a?", "-c:a", "copy"]
+    if hard_input is not None:
+        hard_audio = ["-map", f"{hard_input}:a?", "-c:a", "copy"]
+    else:
+        hard_audio = source_audio
+    faststart = ["-movflags", "+faststart"]
+
+    if "plain" in outputs:
+        args += ["-map", "0:v", "-c:v", "copy", *source_audio, *faststart, str(outputs["plain"])]
+    if "softsub" in outputs:
+        args += [
+            "-map", "0:v", "-c:v", "copy", *source_audio,
+            "-map", f"{sub_input}:s", "-c:s", "mov_text", "-metadata:s:s:0", "language=chi",
+            *faststart, str(outputs["softsub"]),
+        ]
+    if "hardsub" in outputs:
+        if hard_input is not None:
+            video_args = ["-map", f"{hard_input}:v", "-c:v", "copy"]
+        else:
+            video_args = ["-map", "[hardsub]", *video_encoder_args()]
+        args += [*video_args, *hard_audio, *faststart, str(outputs["hardsub"])]
+    for height, path in variants.items():
+        args += [
+            "-map", f"[s{height}]", *video_encoder_args(), *hard_audio, *faststart, str(path),
+        ]
+    if thumb_input is not None:
+        args += [
+            "-map", f"{thumb_input}:v", "-frames:v", "1", "-q:v", "2", str(outputs["thumbnail"]),
+        ]
+    return args
+
+
+def video_label(info: dict) -> str:
+    """按视频高度命名输出（如 1080p）"""
+    height_index = STREAM_KEYS.index("height")
+    height = next((s[height_index] for s in info["streams"] if s[0] == "video"), None)
+    return f"{height}p" if height else "full"
+
+
+def built_lesson(lesson_dir: str, required: list) -> tuple:
+    """
+    读取增量构建的场景产物
+
+    Returns:
+        tuple: (课程目录, 场景 ID 列表, artifact(scene_id, stage, name) -> Path, 警告列表)
+
+    Raises:
+        RuntimeError: 有场景缺少所需阶段的产物
+    """
+    builder = IncrementalBuilder(lesson_dir, stages=[])
+    lesson_dir = builder.lesson_dir
+    manifest = BuildManifest(lesson_dir / MANIFEST_PATH)
+
+    scene_ids = builder.storyboard.scene_ids
+    missing = [
+        f"{scene_id}/{stage}" for scene_id in scene_ids for stage in required
+        if not manifest.get_stage(scene_id, stage)
+    ]
+    if missing:
+        raise RuntimeError(f"以下场景阶段尚未构建，请先运行 lessonflow build: {', '.join(missing)}")
+
+    warnings = []
+    current_hashes = builder.scene_hashes()
+    for scene_id in scene_ids:
+        if manifest.scene(scene_id).get("hash") != current_hashes[scene_id]:
+            warnings.append(f"{scene_id} 有尚未构建的修改")
+
+    def artifact(scene_id: str, stage: str, name: str) -> Path:
+        return lesson_dir / manifest.get_stage(scene_id, stage)["artifacts"][name]
+
+    return lesson_dir, scene_ids, artifact, warnings
+
+
+def assemble_lesson(
+    lesson_dir: str,
+    hardsub: bool = True,
+    softsub: bool = True,
+    plain: bool = False,
+    thumbnail_at_s: float = 25.0,
+    resolutions: list = None,
+) -> dict:
+    """
+    组装整课视频
+
+    片段编码一致时，所有版本、其他分辨率与封面由一次 FFmpeg 调用产出。
+
+    依赖 `lessonflow build` 产出的 mux / subtitles / hardsub 阶段产物。
+
+    Returns:
+        dict: 产物路径、拼接方式与警告信息
+    """
+    lesson_dir, scene_ids, artifact, warnings = built_lesson(
+        lesson_dir, ["mux", "subtitles"] + (["hardsub"] if hardsub else [])
+    )
+    lesson_name = lesson_dir.name
+
+    segments = [artifact(scene_id, "mux", "segment") for scene_id in scene_ids]
+    probes = [probe(p) for p in segments]
+
+    # 整课字幕：场景字幕按实际片段时长偏移
+    offsets, current = [], 0.0
+    for info in probes:
+        offsets.append(current)
+        current += info["duration"]
+    scene_cues = [
+        (offset, load_cues(artifact(scene_id, "subtitles", "cues")))
+        for offset, scene_id in zip(offsets, scene_ids)
+    ]
+    srt_path = write_srt(offset_cues(scene_cues), lesson_dir / "subs" / "full_lesson.srt")
+    vtt_path = write_vtt(offset_cues(scene_cues), lesson_dir / "subs" / "full_lesson.vtt")
+    ass_path = write_ass(offset_cues(scene_cues), lesson_dir / "subs" / "full_lesson.ass")
+
+    label = video_label(probes[0])
+    final_dir = lesson_dir / "final"
+    final_dir.mkdir(parents=True, exist_ok=True)
+    subtitles = {"srt": str(srt_path), "vtt": str(vtt_path), "ass": str(ass_path)}
+
+    outputs = {}
+    if softsub:
+        outputs["softsub"] = final_dir / f"{lesson_name}_{label}_softsub.mp4"
+    if plain:
+        outputs["plain"] = final_dir / f"{lesson_name}_{label}.mp4"
+    if hardsub:
+        outputs["hardsub"] = final_dir / f"{lesson_name}_{label}_hardsub.mp4"
+    if outputs:
+        outputs["thumbnail"] = final_dir / "thumbnail.jpg"
+    variants = {
+        height: final_dir / f"{lesson_name}_{height}p_hardsub.mp4" for height in resolutions or ()
+    }
+    if variants and not hardsub:
+        raise RuntimeError("输出其他分辨率需要硬字幕版（--hardsub）")
+    thumbnail_at_s = min(thumbnail_at_s, current / 2)
+
+    hardsub_segments = (
+        [artifact(scene_id, "hardsub", "segment") for scene_id in scene_ids] if hardsub else []
+    )
+    stream_copy = stream_compatible(probes) and (
+        not hardsub_segments or stream_compatible([probe(p) for p in hardsub_segments])
+    )
+
+    if outputs and stream_copy:
+        # 一次调用：片段流复制拼接出各版本，只有其他分辨率需要解码硬字幕画面
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp_dir = Path(tmp_dir)
+            run_ffmpeg(single_pass_args(
+                concat_input(segments, tmp_dir / "segments.txt"),
+                outputs,
+                hardsub_video=(
+                    concat_input(hardsub_segments, tmp_dir / "hardsub.txt")
+                    if hardsub_segments else None
+                ),
+                subtitle=srt_path,
+                variants=variants,
+                thumbnail_at_s=thumbnail_at_s,
+            ))
+    elif outputs:
+        # 编码参数不一致：逐个版本用 concat 滤镜重新编码，再由一次调用产出其他分辨率与封面
+        if softsub:
+            concat_segments(segments, outputs["softsub"], subtitle=srt_path, probes=probes)
+        if plain:
+            concat_segments(segments, outputs["plain"], probes=probes)
+        if hardsub:
+            concat_segments(hardsub_segments, outputs["hardsub"])
+        source = outputs.get("softsub") or outputs.get("plain") or outputs["hardsub"]
+        run_ffmpeg(single_pass_args(
+            ["-i", str(source)],
+            {"thumbnail": outputs["thumbnail"]},
+            hardsub_video=["-i", str(outputs["hardsub"])] if variants else None,
+            variants=variants,
+            thumbnail_at_s=thumbnail_at_s,
+        ))
+
+    outputs = {
+        **subtitles,
+        **{name: str(path) for name, path in outputs.items()},
+        **{f"hardsub_{height}p": str(path) for height, path in variants.items()},
+    }
+
+    return {
+        "outputs": outputs,
+        "duration_s": round(current, 3),
+        "stream_copy": stream_copy,
+        "warnings": warnings,
+    }
+
+
+def post_source(
+    source: Path,
+    lesson_dir: str,
+    subtitle: Path,
+    audio: Path = None,
+    hardsub: bool = True,
+    softsub: bool = True,
+    plain: bool = True,
+    thumbnail_at_s: float = 25.0,
+    resolutions: list = None,
+) -> dict:
+    """
+    对单个完整源视频做后期合成（build_lesson.sh 流程），一次 FFmpeg 调用输出全部版本
+
+    Args:
+        source: 源视频（无字幕）
+        subtitle: 整课 SRT（烧录硬字幕并封装软字幕轨）
+        audio: 可选，替换源音轨的整课旁白音轨
+
+    Returns:
+        dict: 产物路径与总时长
+    """
+    lesson_dir = Path(lesson_dir).resolve()
+    source, subtitle = Path(source).resolve(), Path(subtitle).resolve()
+    if (hardsub or softsub or resolutions) and not subtitle.is_file():
+        raise RuntimeError(f"字幕文件不存在: {subtitle}")
+    info = probe(source)
+    label = video_label(info)
+    lesson_name = lesson_dir.name
+    final_dir = lesson_dir / "final"
+    final_dir.mkdir(parents=True, exist_ok=True)
+
+    outputs = {}
+    if hardsub:
+        outputs["hardsub"] = final_dir / f"{lesson_name}_{label}_hardsub.mp4"
+    if softsub:
+        outputs["softsub"] = final_dir / f"{lesson_name}_{label}_softsub.mp4"
+    if plain:
+        outputs["plain"] = final_dir / f"{lesson_name}_{label}.mp4"
+    outputs["thumbnail"] = final_dir / "thumbnail.jpg"
+    variants = {
+        height: final_dir / f"{lesson_name}_{height}p_hardsub.mp4" for height in resolutions or ()
+    }
+
+    # 在课程目录下执行，使 subtitles 滤镜使用无需转义的相对路径
+    run_ffmpeg(single_pass_args(
+        ["-i", str(source)],
+        outputs,
+        burn=os.path.relpath(subtitle, lesson_dir),
+        subtitle=subtitle,
+        audio=Path(audio).resolve() if audio else None,
+        variants=variants,
+        thumbnail_at_s=min(thumbnail_at_s, info["duration"] / 2),
+    ), cwd=lesson_dir)
+
+    return {
+        "outputs": {
+            **{name: str(path) for name, path in outputs.items()},
+            **{f"hardsub_{height}p": str(path) for height, path in variants.items()},
+        },
+        "duration_s": round(info["duration"], 3),
+        "stream_copy": not (hardsub or variants),
+        "warnings": [],
+    }
@@ -0,0 +1,197 @@
+"""
+LessonFlowAI - 场景布局 QA（不渲染帧）
+
+在独立子进程中以 dry run 方式执行场景的 construct()：
+- GridLayoutScene 以布局模式运行：play/wait 只推进虚拟时钟并应用动画最终状态，
+  不光栅化、不写视频，得到元素几何时间线与场景总时长
+- 结束后一次性快照所有元素边界盒，完成越界、重叠、must_show 检查，
+  并与 storyboard 的 duration_s 对比，写出 qa_report.json
+
+用法（由 QAStage 调用）:
+    python -m lessonflow.qa scenes/scene_1.py Scene1 qa/scene_1.qa_report.json \\
+        --scene-id scene_1 --checks '{"must_show": ["title"]}'
+"""
+
+import argparse
+import importlib.util
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from lessonflow import PROJECT_ROOT, TEMPLATES_DIR
+from lessonflow.render import manim_env
+
+# 单个场景 QA 超时（秒）
+DEFAULT_TIMEOUT_S = 120
+
+# 动画总时长与 storyboard duration_s 的允许偏差（秒），超出时记为警告
+DURATION_TOLERANCE_S = 0.5
+
+
+def load_scene_class(scene_file: Path, class_name: str):
+    """从场景文件加载 Scene 类（场景文件可导入 templates 下的模板）"""
+    scene_file = Path(scene_file).resolve()
+    for path in (str(TEMPLATES_DIR), str(PROJECT_ROOT), str(scene_file.parent)):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+    spec = importlib.util.spec_from_file_location(scene_file.stem, scene_file)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if not hasattr(module, class_name):
+        raise ValueError(f"场景文件中没有类 {class_name}: {scene_file}")
+    return getattr(module, class_name)
+
+
+def dry_construct(scene_class):
+    """
+    执行 construct() 但不渲染帧
+
+    dry_run 关闭所有文件输出。GridLayoutScene 使用布局模式（虚拟时钟）；
+    其他场景退回 Manim 渲染流程，渲染器以 skip_animations 启动，
+    play() 直接把动画推进到最终状态，wait() 不产生帧。
+    """
+    from manim import tempconfig
+    from manim.renderer.cairo_renderer import CairoRenderer
+
+    with tempconfig({"dry_run": True, "disable_caching": True, "verbosity": "ERROR"}):
+        scene = scene_class(renderer=CairoRenderer(skip_animations=True))
+        if hasattr(scene, "dry_run_layout"):
+            scene.dry_run_layout()
+        else:
+            scene.render()
+    return scene
+
+
+def run_scene_qa(
+    scene_file: Path,
+    class_name: str,
+    output: Path,
+    scene_id: str = None,
+    checks: dict = None,
+    expected_duration_s: float = None,
+) -> dict:
+    """对单个场景执行 dry run 并写出 qa_report.json"""
+    checks = checks or {}
+    scene = dry_construct(load_scene_class(scene_file, class_name))
+    from manim_snippets.base.qa import build_qa_report, write_qa_report
+    scene_id = scene_id or class_name
+
+    if hasattr(scene, "qa_report"):
+        report = scene.qa_report(
+            scene_id=scene_id,
+            must_show=checks.get("must_show"),
+            no_overlap=checks.get("no_overlap", True),
+            bounds_check=checks.get("bounds_check", True),
+        )
+    else:
+        # 未继承 GridLayoutScene：没有元素注册表，只能检查 must_show
+        import numpy as np
+        report = build_qa_report(scene_id, [], np.zeros((0, 4)), must_show=checks.get("must_show"))
+        report["note"] = "场景未继承 GridLayoutScene，未做布局检查"
+
+    report["warnings"] = []
+    if expected_duration_s is not None and "duration_s" in report:
+        report["expected_duration_s"] = expected_duration_s
+        drift = report["duration_s"] - expected_duration_s
+        if abs(drift) > DURATION_TOLERANCE_S:
+            report["warnings"].append(
+                f"动画总时长 {report['duration_s']}s 与 storyboard duration_s "
+                f"{expected_duration_s}s 相差 {drift:+.2f}s"
+            )
+
+    write_qa_report(report, output)
+    return report
+
+
+def run_qa_subprocess(
+    scene_file: Path,
+    class_name: str,
+    output: Path,
+    scene_id: str,
+    checks: dict = None,
+    expected_duration_s: float = None,
+    cwd: Path = None,
+    timeout_s: float = DEFAULT_TIMEOUT_S,
+) -> dict:
+    """
+    在子进程中执行场景 QA（与渲染一样隔离 Manim 全局配置）
+
+    Returns:
+        dict: qa_report.json 内容
+
+    Raises:
+        RuntimeError: 场景执行失败或未生成报告
+    """
+    output = Path(output)
+    output.unlink(missing_ok=True)  # 避免读到上次的报告
+    command = [
+        sys.executable, "-m", "lessonflow.qa",
+        str(scene_file), class_name, str(output),
+        "--scene-id", scene_id,
+        "--checks", json.dumps(checks or {}, ensure_ascii=False),
+    ]
+    if expected_duration_s is not None:
+        command += ["--expected-duration", str(expected_duration_s)]
+    process = subprocess.run(
+        command,
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        timeout=timeout_s,
+        env=manim_env(),
+    )
+    if process.returncode not in (0, 1) or not output.is_file():
+        raise RuntimeError(
+            f"场景 QA 执行失败 (exit {process.returncode}): {process.stderr.strip()[-500:]}"
+        )
+    with open(output, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def summarize(report: dict) -> str:
+    """QA 问题摘要（用于构建错误信息）"""
+    parts = []
+    if report["missing"]:
+        parts.append(f"缺少元素 {', '.join(report['missing'])}")
+    for issue in report["out_of_bounds"]:
+        parts.append(f"{issue['id']} {issue['issue']}")
+    for issue in report["overlaps"]:
+        a, b = issue["elements"]
+        parts.append(f"{a} 与 {b} 重叠 {issue['overlap_ratio']:.0%}")
+    return "；".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="场景布局 QA（dry run，不渲染帧）")
+    parser.add_argument("scene_file", help="场景代码文件")
+    parser.add_argument("class_name", help="Scene 类名")
+    parser.add_argument("output", help="qa_report.json 输出路径")
+    parser.add_argument("--scene-id", default=None, help="场景 ID（默认类名）")
+    parser.add_argument("--checks", default="{}", help="storyboard checks（JSON）")
+    parser.add_argument(
+        "--expected-duration", type=float, default=None, help="storyboard duration_s"
+    )
+    args = parser.parse_args()
+
+    report = run_scene_qa(
+        Path(args.scene_file),
+        args.class_name,
+        Path(args.output),
+        scene_id=args.scene_id,
+        checks=json.loads(args.checks),
+        expected_duration_s=args.expected_duration,
+    )
+    for warning in report["warnings"]:
+        print(f"⚠️ {warning}")
+    if report["passed"]:
+        duration = f"，时长 {report['duration_s']}s" if "duration_s" in report else ""
+        print(f"✅ {report['scene_id']}: {report['element_count']} 个元素{duration}，布局检查通过")
+        sys.exit(0)
+    print(f"❌ {report['scene_id']}: {summarize(report)}")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
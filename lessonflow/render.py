@@ -0,0 +1,231 @@
+"""
+LessonFlowAI - 场景并行渲染调度器
+
+每个场景是独立的 Manim Scene 类，作为独立的 manim 子进程渲染：
+- 任务队列 + 工作线程池（默认与 CPU 核数相同），每个线程驱动一个渲染子进程
+- 长场景优先出队，缩短整体完成时间
+- 单任务超时（整个进程组被终止）与崩溃重试
+- 结果按提交顺序返回
+"""
+
+import os
+import queue
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+from lessonflow import PROJECT_ROOT, TEMPLATES_DIR
+
+# 单个场景渲染超时（秒）
+DEFAULT_TIMEOUT_S = 600
+
+# 渲染进程崩溃后的重试次数
+DEFAULT_RETRIES = 1
+
+# Manim Tex / Text SVG 共享缓存目录（所有渲染进程、所有课程共用）
+SVG_CACHE_DIR = Path(
+    os.getenv("LESSONFLOW_CACHE_DIR", Path.home() / ".cache" / "lessonflow")
+) / "svg"
+
+
+def manim_env() -> dict:
+    """
+    Manim 子进程环境
+
+    - 场景文件可导入 lessonflow 与 templates 下的 manim_snippets
+    - 启用共享 SVG 缓存（可用 LESSONFLOW_SVG_CACHE_DIR 覆盖）
+    """
+    env = dict(os.environ)
+    paths = [str(PROJECT_ROOT), str(TEMPLATES_DIR)]
+    if env.get("PYTHONPATH"):
+        paths.append(env["PYTHONPATH"])
+    env["PYTHONPATH"] = os.pathsep.join(paths)
+    env.setdefault("LESSONFLOW_SVG_CACHE_DIR", str(SVG_CACHE_DIR))
+    return env
+
+
+@dataclass
+class RenderJob:
+    """单个场景的渲染任务"""
+    scene_id: str
+    scene_file: Path  # 场景代码文件
+    class_name: str  # Manim Scene 类名
+    output: Path  # 最终视频输出路径
+    media_dir: Path  # Manim 媒体目录（每个任务独立，避免并发冲突）
+    quality: str = "h"  # Manim 质量标志 (l/m/h/k)
+    weight: float = 0  # 预估耗时权重（如场景时长），越大越先渲染
+    cwd: Optional[Path] = None  # 渲染工作目录（课程目录）
+
+    def command(self) -> list:
+        """构建 manim 渲染命令"""
+        return [
+            sys.executable, "-m", "manim",
+            f"-q{self.quality}",
+            "--media_dir", str(self.media_dir),
+            "-o", self.scene_id,
+            str(self.scene_file),
+            self.class_name,
+        ]
+
+
+@dataclass
+class RenderResult:
+    """单个场景的渲染结果"""
+    scene_id: str
+    ok: bool
+    output: Optional[str] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    elapsed_s: float = 0.0
+
+
+class RenderCrashError(RuntimeError):
+    """渲染进程异常退出（可重试）"""
+
+
+class RenderScheduler:
+    """
+    场景渲染调度器
+
+    Manim 渲染本身运行在子进程中，调度线程只负责启动进程、等待与收集结果，
+    因此线程池即可获得进程级并行，同时能可靠地对超时任务强制终止。
+    """
+
+    def __init__(
+        self,
+        max_workers: int = None,
+        timeout_s: float = DEFAULT_TIMEOUT_S,
+        retries: int = DEFAULT_RETRIES,
+        on_progress: Callable[[RenderResult], None] = None,
+    ):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout_s = timeout_s
+        self.retries = retries
+        self.on_progress = on_progress
+        self._progress_lock = threading.Lock()
+
+    def run(self, jobs: list) -> list:
+        """
+        并行渲染所有任务
+
+        Returns:
+            list[RenderResult]: 与 jobs 顺序一致的结果
+        """
+        results = [None] * len(jobs)
+        if not jobs:
+            return results
+
+        job_queue = queue.Queue()
+        order = sorted(range(len(jobs)), key=lambda i: jobs[i].weight, reverse=True)
+        for index in order:
+            job_queue.put((index, jobs[index]))
+
+        workers = [
+            threading.Thread(target=self._worker, args=(job_queue, results), daemon=True)
+            for _ in range(min(self.max_workers, len(jobs)))
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        return results
+
+    def _worker(self, job_queue: queue.Queue, results: list):
+        while True:
+            try:
+                index, job = job_queue.get_nowait()
+            except queue.Empty:
+                return
+
+            result = self.render(job)
+            results[index] = result
+
+            if self.on_progress:
+                with self._progress_lock:
+                    self.on_progress(result)
+
+    def render(self, job: RenderJob) -> RenderResult:
+        """渲染单个任务（含重试）"""
+        started = time.time()
+        attempts = 0
+        error = None
+
+        while attempts <= self.retries:
+            attempts += 1
+            try:
+                self._render_once(job)
+                return RenderResult(
+                    scene_id=job.scene_id,
+                    ok=True,
+                    output=str(job.output),
+                    attempts=attempts,
+                    elapsed_s=round(time.time() - started, 3),
+                )
+            except RenderCrashError as e:
+                error = str(e)
+            except subprocess.TimeoutExpired:
+                error = f"渲染超时（{self.timeout_s}s）"
+                break  # 超时通常是场景本身问题，重试没有意义
+            except (OSError, RuntimeError) as e:
+                error = str(e)
+                break
+
+        return RenderResult(
+            scene_id=job.scene_id,
+            ok=False,
+            error=error,
+            attempts=attempts,
+            elapsed_s=round(time.time() - started, 3),
+        )
+
+    def _render_once(self, job: RenderJob):
+        job.media_dir.mkdir(parents=True, exist_ok=True)
+
+        process = subprocess.Popen(
+            job.command(),
+            cwd=job.cwd,
+            env=manim_env(),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            start_new_session=True,  # 独立进程组，超时时连同 ffmpeg 子进程一起终止
+        )
+        try:
+            _, stderr = process.communicate(timeout=self.timeout_s)
+        except subprocess.TimeoutExpired:
+            _kill_process_group(process)
+            process.communicate()
+            raise
+
+        if process.returncode != 0:
+            raise RenderCrashError(
+                f"Manim 渲染失败 (exit {process.returncode}): {stderr.strip()[-500:]}"
+            )
+
+        rendered = [
+            p for p in job.media_dir.glob(f"videos/**/{job.scene_id}.mp4")
+            if "partial_movie_files" not in p.parts
+        ]
+        if not rendered:
+            raise RuntimeError(f"未找到渲染输出: {job.media_dir}")
+
+        job.output.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(rendered[0]), job.output)
+
+
+def _kill_process_group(process: subprocess.Popen):
+    """终止进程及其子进程"""
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
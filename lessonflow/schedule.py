@@ -0,0 +1,176 @@
+"""
+LessonFlowAI - 旁白优先的动画排期
+
+storyboard 中 animation.steps[].duration_s 与 wait 步骤是规划时的估计值，
+渲染后才发现画面与配音错位，只能反复调整、重新渲染。
+本模块在渲染前用 TTS 字级时间戳重新排期：
+
+- 步骤可以声明 cue（旁白中的关键词），该步骤在关键词开始读出时开始
+- 相邻两个锚点之间的时间差优先由 wait 步骤吸收（拉长或缩短）
+- wait 不足以缩短时，按比例压缩动画时长（不低于 MIN_STEP_S），仍赶不上则记录偏差
+- 场景时长不短于 storyboard 的 duration_s，只在排期后的动画超出时延长
+
+没有 cue 的步骤保持原时长；没有 cue 或没有时间戳（无旁白）的场景原样返回，
+旁白修改不会改变其排期结果（配音长短由 mux 阶段的时间计划吸收）。
+"""
+
+import re
+
+from lessonflow.storyboard import Scene
+
+# 压缩后单个动画步骤的最短时长（秒）
+MIN_STEP_S = 0.3
+
+# 小于该偏差（秒）视为已对齐
+TOLERANCE_S = 0.05
+
+# 匹配关键词时忽略的字符（空白与标点）
+_IGNORED = re.compile(r"[\s\W_]+", re.UNICODE)
+
+
+def _normalize(text: str) -> str:
+    return _IGNORED.sub("", text or "").lower()
+
+
+def spoken_index(timestamps: list) -> tuple:
+    """
+    拼接时间戳文本，建立字符位置 → 时间戳的索引
+
+    Returns:
+        tuple: (规范化后的文本, 每个字符对应的时间戳下标)
+    """
+    chars, owners = [], []
+    for i, stamp in enumerate(timestamps):
+        normalized = _normalize(stamp.get("text", ""))
+        chars.append(normalized)
+        owners.extend([i] * len(normalized))
+    return "".join(chars), owners
+
+
+def find_cue(spoken: str, owners: list, timestamps: list, cue: str, start: int = 0) -> tuple:
+    """
+    在已读出的文本中从 start 开始查找关键词
+
+    Returns:
+        tuple: (关键词开始时间（秒，配音内）, 匹配结束位置)；未找到时为 (None, start)
+    """
+    keyword = _normalize(cue)
+    if not keyword:
+        return None, start
+    position = spoken.find(keyword, start)
+    if position < 0:
+        return None, start
+    return timestamps[owners[position]]["begin_time"] / 1000, position + len(keyword)
+
+
+def _fit(steps: list, span_s: float) -> float:
+    """
+    调整一段步骤的时长使总时长接近 span_s（就地修改），返回剩余偏差（正数为超出）
+
+    先伸缩 wait；需要延长但没有 wait 时，由调用方在锚点前补 wait。
+    """
+    natural = sum(step["duration_s"] for step in steps)
+    delta = span_s - natural
+    waits = [step for step in steps if step["action"] == "wait"]
+
+    if delta > 0:
+        if waits:
+            extra = delta / len(waits)
+            for step in waits:
+                step["duration_s"] += extra
+            return 0.0
+        return -delta
+
+    # 需要缩短：wait 可以缩到 0（执行时跳过），动画不低于 MIN_STEP_S
+    excess = -delta
+    for step in waits:
+        cut = min(step["duration_s"], excess)
+        step["duration_s"] -= cut
+        excess -= cut
+    animations = [step for step in steps if step["action"] != "wait"]
+    slack = sum(max(step["duration_s"] - MIN_STEP_S, 0) for step in animations)
+    if excess > 0 and slack > 0:
+        ratio = min(excess / slack, 1.0)
+        for step in animations:
+            cut = max(step["duration_s"] - MIN_STEP_S, 0) * ratio
+            step["duration_s"] -= cut
+            excess -= cut
+    return excess
+
+
+def schedule_scene(scene, timestamps: list) -> dict:
+    """
+    按旁白时间戳重新排期场景的动画步骤
+
+    Args:
+        scene: storyboard.Scene
+        timestamps: TTS 字级时间戳（毫秒，与 .timestamps.json 中 subtitles 相同）
+
+    Returns:
+        dict: {"scene_id", "duration_s", "steps", "cues", "warnings"}
+              steps 为重新排期后的步骤（storyboard 格式），cues 为每个锚点的对齐结果
+    """
+    narration = scene.narration
+    steps = [
+        {**step.model_dump(by_alias=True, exclude_none=True), "duration_s": float(step.duration_s)}
+        for step in scene.animation.steps
+    ]
+    result = {"scene_id": scene.id, "duration_s": scene.duration_s, "steps": steps,
+              "cues": [], "warnings": []}
+    if not timestamps or not any(step.get("cue") for step in steps):
+        return result
+
+    spoken, owners = spoken_index(timestamps)
+    scheduled, segment, cursor = [], [], 0
+    clock = 0.0  # 已排期步骤的结束时间
+
+    for index, step in enumerate(steps, 1):
+        cue = step.get("cue")
+        if not cue:
+            segment.append(step)
+            continue
+
+        at, matched = find_cue(spoken, owners, timestamps, cue, cursor)
+        if at is None:
+            result["warnings"].append(f"步骤 {index}: 旁白中未找到关键词「{cue}」，保持原时长")
+            segment.append(step)
+            continue
+        cursor = matched
+        target = narration.pause_before_s + at
+
+        late = _fit(segment, target - clock)
+        if late < 0:
+            # 锚点前没有 wait 可以拉长：补一个 wait
+            segment.append({"action": "wait", "target": [], "duration_s": -late})
+            late = 0.0
+        scheduled.extend(segment)
+        clock = sum(s["duration_s"] for s in scheduled)
+        if late > TOLERANCE_S:
+            result["warnings"].append(
+                f"步骤 {index}: 「{cue}」在 {target:.2f}s 读出，"
+                f"动画最早 {clock:.2f}s 开始（晚 {late:.2f}s）"
+            )
+        result["cues"].append({
+            "step": index, "cue": cue, "spoken_s": round(target, 3), "start_s": round(clock, 3),
+        })
+        segment = [step]
+
+    scheduled.extend(segment)
+    scheduled = [s for s in scheduled if s["action"] != "wait" or s["duration_s"] > TOLERANCE_S]
+    for step in scheduled:
+        step["duration_s"] = round(step["duration_s"], 3)
+
+    # 场景时长不短于 storyboard 时长，末尾 wait 由编译阶段补齐；
+    # 配音超出画面的部分由 mux 阶段的时间计划（加速 / 定格）处理
+    result["steps"] = scheduled
+    result["duration_s"] = round(
+        max(sum(s["duration_s"] for s in scheduled), scene.duration_s), 3
+    )
+    return result
+
+
+def apply_schedule(scene, schedule: dict):
+    """返回应用排期后的场景副本（不修改原 storyboard）"""
+    data = {**scene.model_dump(by_alias=True), "duration_s": schedule["duration_s"]}
+    data["animation"] = {**data["animation"], "steps": schedule["steps"]}
+    return Scene.model_validate(data)
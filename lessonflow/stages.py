@@ -0,0 +1,522 @@
+"""
+LessonFlowAI - 默认流水线阶段
+
+每个阶段以场景为单位产出文件，由增量构建引擎按输入 key 决定是否执行：
+- voice: TTS 配音 → audio/<scene_id>.wav + .timestamps.json
+- schedule: 按配音时间戳重新排期动画步骤（cue 关键词对齐）
+  → .lessonflow/schedule/<scene_id>.schedule.json
+- animate: 排期后的 storyboard 编译为操作列表
+  → .lessonflow/ops/<scene_id>.ops.json + scenes/<scene_id>.py 入口
+- typeset: 批量排版所有 formula 元素 → 共享 SVG 缓存（一次 LaTeX 调用）
+- qa: dry run 布局检查 → qa/<scene_id>.qa_report.json（失败时阻止渲染）
+- preview: 低质量预览渲染（480p15）→ renders/<scene_id>.preview.mp4，供审核
+- render: 最终质量渲染 → renders/<scene_id>.mp4，只对已批准（lessonflow approve）的场景执行
+- timing: 音画时长对齐计划（补静音 / 加速 / 定格）→ timing/<scene_id>.timing.json
+- subtitles: 字幕时间轴 → subs/<scene_id>.cues.json
+- mux: 按时间计划合并画面与配音 → segments/<scene_id>.mp4
+- hardsub: 烧录场景硬字幕 → segments/<scene_id>.hardsub.mp4
+"""
+
+import ast
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from pathlib import Path
+
+from lessonflow.animator import compile_scene, is_generated, write_scene
+from lessonflow.build import SceneContext, Stage, content_hash, file_hash
+from lessonflow.latex import formula_expressions, typeset_batch
+from lessonflow.post import HARDSUB_STYLE, burn_subtitles, probe, run_ffmpeg, video_encoder_args
+from lessonflow.qa import run_qa_subprocess, summarize
+from lessonflow.render import RenderJob, RenderScheduler
+from lessonflow.schedule import apply_schedule, schedule_scene
+from lessonflow.subtitles import align_cues, estimate_timestamps, load_cues, write_srt
+from lessonflow.timing import load_timing_plan, plan_timing, wav_duration
+from lessonflow.tts import DEFAULT_BACKEND, TTSConfig, create_tts, prepare_ssml
+from lessonflow.tts_cache import CachedTTS
+
+# 最终渲染质量（l/m/h/k，默认 1080p60）
+DEFAULT_QUALITY = os.getenv("MANIM_QUALITY", "h")
+
+# 预览渲染质量（480p15）
+PREVIEW_QUALITY = "l"
+
+
+def find_scene_class(scene_file: Path) -> str:
+    """
+    查找场景文件中的 Manim Scene 类名
+
+    约定每个场景文件只包含一个定义了 construct() 的类。
+    """
+    tree = ast.parse(Path(scene_file).read_text(encoding="utf-8"))
+    candidates = [
+        node.name for node in tree.body
+        if isinstance(node, ast.ClassDef) and any(
+            isinstance(item, ast.FunctionDef) and item.name == "construct"
+            for item in node.body
+        )
+    ]
+    if not candidates:
+        raise ValueError(f"场景文件中没有定义 construct() 的类: {scene_file}")
+    return candidates[-1]
+
+
+def scene_duration(ctx: SceneContext) -> float:
+    """场景动画时长：有编译结果时以排期后的时长为准"""
+    ops = ctx.artifacts.get("animate", {}).get("ops")
+    if not ops:
+        return ctx.scene.duration_s
+    with open(ctx.path(ops), "r", encoding="utf-8") as f:
+        return json.load(f)["duration_s"]
+
+
+class ScheduleStage(Stage):
+    """
+    旁白优先排期阶段
+
+    渲染前用实际配音的字级时间戳调整动画步骤与 wait 时长，
+    使带 cue 的步骤在读到关键词时开始，省去“渲染 → 试听 → 调整 → 重渲染”的循环。
+    """
+
+    name = "schedule"
+    inputs = ("animation", "duration_s", "narration")
+    deps = ("voice",)
+
+    def run(self, ctx: SceneContext) -> dict:
+        with open(ctx.artifact("voice", "timestamps"), "r", encoding="utf-8") as f:
+            timestamps = json.load(f).get("subtitles", [])
+        schedule = schedule_scene(ctx.scene, timestamps)
+        for warning in schedule["warnings"]:
+            print(f"   ⚠️ {ctx.scene_id}: {warning}")
+
+        output = f".lessonflow/schedule/{ctx.scene_id}.schedule.json"
+        ctx.path(output).parent.mkdir(parents=True, exist_ok=True)
+        with open(ctx.path(output), "w", encoding="utf-8") as f:
+            json.dump(schedule, f, ensure_ascii=False, indent=2)
+        return {"schedule": output}
+
+
+class AnimateStage(Stage):
+    """
+    场景编译阶段
+
+    没有手写 scenes/<scene_id>.py 的场景按排期后的步骤编译为操作列表，
+    并生成由 StoryboardScene 解释执行的入口文件；手写场景保持不变。
+    """
+
+    name = "animate"
+    inputs = ("visual", "animation", "duration_s", "style")
+    deps = ("schedule",)
+
+    def run(self, ctx: SceneContext) -> dict:
+        scene_file = f"scenes/{ctx.scene_id}.py"
+        if not is_generated(ctx.path(scene_file)):
+            return {}
+        ops_file = f".lessonflow/ops/{ctx.scene_id}.ops.json"
+        with open(ctx.artifact("schedule", "schedule"), "r", encoding="utf-8") as f:
+            scene = apply_schedule(ctx.scene, json.load(f))
+        compiled = compile_scene(scene, ctx.canonical["style"].get("name", "tech-minimal"))
+        write_scene(compiled, ctx.path(ops_file), ctx.path(scene_file))
+        return {"ops": ops_file, "scene": scene_file}
+
+
+class TypesetStage(Stage):
+    """
+    公式批量排版阶段
+
+    所有待构建场景的公式合并为一次 LaTeX 调用，结果写入渲染进程共用的 SVG 缓存。
+    LaTeX 排版失败不阻塞渲染（Manim 会逐个排版）；Manim 版本不受支持时本阶段失败。
+    """
+
+    name = "typeset"
+    inputs = ("visual",)
+
+    def run(self, ctx: SceneContext) -> dict:
+        return self.run_many([ctx])[0]
+
+    def run_many(self, contexts: list) -> list:
+        batch = typeset_batch(formula_expressions([ctx.scene for ctx in contexts]))
+        if batch["total"]:
+            fallback = f"，退回逐个排版: {batch['error']}" if batch["error"] else ""
+            print(
+                f"   {'⚠️' if batch['error'] else '✅'} 公式 {batch['total']} 个"
+                f"（缓存 {batch['cached']}，批量排版 {batch['typeset']}）{fallback}"
+            )
+
+        results = []
+        for ctx in contexts:
+            output = f".lessonflow/typeset/{ctx.scene_id}.json"
+            path = ctx.path(output)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"formulas": formula_expressions([ctx.scene]), "batch": batch},
+                    f, ensure_ascii=False, indent=2,
+                )
+            results.append({"manifest": output})
+        return results
+
+
+class QAStage(Stage):
+    """布局 QA 阶段（dry run 执行 construct，不渲染帧）"""
+
+    name = "qa"
+    inputs = ("visual", "animation", "checks", "duration_s", "style")
+    gates = ("animate",)
+
+    def __init__(self, workers: int = None):
+        self.workers = workers
+
+    def input_files(self, ctx: SceneContext) -> list:
+        # 操作列表随配音排期变化，storyboard 字段不变时也要重新检查
+        return [f"scenes/{ctx.scene_id}.py", f".lessonflow/ops/{ctx.scene_id}.ops.json"]
+
+    def run(self, ctx: SceneContext) -> dict:
+        scene_file = ctx.path(f"scenes/{ctx.scene_id}.py")
+        if not scene_file.is_file():
+            raise FileNotFoundError(f"场景代码不存在: {scene_file}")
+        output = f"qa/{ctx.scene_id}.qa_report.json"
+        report = run_qa_subprocess(
+            scene_file,
+            find_scene_class(scene_file),
+            ctx.path(output),
+            scene_id=ctx.scene_id,
+            checks=ctx.scene.checks.model_dump(),
+            expected_duration_s=scene_duration(ctx),
+            cwd=ctx.lesson_dir,
+        )
+        if not report["passed"]:
+            raise RuntimeError(f"布局检查未通过（{output}）: {summarize(report)}")
+        for warning in report.get("warnings", []):
+            print(f"   ⚠️ {ctx.scene_id}: {warning}")
+        return {"report": output}
+
+    def run_many(self, contexts: list) -> list:
+        # 每个场景一个子进程，线程只负责等待
+        def run_one(ctx):
+            try:
+                return self.run(ctx)
+            except Exception as e:
+                return e
+
+        workers = min(self.workers or os.cpu_count() or 1, len(contexts))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(run_one, contexts))
+
+
+class RenderStage(Stage):
+    """
+    Manim 最终渲染阶段（场景级并行）
+
+    只渲染已批准的场景：批准时记录的场景渲染 key 与当前一致才执行，
+    预览与最终渲染使用同一个 scene_key，审核的正是将要最终渲染的内容。
+    """
+
+    name = "render"
+    inputs = ("visual", "animation", "duration_s", "style")
+    gates = ("animate", "qa")  # 场景编译、布局检查通过后才渲染；二者不影响渲染 key
+    suffix = ""  # 输出文件名后缀
+    label = "渲染"
+    requires_approval = True
+
+    def __init__(self, quality: str = DEFAULT_QUALITY, workers: int = None):
+        self.quality = quality
+        self.workers = workers
+
+    def params(self, ctx: SceneContext) -> dict:
+        return {"quality": self.quality}
+
+    def input_files(self, ctx: SceneContext) -> list:
+        return [f"scenes/{ctx.scene_id}.py", f".lessonflow/ops/{ctx.scene_id}.ops.json"]
+
+    def scene_key(self, ctx: SceneContext) -> str:
+        """与质量无关的场景渲染 key（预览与最终渲染共用）"""
+        return content_hash({
+            "inputs": {name: ctx.canonical.get(name) for name in self.inputs},
+            "files": {str(p): file_hash(ctx.path(p)) for p in self.input_files(ctx)},
+        })
+
+    def hold(self, ctx: SceneContext):
+        if not self.requires_approval:
+            return None
+        if ctx.approval is None:
+            return "等待审核（预览通过后执行 lessonflow approve）"
+        if ctx.approval != self.scene_key(ctx):
+            return "场景在批准后有改动，需要重新审核"
+        return None
+
+    def job(self, ctx: SceneContext) -> RenderJob:
+        """构建场景渲染任务"""
+        scene_file = ctx.path(f"scenes/{ctx.scene_id}.py")
+        if not scene_file.is_file():
+            raise FileNotFoundError(f"场景代码不存在: {scene_file}")
+        return RenderJob(
+            scene_id=ctx.scene_id,
+            scene_file=scene_file,
+            class_name=find_scene_class(scene_file),
+            output=ctx.path(f"renders/{ctx.scene_id}{self.suffix}.mp4"),
+            media_dir=ctx.path(f".lessonflow/media/{ctx.scene_id}{self.suffix}"),
+            quality=self.quality,
+            weight=scene_duration(ctx),
+            cwd=ctx.lesson_dir,
+        )
+
+    def run(self, ctx: SceneContext) -> dict:
+        return self.run_many([ctx])[0]
+
+    def run_many(self, contexts: list) -> list:
+        results = [None] * len(contexts)
+        jobs, positions = [], []
+        for i, ctx in enumerate(contexts):
+            try:
+                jobs.append(self.job(ctx))
+                positions.append(i)
+            except (OSError, ValueError, SyntaxError) as e:
+                results[i] = e
+
+        scheduler = RenderScheduler(
+            max_workers=self.workers,
+            on_progress=lambda r: print(
+                f"   {'✅' if r.ok else '❌'} {self.label} {r.scene_id} ({r.elapsed_s}s)"
+            ),
+        )
+        for i, job, rendered in zip(positions, jobs, scheduler.run(jobs)):
+            if rendered.ok:
+                results[i] = {"video": str(job.output.relative_to(contexts[i].lesson_dir))}
+            else:
+                results[i] = RuntimeError(rendered.error)
+        return results
+
+
+class PreviewStage(RenderStage):
+    """低质量预览渲染（所有场景，供审核与字幕校对）"""
+
+    name = "preview"
+    suffix = ".preview"
+    label = "预览"
+    requires_approval = False
+
+    def __init__(self, quality: str = PREVIEW_QUALITY, workers: int = None):
+        super().__init__(quality, workers)
+
+
+class VoiceStage(Stage):
+    """TTS 配音阶段（经过磁盘缓存，未命中的场景并发合成）"""
+
+    name = "voice"
+    inputs = ("narration", "terms")
+
+    def __init__(self, max_concurrency: int = None, qps: float = None, backend: str = None):
+        self.backend = backend or DEFAULT_BACKEND
+        self.max_concurrency = max_concurrency
+        self.qps = qps
+        self._tts = None
+
+    def _config(self, ctx: SceneContext):
+        return TTSConfig(
+            voice=ctx.scene.narration.voice or os.getenv("ALIYUN_TTS_VOICE", "zhitian_emo"),
+            speech_rate=int(os.getenv("ALIYUN_TTS_SPEECH_RATE", "0")),
+        )
+
+    def params(self, ctx: SceneContext) -> dict:
+        return {"backend": self.backend, **asdict(self._config(ctx))}
+
+    def ssml(self, ctx: SceneContext) -> str:
+        """生成场景旁白的 SSML（只带入该场景涉及的术语）"""
+        narration = ctx.scene.narration
+        return prepare_ssml(
+            narration.vo_text,
+            glossary={"terms": ctx.canonical.get("terms", {})},
+            speed=narration.speed,
+        )
+
+    @property
+    def tts(self) -> CachedTTS:
+        """带缓存的 TTS（全部命中时不会创建后端实例）"""
+        if self._tts is None:
+            self._tts = CachedTTS(lambda: create_tts(self.backend), backend=self.backend)
+        return self._tts
+
+    def cache_stats(self) -> dict:
+        """本次构建的 TTS 缓存统计（未执行配音时返回 None）"""
+        return self._tts.session_stats() if self._tts else None
+
+    def run(self, ctx: SceneContext) -> dict:
+        return self.run_many([ctx])[0]
+
+    def run_many(self, contexts: list) -> list:
+        """所有场景的旁白并发合成（受 max_concurrency / qps 限制）"""
+        items = [
+            {
+                "text": self.ssml(ctx),
+                "output_path": str(ctx.path(f"audio/{ctx.scene_id}.wav")),
+                "config": self._config(ctx),
+            }
+            for ctx in contexts
+        ]
+        results = []
+        synthesized = self.tts.synthesize_many(
+            items, max_concurrency=self.max_concurrency, qps=self.qps
+        )
+        for ctx, result in zip(contexts, synthesized):
+            if not result.get("ok"):
+                results.append(RuntimeError(f"TTS 合成失败: {result.get('error')}"))
+                continue
+            results.append({
+                "audio": f"audio/{ctx.scene_id}.wav",
+                "timestamps": str(Path(result["timestamps_path"]).relative_to(ctx.lesson_dir)),
+            })
+        return results
+
+
+class TimingStage(Stage):
+    """
+    音画时长对齐阶段
+
+    画面时长取自预览渲染（与最终渲染同一动画，时长一致），
+    因此未批准的场景也能先对齐字幕时间轴。
+    """
+
+    name = "timing"
+    inputs = ("narration",)
+    deps = ("preview", "voice")
+
+    def run(self, ctx: SceneContext) -> dict:
+        narration = ctx.scene.narration
+        plan = plan_timing(
+            ctx.scene_id,
+            video_s=probe(ctx.artifact("preview", "video"))["duration"],
+            audio_s=wav_duration(ctx.artifact("voice", "audio")),
+            pause_before_s=narration.pause_before_s,
+            pause_after_s=narration.pause_after_s,
+        )
+        output = f"timing/{ctx.scene_id}.timing.json"
+        ctx.path(output).parent.mkdir(parents=True, exist_ok=True)
+        with open(ctx.path(output), "w", encoding="utf-8") as f:
+            json.dump(plan.to_dict(), f, ensure_ascii=False, indent=2)
+        return {"plan": output}
+
+
+class SubtitleStage(Stage):
+    """字幕时间轴阶段：按 TTS 字级时间戳生成场景内相对时间的字幕条目"""
+
+    name = "subtitles"
+    version = "3"
+    inputs = ("narration", "subtitle", "duration_s", "terms")
+    deps = ("voice", "timing")
+
+    def run(self, ctx: SceneContext) -> dict:
+        text = ctx.scene.narration.vo_text
+        plan = load_timing_plan(ctx.artifact("timing", "plan"))
+
+        # 以实际配音的字级时间戳为准，没有时间戳时按配音时长估算；
+        # 再按时间计划换算到片段时间（前置静音、加速）
+        with open(ctx.artifact("voice", "timestamps"), "r", encoding="utf-8") as f:
+            timestamps = json.load(f).get("subtitles", [])
+        if not timestamps:
+            timestamps = estimate_timestamps(text, plan.audio_s)
+        timestamps = [
+            {
+                **stamp,
+                "begin_time": round(plan.map_time(stamp["begin_time"] / 1000) * 1000),
+                "end_time": round(plan.map_time(stamp["end_time"] / 1000) * 1000),
+            }
+            for stamp in timestamps
+        ]
+        duration = plan.target_s
+
+        cues = list(align_cues(
+            text,
+            timestamps,
+            total_duration_s=duration,
+            glossary={"terms": ctx.canonical.get("terms", {})},
+        ))
+
+        output = f"subs/{ctx.scene_id}.cues.json"
+        ctx.path(output).parent.mkdir(parents=True, exist_ok=True)
+        with open(ctx.path(output), "w", encoding="utf-8") as f:
+            json.dump({"scene_id": ctx.scene_id, "duration_s": duration, "cues": cues},
+                      f, ensure_ascii=False, indent=2)
+        return {"cues": output}
+
+
+class MuxStage(Stage):
+    """
+    合成阶段：按时间计划将场景画面与配音合并为单场景片段
+
+    音频前置静音、加速与补静音都在音频滤镜中完成；
+    只有需要定格延长画面时才重新编码视频，否则视频流直接复制。
+    """
+
+    name = "mux"
+    version = "2"
+    deps = ("render", "voice", "timing")
+
+    def run(self, ctx: SceneContext) -> dict:
+        plan = load_timing_plan(ctx.artifact("timing", "plan"))
+        output = f"segments/{ctx.scene_id}.mp4"
+        ctx.path(output).parent.mkdir(parents=True, exist_ok=True)
+
+        video_filter = plan.video_filter()
+        video_args = (
+            ["-vf", video_filter, *video_encoder_args()] if video_filter else ["-c:v", "copy"]
+        )
+        run_ffmpeg([
+            "-i", str(ctx.artifact("render", "video")),
+            "-i", str(ctx.artifact("voice", "audio")),
+            "-map", "0:v", "-map", "1:a",
+            *video_args,
+            "-af", plan.audio_filter(),
+            "-c:a", "aac", "-b:a", "192k",
+            "-t", f"{plan.target_s:.3f}",
+            str(ctx.path(output)),
+        ])
+        return {"segment": output}
+
+
+class HardsubStage(Stage):
+    """硬字幕阶段：只为字幕或画面发生变化的场景重新编码"""
+
+    name = "hardsub"
+    deps = ("mux", "subtitles")
+
+    def params(self, ctx: SceneContext) -> dict:
+        return {"style": HARDSUB_STYLE, "encoder": video_encoder_args()}
+
+    def run(self, ctx: SceneContext) -> dict:
+        srt = write_srt(
+            load_cues(ctx.artifact("subtitles", "cues")),
+            ctx.path(f"subs/{ctx.scene_id}.srt"),
+        )
+        output = f"segments/{ctx.scene_id}.hardsub.mp4"
+        # 在课程目录下执行，使 subtitles 滤镜使用无需转义的相对路径
+        burn_subtitles(
+            ctx.artifact("mux", "segment"),
+            srt.relative_to(ctx.lesson_dir),
+            ctx.path(output),
+            cwd=ctx.lesson_dir,
+        )
+        return {"segment": output, "srt": str(srt.relative_to(ctx.lesson_dir))}
+
+
+def default_stages(
+    quality: str = DEFAULT_QUALITY,
+    workers: int = None,
+    tts_backend: str = None,
+    preview_quality: str = PREVIEW_QUALITY,
+) -> list:
+    """默认流水线阶段（按执行顺序）"""
+    return [
+        VoiceStage(backend=tts_backend),
+        ScheduleStage(),
+        AnimateStage(),
+        TypesetStage(),
+        QAStage(workers),
+        PreviewStage(preview_quality, workers),
+        RenderStage(quality, workers),
+        TimingStage(),
+        SubtitleStage(),
+        MuxStage(),
+        HardsubStage(),
+    ]
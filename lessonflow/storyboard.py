@@ -0,0 +1,208 @@
+"""
+LessonFlowAI - Storyboard 数据模型
+
+storyboard.json 只解析一次，得到带索引的类型化对象，在各阶段之间直接传递：
+- 场景按 ID 索引，元素按场景内 ID 索引
+- 预先计算每个场景在整课中的起止时间
+- 保留原始 JSON（raw），用于内容哈希与写回 _hash，不因默认值改变哈希
+
+模型字段与 schema/storyboard.schema.json 一致，但只负责结构与类型；
+取值范围等严格约束仍由 JSON Schema 校验。
+"""
+
+import json
+from pathlib import Path
+from typing import Optional, Union
+
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
+
+
+class StoryboardModel(BaseModel):
+    """模型基类：保留未声明的字段，允许用字段名或别名构造"""
+
+    model_config = ConfigDict(extra="allow", populate_by_name=True)
+
+
+class Meta(StoryboardModel):
+    """课程元信息"""
+    title: str = ""
+    duration_target_s: float = 180
+    audience: str = "general"
+    language: str = "zh-CN"
+    style: str = "tech-minimal"
+    version: str = "1.0.0"
+
+
+class Element(StoryboardModel):
+    """单个视觉元素"""
+    type: str
+    id: str
+    content: Optional[str] = None
+    label: Optional[str] = None
+    anchor: str = "middle-center"
+    color: str = "WHITE"
+    size: str = "medium"
+    from_: Optional[str] = Field(None, alias="from")
+    to: Optional[str] = None
+    style: str = "solid"
+
+
+class Layout(StoryboardModel):
+    """布局配置"""
+    grid: str = "3x3"
+    margin: float = 0.5
+
+
+class Visual(StoryboardModel):
+    """视觉元素定义"""
+    elements: list[Element] = []
+    layout: Layout = Field(default_factory=Layout)
+
+
+class AnimationStep(StoryboardModel):
+    """单个动画步骤"""
+    action: str
+    target: Union[str, list[str]] = []
+    duration_s: float = 1.0
+    params: dict = {}
+    cue: Optional[str] = None  # 旁白关键词：读到该词时开始本步骤
+
+    @property
+    def targets(self) -> list:
+        """目标元素 ID 列表（单个目标也返回列表）"""
+        return [self.target] if isinstance(self.target, str) else list(self.target)
+
+
+class Animation(StoryboardModel):
+    """动画定义"""
+    steps: list[AnimationStep] = []
+
+
+class Narration(StoryboardModel):
+    """旁白/配音定义"""
+    vo_text: str = ""
+    voice: Optional[str] = None  # 未指定时使用 ALIYUN_TTS_VOICE
+    speed: float = 1.0
+    pause_before_s: float = 0
+    pause_after_s: float = 0.5
+    emotion: str = "neutral"
+
+
+class Subtitle(StoryboardModel):
+    """字幕定义"""
+    text: Optional[str] = None
+    style: str = "default"
+
+
+class Checks(StoryboardModel):
+    """质量检查规则"""
+    must_show: list[str] = []
+    no_overlap: bool = True
+    bounds_check: bool = True
+
+
+class Scene(StoryboardModel):
+    """单个场景"""
+    id: str
+    duration_s: float = 0
+    hash_: Optional[str] = Field(None, alias="_hash")
+    visual: Visual = Field(default_factory=Visual)
+    animation: Animation = Field(default_factory=Animation)
+    narration: Narration = Field(default_factory=Narration)
+    subtitle: Subtitle = Field(default_factory=Subtitle)
+    checks: Checks = Field(default_factory=Checks)
+
+    _raw: dict = PrivateAttr(default_factory=dict)
+    _elements_by_id: dict = PrivateAttr(default_factory=dict)
+    _start_s: float = PrivateAttr(0.0)
+
+    def model_post_init(self, context):
+        self._elements_by_id = {element.id: element for element in self.visual.elements}
+
+    @property
+    def raw(self) -> dict:
+        """原始 JSON 对象（用于哈希与写回）"""
+        return self._raw
+
+    @property
+    def elements_by_id(self) -> dict:
+        return self._elements_by_id
+
+    def element(self, element_id: str) -> Optional[Element]:
+        return self._elements_by_id.get(element_id)
+
+    @property
+    def start_s(self) -> float:
+        """场景在整课中的开始时间（按 duration_s 累加）"""
+        return self._start_s
+
+    @property
+    def end_s(self) -> float:
+        return self._start_s + self.duration_s
+
+
+class Storyboard(StoryboardModel):
+    """分镜脚本"""
+    meta: Meta = Field(default_factory=Meta)
+    scenes: list[Scene] = []
+
+    _raw: dict = PrivateAttr(default_factory=dict)
+    _path: Optional[Path] = PrivateAttr(None)
+    _scenes_by_id: dict = PrivateAttr(default_factory=dict)
+
+    def model_post_init(self, context):
+        start = 0.0
+        self._scenes_by_id = {}
+        for scene in self.scenes:
+            scene._start_s = start
+            start += scene.duration_s
+            self._scenes_by_id.setdefault(scene.id, scene)
+
+    @classmethod
+    def from_dict(cls, data: dict, path: Path = None) -> "Storyboard":
+        """从已加载的 JSON 构造（保留原始数据）"""
+        storyboard = cls.model_validate(data)
+        storyboard._raw = data
+        storyboard._path = Path(path) if path else None
+        for scene, raw_scene in zip(storyboard.scenes, data.get("scenes", [])):
+            scene._raw = raw_scene
+        return storyboard
+
+    @classmethod
+    def load(cls, path: Path) -> "Storyboard":
+        """读取并解析 storyboard.json"""
+        path = Path(path)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls.from_dict(data, path)
+
+    def save(self, path: Path = None) -> Path:
+        """写回原始 JSON（如更新后的 _hash）"""
+        path = Path(path or self._path)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self._raw, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        return path
+
+    @property
+    def raw(self) -> dict:
+        return self._raw
+
+    @property
+    def path(self) -> Optional[Path]:
+        return self._path
+
+    @property
+    def scenes_by_id(self) -> dict:
+        return self._scenes_by_id
+
+    def scene(self, scene_id: str) -> Optional[Scene]:
+        return self._scenes_by_id.get(scene_id)
+
+    @property
+    def scene_ids(self) -> list:
+        return [scene.id for scene in self.scenes]
+
+    @property
+    def total_duration_s(self) -> float:
+        return self.scenes[-1].end_s if self.scenes else 0.0
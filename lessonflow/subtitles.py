@@ -0,0 +1,360 @@
+"""
+LessonFlowAI - 字幕工具
+
+字幕条目（cue）统一表示为 {"start": 秒, "end": 秒, "text": 文本}，
+场景内时间为相对场景起点的时间，合并整课字幕时再加上场景偏移。
+
+align_cues() 根据 TTS 字级时间戳生成字幕：旁白文本与时间戳顺序对齐（线性），
+按句末标点、行长与单条时长断句，再按阅读速度延长显示时间，全程为生成器。
+"""
+
+import json
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+from lessonflow.tts import compile_glossary, glossary_replacements
+
+# 句末标点（强制断句）
+SENTENCE_MARKS = "。！？!?"
+
+# 句中标点与空白（超长时优先在此处断句）
+SOFT_BREAK_MARKS = "，、；：,;: "
+
+# 断句时去掉的行尾标点
+TRAILING_MARKS = "，、；：,;:"
+
+
+@dataclass
+class SubtitleRules:
+    """字幕断句规则"""
+    max_line_chars: int = 18  # 每行最多字符数
+    max_lines: int = 2  # 每条字幕最多行数
+    max_cps: float = 9.0  # 阅读速度上限（字符/秒）
+    min_duration_s: float = 0.8  # 单条最短显示时间
+    max_duration_s: float = 6.0  # 单条最长显示时间
+    min_gap_s: float = 0.04  # 相邻字幕最小间隔
+
+
+def format_timestamp(seconds: float, separator: str = ",") -> str:
+    """格式化时间戳：SRT 使用 00:00:00,000，VTT 使用 00:00:00.000"""
+    total_ms = max(0, int(round(seconds * 1000)))
+    hours, rest = divmod(total_ms, 3600000)
+    minutes, rest = divmod(rest, 60000)
+    secs, ms = divmod(rest, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{ms:03d}"
+
+
+def format_ass_timestamp(seconds: float) -> str:
+    """格式化 ASS 时间戳：0:00:00.00"""
+    total_cs = max(0, int(round(seconds * 100)))
+    hours, rest = divmod(total_cs, 360000)
+    minutes, rest = divmod(rest, 6000)
+    secs, cs = divmod(rest, 100)
+    return f"{hours:d}:{minutes:02d}:{secs:02d}.{cs:02d}"
+
+
+def estimate_timestamps(text: str, duration_s: float) -> list:
+    """
+    没有 TTS 时间戳时按字符数均分时长，生成与阿里云相同结构的字级时间戳
+    """
+    chars = [char for char in text if char.isalnum()]
+    if not chars or duration_s <= 0:
+        return []
+    step_ms = duration_s * 1000 / len(chars)
+    return [
+        {
+            "text": char,
+            "begin_time": int(i * step_ms),
+            "end_time": int((i + 1) * step_ms),
+            "begin_index": i,
+            "end_index": i + 1,
+        }
+        for i, char in enumerate(chars)
+    ]
+
+
+def spoken_text(ssml: str) -> str:
+    """SSML 片段实际读出的文本（<sub> 取别名，其余标签去掉）"""
+    ssml = re.sub(r'<sub\s+alias="([^"]*)"\s*>.*?</sub>', r"\1", ssml, flags=re.S)
+    return re.sub(r"<[^>]*>", "", ssml)
+
+
+def _normalize(text: str) -> str:
+    """只保留会产生时间戳的字符（字母、数字、汉字）"""
+    return "".join(char for char in text.lower() if char.isalnum())
+
+
+def _text_units(text: str, glossary: dict = None):
+    """
+    将旁白拆分为 (显示文本, 读出文本)：术语按术语表替换为实际读音，其余逐字
+    """
+    mapping = {}
+    if glossary:
+        pattern, mapping = compile_glossary(glossary_replacements(glossary))
+    pos = 0
+    if mapping:
+        for match in pattern.finditer(text):
+            term = match.group(0)
+            if term not in mapping:
+                continue
+            for char in text[pos:match.start()]:
+                yield char, char
+            yield term, spoken_text(mapping[term])
+            pos = match.end()
+    for char in text[pos:]:
+        yield char, char
+
+
+def _stamp_chars(timestamps: list):
+    """将时间戳展开为逐字符的 (开始秒, 结束秒)，多字符的词按字符均分时长"""
+    for stamp in timestamps:
+        chars = _normalize(stamp.get("text", "")) or " "
+        begin, end = stamp["begin_time"] / 1000, stamp["end_time"] / 1000
+        step = (end - begin) / len(chars)
+        for i in range(len(chars)):
+            yield begin + i * step, begin + (i + 1) * step
+
+
+def align_tokens(text: str, timestamps: list, glossary: dict = None):
+    """
+    将字级时间戳与旁白文本对齐
+
+    时间戳只包含读出的字符：旁白先按术语表换成实际读音（与 prepare_ssml 一致），
+    每个显示单元按读音字符数依次消耗时间戳；标点与空白不占时间，
+    附加到前一个单元。TTS 读法与字符数不一致时误差只会顺延，不会回溯。
+
+    Yields:
+        tuple: (显示文本, 开始秒, 结束秒)
+    """
+    chars = _stamp_chars(timestamps)
+    cursor = 0.0
+    previous = None
+
+    for display, spoken in _text_units(text, glossary):
+        count = len(_normalize(spoken))
+        if not count:
+            if previous:
+                previous = (previous[0] + display, previous[1], previous[2])
+            continue
+
+        span = [times for _, times in zip(range(count), chars)]
+        start, end = (span[0][0], span[-1][1]) if span else (cursor, cursor)
+        cursor = end
+        if previous:
+            yield previous
+        previous = (display, start, end)
+
+    if previous:
+        # 剩余的时间戳（读音比原文长）归入最后一个单元
+        for _, end in chars:
+            previous = (previous[0], previous[1], end)
+        yield previous
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isascii() and char.isalnum()
+
+
+def wrap_text(text: str, max_line_chars: int) -> str:
+    """
+    超过单行长度时在靠近中间的断句点折成两行
+
+    没有合适的断句点时取最靠近中间的字间位置，但不会拆开英文单词或数字
+    （两个 ASCII 字母/数字之间不断行）；找不到可断开的位置时保持单行。
+    """
+    if len(text) <= max_line_chars:
+        return text
+    middle = len(text) // 2
+    breaks = [i + 1 for i, char in enumerate(text[:-1]) if char in SOFT_BREAK_MARKS]
+    cut = min(breaks, key=lambda i: abs(i - middle)) if breaks else None
+    if cut is None or abs(cut - middle) > max_line_chars // 3:
+        boundaries = [
+            i for i in range(1, len(text))
+            if not (_is_word_char(text[i - 1]) and _is_word_char(text[i]))
+        ]
+        if not boundaries:
+            return text
+        cut = min(boundaries, key=lambda i: abs(i - middle))
+    return text[:cut].rstrip() + "\n" + text[cut:].lstrip()
+
+
+def _group_cues(tokens, rules: SubtitleRules):
+    """按句末标点、字符数与时长上限分组，超长时在最近的句中标点处断开"""
+    max_chars = rules.max_line_chars * rules.max_lines
+    current = []
+    length = 0
+
+    for token in tokens:
+        text, start, end = token
+        if current and (
+            length + len(text.strip()) > max_chars
+            or end - current[0][1] > rules.max_duration_s
+        ):
+            # 在最后一个句中标点处断开（前半段太短时直接整段输出）
+            cut, prefix = len(current), 0
+            for i, item in enumerate(current[:-1]):
+                prefix += len(item[0].strip())
+                if item[0][-1:] in SOFT_BREAK_MARKS and prefix >= rules.max_line_chars // 2:
+                    cut = i + 1
+            yield current[:cut]
+            current = current[cut:]
+            length = sum(len(t[0].strip()) for t in current)
+
+        current.append(token)
+        length += len(text.strip())
+        if text.rstrip()[-1:] in SENTENCE_MARKS:
+            yield current
+            current, length = [], 0
+
+    if current:
+        yield current
+
+
+def align_cues(
+    text: str,
+    timestamps: list,
+    rules: SubtitleRules = None,
+    total_duration_s: float = None,
+    glossary: dict = None,
+):
+    """
+    根据 TTS 字级时间戳生成字幕条目
+
+    Args:
+        text: 旁白原文（用于补回标点与空白）
+        timestamps: .timestamps.json 中的 subtitles 列表
+        rules: 断句规则
+        glossary: 合成时使用的术语表（用于还原术语别名的读音）
+        total_duration_s: 场景时长，最后一条字幕不会超过该时间
+
+    Yields:
+        dict: 场景内相对时间的字幕条目
+    """
+    rules = rules or SubtitleRules()
+    pending = None
+
+    for group in _group_cues(align_tokens(text, timestamps, glossary), rules):
+        content = "".join(t[0] for t in group).strip().rstrip(TRAILING_MARKS).strip()
+        if not content:
+            continue
+        cue = {"start": group[0][1], "end": group[-1][2], "text": content}
+
+        if pending:
+            yield _finish_cue(pending, rules, cue["start"] - rules.min_gap_s)
+        pending = cue
+
+    if pending:
+        yield _finish_cue(pending, rules, total_duration_s)
+
+
+def _finish_cue(cue: dict, rules: SubtitleRules, limit: float = None) -> dict:
+    """按最短显示时间与阅读速度延长结束时间（不超过下一条字幕的开始）"""
+    readable = len(cue["text"].replace(" ", "")) / rules.max_cps
+    end = max(cue["end"], cue["start"] + rules.min_duration_s, cue["start"] + readable)
+    if limit is not None:
+        end = max(cue["end"], min(end, limit))
+    return {
+        "start": round(cue["start"], 3),
+        "end": round(end, 3),
+        "text": wrap_text(cue["text"], rules.max_line_chars),
+    }
+
+
+def load_cues(path: Path) -> list:
+    """读取场景字幕文件（subs/<scene_id>.cues.json）"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("cues", [])
+
+
+def offset_cues(scene_cues: list):
+    """
+    合并多个场景的字幕
+
+    Args:
+        scene_cues: [(场景起始秒, cues), ...]
+
+    Yields:
+        dict: 加上场景偏移后的字幕条目
+    """
+    for offset, cues in scene_cues:
+        for cue in cues:
+            yield {
+                "start": cue["start"] + offset,
+                "end": cue["end"] + offset,
+                "text": cue["text"],
+            }
+
+
+def write_srt(cues, path: Path) -> Path:
+    """写入 SRT 字幕"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for index, cue in enumerate(cues, 1):
+            f.write(f"{index}\n")
+            f.write(f"{format_timestamp(cue['start'])} --> {format_timestamp(cue['end'])}\n")
+            f.write(f"{cue['text']}\n\n")
+    return path
+
+
+def write_ass(
+    cues,
+    path: Path,
+    font: str = "PingFang SC",
+    font_size: int = 24,
+    margin_v: int = 50,
+) -> Path:
+    """
+    写入 ASS 字幕
+
+    画布使用 libass 渲染 SRT 时的默认尺寸（384x288），
+    字号与边距和 post.HARDSUB_STYLE 含义一致。
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(
+            "[Script Info]\n"
+            "ScriptType: v4.00+\n"
+            "PlayResX: 384\n"
+            "PlayResY: 288\n"
+            "WrapStyle: 0\n\n"
+            "[V4+ Styles]\n"
+            "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, "
+            "BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, "
+            "BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding\n"
+            f"Style: Default,{font},{font_size},&H00FFFFFF,&H00FFFFFF,&H00000000,&H80000000,"
+            f"0,0,0,0,100,100,0,0,1,2,1,2,10,10,{margin_v},1\n\n"
+            "[Events]\n"
+            "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+        )
+        for cue in cues:
+            text = cue["text"].replace("{", "(").replace("}", ")").replace("\n", "\\N")
+            f.write(
+                f"Dialogue: 0,{format_ass_timestamp(cue['start'])},"
+                f"{format_ass_timestamp(cue['end'])},Default,,0,0,0,,{text}\n"
+            )
+    return path
+
+
+def write_vtt(cues, path: Path, timestamp_map: str = None) -> Path:
+    """
+    写入 WebVTT 字幕
+
+    timestamp_map: HLS 字幕分片的 X-TIMESTAMP-MAP（如 "MPEGTS:126000,LOCAL:00:00:00.000"）
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("WEBVTT\n")
+        if timestamp_map:
+            f.write(f"X-TIMESTAMP-MAP={timestamp_map}\n")
+        f.write("\n")
+        for cue in cues:
+            f.write(
+                f"{format_timestamp(cue['start'], '.')} --> "
+                f"{format_timestamp(cue['end'], '.')}\n"
+            )
+            f.write(f"{cue['text']}\n\n")
+    return path
@@ -0,0 +1,118 @@
+"""
+LessonFlowAI - 音画时长对齐
+
+按场景比较渲染画面时长与 TTS 配音时长（含 pause_before_s / pause_after_s），
+在音频/合成阶段消化差异，而不是重新渲染 Manim 场景：
+- 配音较短：音频末尾补静音
+- 配音略长：在 MAX_TEMPO 以内加快语速（atempo），画面时长不变
+- 配音过长：按 MAX_TEMPO 加速后仍超出的部分，定格最后一帧延长画面（tpad）
+
+产出的时间计划（timing/<scene_id>.timing.json）由 mux 与字幕阶段共同使用。
+"""
+
+import json
+import os
+import wave
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+# 允许的最大加速倍数（超过后听感明显变化）
+MAX_TEMPO = float(os.getenv("LESSONFLOW_MAX_TEMPO", "1.15"))
+
+# 小于该差值（秒）不调整语速，直接补齐
+TOLERANCE_S = 0.05
+
+
+@dataclass
+class TimingPlan:
+    """单个场景的音画对齐计划"""
+    scene_id: str
+    video_s: float  # 渲染画面时长
+    audio_s: float  # 配音时长
+    pause_before_s: float = 0.0  # 配音前静音（adelay）
+    pause_after_s: float = 0.0  # 配音后至少保留的静音
+    tempo: float = 1.0  # 配音加速倍数（atempo）
+    video_pad_s: float = 0.0  # 定格最后一帧的时长（tpad）
+    audio_pad_s: float = 0.0  # 配音后补齐的静音（含 pause_after_s）
+    target_s: float = 0.0  # 片段最终时长
+    action: str = "none"  # none / pad_audio / tempo / pad_video / tempo+pad_video
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def map_time(self, t: float) -> float:
+        """配音内时间 → 片段内时间（用于字幕）"""
+        return self.pause_before_s + t / self.tempo
+
+    def video_filter(self) -> str:
+        """视频滤镜（不需要延长画面时返回空字符串，可流复制）"""
+        if self.video_pad_s <= 0:
+            return ""
+        return f"tpad=stop_mode=clone:stop_duration={self.video_pad_s:.3f}"
+
+    def audio_filter(self) -> str:
+        """音频滤镜：前置静音 → 加速 → 补齐静音"""
+        filters = []
+        if self.pause_before_s > 0:
+            filters.append(f"adelay={round(self.pause_before_s * 1000)}:all=1")
+        if self.tempo != 1.0:
+            filters.append(f"atempo={self.tempo:.4f}")
+        filters.append(f"apad=pad_dur={max(self.audio_pad_s, 0):.3f}")
+        return ",".join(filters)
+
+
+def plan_timing(
+    scene_id: str,
+    video_s: float,
+    audio_s: float,
+    pause_before_s: float = 0.0,
+    pause_after_s: float = 0.0,
+    max_tempo: float = MAX_TEMPO,
+) -> TimingPlan:
+    """
+    计算音画对齐计划
+
+    配音区间 = pause_before_s + 配音 + pause_after_s，画面时长优先保持不变。
+    """
+    video_s, audio_s = float(video_s), float(audio_s)
+    plan = TimingPlan(scene_id, round(video_s, 3), round(audio_s, 3), pause_before_s, pause_after_s)
+    speech_s = pause_before_s + audio_s + pause_after_s
+
+    if speech_s <= video_s:
+        # 配音较短：补静音到画面结束
+        plan.audio_pad_s = max(video_s - pause_before_s - audio_s, pause_after_s)
+        plan.target_s = video_s
+    elif speech_s <= video_s + TOLERANCE_S:
+        # 几乎相等：缩短末尾停顿，画面保持流复制（剩余不足 TOLERANCE_S 的部分由 -t 截断）
+        plan.audio_pad_s = max(video_s - pause_before_s - audio_s, 0.0)
+        plan.target_s = video_s
+    else:
+        available_s = video_s - pause_before_s - pause_after_s
+        tempo = audio_s / available_s if available_s > 0 else float("inf")
+        plan.tempo = min(tempo, max_tempo)
+        plan.audio_pad_s = pause_after_s
+        plan.target_s = max(video_s, pause_before_s + audio_s / plan.tempo + pause_after_s)
+        plan.video_pad_s = plan.target_s - video_s
+
+    plan.tempo = round(plan.tempo, 4)
+    plan.audio_pad_s = round(plan.audio_pad_s, 3)
+    plan.video_pad_s = round(plan.video_pad_s, 3)
+    plan.target_s = round(plan.target_s, 3)
+    if plan.video_pad_s > 0:
+        plan.action = "tempo+pad_video" if plan.tempo != 1.0 else "pad_video"
+    elif plan.tempo != 1.0:
+        plan.action = "tempo"
+    elif plan.audio_pad_s > pause_after_s + TOLERANCE_S:
+        plan.action = "pad_audio"
+    return plan
+
+
+def load_timing_plan(path: Path) -> TimingPlan:
+    with open(path, "r", encoding="utf-8") as f:
+        return TimingPlan(**json.load(f))
+
+
+def wav_duration(path: Path) -> float:
+    """读取 WAV 时长（秒），只解析文件头"""
+    with wave.open(str(path), "rb") as wav:
+        return wav.getnframes() / wav.getframerate()
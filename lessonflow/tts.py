@@ -0,0 +1,777 @@
+"""
+LessonFlowAI - TTS 后端
+
+统一的 TTSBackend 接口，所有后端的 synthesize() 返回相同结构的结果，
+并输出音频与 .timestamps.json：
+- AliyunTTS: 阿里云智能语音交互（字级时间戳、SSML、AK/SK 动态刷新 Token）
+- OfflineTTS: 离线确定性后端，生成提示音与合成字级时间戳，用于 CI 与压测
+"""
+
+import json
+import math
+import os
+import queue
+import re
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Protocol, runtime_checkable
+
+# 尝试导入阿里云 SDK
+try:
+    from aliyunsdkcore.client import AcsClient
+    from aliyunsdkcore.request import CommonRequest
+    ALIYUN_CORE_SDK_AVAILABLE = True
+except ImportError:
+    ALIYUN_CORE_SDK_AVAILABLE = False
+
+try:
+    import nls
+    ALIYUN_NLS_SDK_AVAILABLE = True
+except ImportError:
+    ALIYUN_NLS_SDK_AVAILABLE = False
+
+
+@dataclass
+class TTSConfig:
+    """TTS 配置"""
+    voice: str = "zhitian_emo"  # 音色
+    format: str = "wav"  # 输出格式
+    sample_rate: int = 16000  # 采样率
+    volume: int = 50  # 音量 (0-100)
+    speech_rate: int = 0  # 语速 (-500 到 500)
+    pitch_rate: int = 0  # 音调 (-500 到 500)
+    enable_subtitle: bool = True  # 是否返回时间戳
+
+
+# 批量合成默认并发数（可通过 ALIYUN_TTS_MAX_CONCURRENCY 指定）
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("ALIYUN_TTS_MAX_CONCURRENCY", "4"))
+
+# 默认 TTS 后端（可通过 LESSONFLOW_TTS_BACKEND 指定: aliyun / offline）
+DEFAULT_BACKEND = os.getenv("LESSONFLOW_TTS_BACKEND", "aliyun")
+
+
+class RateLimiter:
+    """简单的 QPS 限制器：保证相邻两次请求的启动间隔不小于 1/qps 秒"""
+
+    def __init__(self, qps: float = None):
+        self.interval = 1.0 / qps if qps else 0.0
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+# 流式写盘时后台队列的最大数据块数（每块通常为几 KB）
+DEFAULT_WRITE_QUEUE_CHUNKS = 32
+
+
+class WavStreamWriter:
+    """
+    流式音频写入器
+
+    音频块到达时直接写入磁盘，不在内存中累积整段音频：
+    - 打开时先写入长度占位的 WAV 头，close() 时回填 RIFF/data 长度
+    - threaded=True 时由后台线程写盘，回调线程只负责入队；
+      队列有界，写盘跟不上时阻塞回调线程，单个任务的内存占用不超过队列容量
+    - raw=True 时不写 WAV 头（pcm/mp3 等格式原样写出）
+    """
+
+    HEADER_SIZE = 44
+    # 占位长度取最大值，下游可在写入过程中按流读取
+    PLACEHOLDER_SIZE = 0xFFFFFFFF
+
+    def __init__(
+        self,
+        path: str,
+        sample_rate: int = 16000,
+        channels: int = 1,
+        sample_width: int = 2,
+        raw: bool = False,
+        threaded: bool = False,
+        max_queue_chunks: int = DEFAULT_WRITE_QUEUE_CHUNKS
+    ):
+        self.path = Path(path)
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.raw = raw
+        self.bytes_written = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "wb")
+        if not raw:
+            self._file.write(self._header(self.PLACEHOLDER_SIZE))
+
+        self._queue = None
+        self._thread = None
+        self._error = None
+        if threaded:
+            self._queue = queue.Queue(maxsize=max_queue_chunks)
+            self._thread = threading.Thread(target=self._drain, daemon=True)
+            self._thread.start()
+
+    def _header(self, data_size: int) -> bytes:
+        """44 字节 PCM WAV 头"""
+        riff_size = min(data_size + 36, self.PLACEHOLDER_SIZE)
+        block_align = self.channels * self.sample_width
+        return struct.pack(
+            "<4sI4s4sIHHIIHH4sI",
+            b"RIFF", riff_size, b"WAVE",
+            b"fmt ", 16, 1, self.channels, self.sample_rate,
+            self.sample_rate * block_align, block_align, self.sample_width * 8,
+            b"data", data_size
+        )
+
+    def _write_chunk(self, chunk: bytes):
+        self._file.write(chunk)
+        self._file.flush()
+        self.bytes_written += len(chunk)
+
+    def _drain(self):
+        """后台写盘线程"""
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                return
+            if self._error is None:
+                try:
+                    self._write_chunk(chunk)
+                except OSError as e:
+                    self._error = e
+
+    def write(self, chunk: bytes):
+        """写入一个音频块（threaded 模式下复制后入队）"""
+        if self._error is not None:
+            raise RuntimeError(f"音频写入失败: {self._error}")
+        if self._queue is not None:
+            self._queue.put(bytes(chunk))
+        else:
+            self._write_chunk(chunk)
+
+    def _stop(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def close(self) -> int:
+        """等待写盘完成并回填 WAV 头，返回音频数据字节数"""
+        self._stop()
+        try:
+            if self._error is not None:
+                raise RuntimeError(f"音频写入失败: {self._error}")
+            if not self.raw:
+                self._file.seek(0)
+                self._file.write(self._header(self.bytes_written))
+        finally:
+            self._file.close()
+        return self.bytes_written
+
+    def abort(self):
+        """放弃写入并删除不完整的文件"""
+        self._stop()
+        self._file.close()
+        self.path.unlink(missing_ok=True)
+
+    @property
+    def duration_ms(self) -> int:
+        """已写入音频的时长（raw 模式下格式未知，返回 None）"""
+        if self.raw:
+            return None
+        bytes_per_second = self.sample_rate * self.channels * self.sample_width
+        return self.bytes_written * 1000 // bytes_per_second
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+@runtime_checkable
+class TTSBackend(Protocol):
+    """TTS 后端接口"""
+
+    name: str
+
+    def synthesize(self, text: str, output_path: str, config: TTSConfig = None) -> dict:
+        """
+        合成语音，写出音频文件与同名 .timestamps.json
+
+        Returns:
+            dict: 包含 audio_path, timestamps_path, duration_ms,
+                  subtitle_count, character_count
+        """
+        ...
+
+    def synthesize_many(
+        self,
+        items: list,
+        max_concurrency: int = None,
+        qps: float = None
+    ) -> list:
+        """批量合成，返回与 items 顺序一致的结果（失败项 ok=False）"""
+        ...
+
+
+class BatchSynthesisMixin:
+    """
+    批量合成混入类
+
+    为实现了 synthesize() 的后端提供有界并发的 synthesize_many()。
+    后端可覆盖 prepare_batch() 在分发前完成共享的准备工作（如获取 Token）。
+    """
+
+    def prepare_batch(self):
+        """批量合成前的准备工作，抛出异常时整批失败"""
+
+    def synthesize_many(
+        self,
+        items: list,
+        max_concurrency: int = None,
+        qps: float = None
+    ) -> list:
+        """
+        批量并发合成
+
+        单个任务失败不会中断整批。
+
+        Args:
+            items: 任务列表，每项为 {"text", "output_path", "config"(可选)}
+            max_concurrency: 最大并发请求数
+            qps: 每秒最多发起的请求数（None 表示不限制）
+
+        Returns:
+            list: 与 items 顺序一致的结果；成功项为 synthesize 的返回值加 ok=True，
+                  失败项为 {"ok": False, "error": 错误信息}
+        """
+        if not items:
+            return []
+
+        limiter = RateLimiter(qps)
+
+        def run(item: dict) -> dict:
+            try:
+                limiter.acquire()
+                result = self.synthesize(item["text"], item["output_path"], item.get("config"))
+                return {"ok": True, **result}
+            except Exception as e:
+                return {"ok": False, "error": str(e), "output_path": str(item["output_path"])}
+
+        try:
+            self.prepare_batch()
+        except Exception as e:
+            return [{"ok": False, "error": str(e), "output_path": str(item["output_path"])}
+                    for item in items]
+
+        workers = min(max_concurrency or DEFAULT_MAX_CONCURRENCY, len(items))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(run, items))
+
+
+class AliyunTTS(BatchSynthesisMixin):
+    """阿里云 TTS 服务封装"""
+
+    name = "aliyun"
+
+    # Token 缓存（类级别，避免重复获取）
+    _cached_token: str = None
+    _cached_token_expire_time: int = 0
+    _token_lock = threading.Lock()
+
+    def __init__(
+        self,
+        access_key_id: str = None,
+        access_key_secret: str = None,
+        app_key: str = None,
+        region: str = "cn-shanghai",
+        synthesizer_factory: Callable = None
+    ):
+        """
+        初始化 TTS 服务
+
+        参数可以从环境变量读取：
+        - ALIYUN_ACCESS_KEY_ID (必需)
+        - ALIYUN_ACCESS_KEY_SECRET (必需)
+        - ALIYUN_TTS_APP_KEY (可选，如果不提供则使用默认 appkey)
+
+        Token 会使用 AK/SK 动态刷新，无需手动管理
+
+        synthesizer_factory 默认为 nls.NlsSpeechSynthesizer，
+        测试时可替换为本地假合成器（接受相同的构造参数并提供 start()）
+        """
+        self.access_key_id = access_key_id or os.getenv("ALIYUN_ACCESS_KEY_ID")
+        self.access_key_secret = access_key_secret or os.getenv("ALIYUN_ACCESS_KEY_SECRET")
+        self.app_key = app_key or os.getenv("ALIYUN_TTS_APP_KEY")
+        self.region = region
+        self.synthesizer_factory = synthesizer_factory or (
+            nls.NlsSpeechSynthesizer if ALIYUN_NLS_SDK_AVAILABLE else None
+        )
+
+        if not all([self.access_key_id, self.access_key_secret]):
+            raise ValueError(
+                "缺少阿里云配置。请设置环境变量:\n"
+                "  ALIYUN_ACCESS_KEY_ID (必需)\n"
+                "  ALIYUN_ACCESS_KEY_SECRET (必需)\n"
+                "  ALIYUN_TTS_APP_KEY (可选)"
+            )
+
+    def _get_token(self) -> str:
+        """
+        获取访问 Token（使用 AK/SK 动态刷新）
+
+        Token 有效期内会复用缓存，过期前自动刷新；
+        并发调用时只有一个线程会去刷新
+        """
+        with AliyunTTS._token_lock:
+            return self._refresh_token()
+
+    def _refresh_token(self) -> str:
+        # Token 有效期内直接返回（提前 5 分钟刷新）
+        if (AliyunTTS._cached_token and
+            time.time() < AliyunTTS._cached_token_expire_time - 300):
+            return AliyunTTS._cached_token
+
+        if not ALIYUN_CORE_SDK_AVAILABLE:
+            raise RuntimeError("阿里云核心 SDK 未安装: pip install aliyun-python-sdk-core==2.15.1")
+
+        client = AcsClient(
+            self.access_key_id,
+            self.access_key_secret,
+            self.region
+        )
+
+        request = CommonRequest()
+        request.set_method('POST')
+        request.set_domain('nls-meta.cn-shanghai.aliyuncs.com')
+        request.set_version('2019-02-28')
+        request.set_action_name('CreateToken')
+
+        try:
+            response = client.do_action_with_exception(request)
+            result = json.loads(response)
+
+            AliyunTTS._cached_token = result["Token"]["Id"]
+            AliyunTTS._cached_token_expire_time = result["Token"]["ExpireTime"]
+
+            expire_time = time.localtime(AliyunTTS._cached_token_expire_time)
+            print(f"✅ Token 刷新成功，有效期至: {time.strftime('%Y-%m-%d %H:%M:%S', expire_time)}")
+
+            return AliyunTTS._cached_token
+        except Exception as e:
+            raise RuntimeError(f"获取 Token 失败: {e}")
+
+    def get_token_info(self) -> dict:
+        """获取当前 Token 信息"""
+        token = self._get_token()
+        expire_time = AliyunTTS._cached_token_expire_time
+        return {
+            "token": token[:20] + "..." if token else None,
+            "expire_time": expire_time,
+            "expire_time_str": time.strftime('%Y-%m-%d %H:%M:%S',
+                                             time.localtime(expire_time)) if expire_time else None,
+            "remaining_seconds": int(expire_time - time.time()) if expire_time else 0
+        }
+
+    def synthesize(
+        self,
+        text: str,
+        output_path: str,
+        config: TTSConfig = None
+    ) -> dict:
+        """
+        合成语音
+
+        Args:
+            text: 要合成的文本（支持 SSML）
+            output_path: 输出音频文件路径
+            config: TTS 配置
+
+        Returns:
+            dict: 包含 audio_path, timestamps_path, duration_ms 等信息
+        """
+        if self.synthesizer_factory is None:
+            raise RuntimeError("阿里云 NLS SDK 未安装: pip install alibabacloud-nls")
+
+        config = config or TTSConfig()
+        token = self._get_token()
+
+        # 如果没有提供 app_key，使用默认值（需要从阿里云控制台获取）
+        appkey = self.app_key
+        if not appkey:
+            raise ValueError(
+                "合成语音需要 APP_KEY。请在阿里云智能语音控制台创建项目获取:\n"
+                "  https://nls-portal.console.aliyun.com/\n"
+                "  然后设置环境变量 ALIYUN_TTS_APP_KEY"
+            )
+
+        # 音频边接收边写盘；wav 格式请求 PCM 数据，由 WavStreamWriter 写入文件头
+        output_path = Path(output_path)
+        writer = WavStreamWriter(
+            output_path,
+            sample_rate=config.sample_rate,
+            raw=config.format != "wav",
+            threaded=True
+        )
+        timestamps = []
+
+        def on_data(data, *args):
+            """接收音频数据"""
+            writer.write(data)
+
+        def on_message(message, *args):
+            """接收消息（包含时间戳）"""
+            try:
+                msg = json.loads(message)
+                if "payload" in msg and "subtitles" in msg["payload"]:
+                    timestamps.extend(msg["payload"]["subtitles"])
+            except json.JSONDecodeError:
+                pass
+
+        def on_error(message, *args):
+            """错误处理"""
+            raise RuntimeError(f"TTS 错误: {message}")
+
+        with writer:
+            # 创建合成器
+            synthesizer = self.synthesizer_factory(
+                url="wss://nls-gateway.cn-shanghai.aliyuncs.com/ws/v1",
+                token=token,
+                appkey=appkey,
+                on_data=on_data,
+                on_message=on_message,
+                on_error=on_error
+            )
+
+            # 开始合成
+            synthesizer.start(
+                text=text,
+                voice=config.voice,
+                aformat="pcm" if config.format == "wav" else config.format,
+                sample_rate=config.sample_rate,
+                volume=config.volume,
+                speech_rate=config.speech_rate,
+                pitch_rate=config.pitch_rate,
+                enable_subtitle=config.enable_subtitle
+            )
+
+        # 保存时间戳
+        timestamps_path = output_path.with_suffix(".timestamps.json")
+        with open(timestamps_path, "w", encoding="utf-8") as f:
+            json.dump({"subtitles": timestamps}, f, ensure_ascii=False, indent=2)
+
+        # 计算时长（没有时间戳时按写入的音频长度计算）
+        duration_ms = timestamps[-1]["end_time"] if timestamps else (writer.duration_ms or 0)
+
+        return {
+            "audio_path": str(output_path),
+            "timestamps_path": str(timestamps_path),
+            "duration_ms": duration_ms,
+            "subtitle_count": len(timestamps),
+            "character_count": len(text)
+        }
+
+    def prepare_batch(self):
+        """批量合成前获取一次 Token，所有任务共享类级别缓存的 Token"""
+        self._get_token()
+
+    @staticmethod
+    def estimate_cost(text: str, rate_per_10k_chars: float = 2.0) -> dict:
+        """
+        估算 TTS 费用
+
+        Args:
+            text: 要合成的文本
+            rate_per_10k_chars: 每万字符费率（元）
+
+        Returns:
+            dict: 包含字符数和预估费用
+        """
+        char_count = len(text)
+        cost = (char_count / 10000) * rate_per_10k_chars
+
+        return {
+            "character_count": char_count,
+            "estimated_cost_cny": round(cost, 2),
+            "rate": f"¥{rate_per_10k_chars}/万字符"
+        }
+
+
+class OfflineTTS(BatchSynthesisMixin):
+    """
+    离线 TTS 后端
+
+    不访问网络，按文本生成确定性的提示音（或静音）与字级时间戳：
+    - 每个可读字符占固定时长，受 speech_rate 与 <prosody rate> 影响
+    - <break time="..."/> 生成对应长度的静音，<sub alias> 按别名朗读
+    - 相同输入总是得到相同输出，可用于 CI 与语音/字幕/后期阶段的压测
+    - 音频按字符逐块写盘（WavStreamWriter），与 AliyunTTS 的写入路径一致
+    """
+
+    name = "offline"
+
+    def __init__(
+        self,
+        char_ms: int = 220,
+        tone_hz: float = 440.0,
+        silent: bool = False,
+        latency_s: float = 0.0
+    ):
+        """
+        Args:
+            char_ms: 每个汉字的朗读时长（毫秒），英文字母按 40% 计
+            tone_hz: 提示音频率
+            silent: 输出静音而不是提示音
+            latency_s: 每次请求额外等待的秒数，用于模拟服务延迟
+        """
+        self.char_ms = char_ms
+        self.tone_hz = tone_hz
+        self.silent = silent
+        self.latency_s = latency_s
+        self._tone_cache = {}
+        self._tone_lock = threading.Lock()
+
+    @staticmethod
+    def _speech_factor(config: TTSConfig, text: str) -> float:
+        """语速倍率：speech_rate -500~500 对应 0.5x~2x，再乘以 <prosody rate>"""
+        rate = config.speech_rate
+        factor = 1 + rate / 500 if rate >= 0 else 1 / (1 - rate / 500)
+        prosody = re.search(r'<prosody[^>]*\brate="([\d.]+)"', text)
+        if prosody:
+            factor *= float(prosody.group(1)) or 1.0
+        return factor
+
+    @staticmethod
+    def _tokens(text: str):
+        """
+        解析 SSML，依次产出 ("char", 字符) 或 ("break", 毫秒)
+        """
+        text = re.sub(r'<sub\s+alias="([^"]*)"\s*>.*?</sub>', r"\1", text, flags=re.S)
+        pattern = re.compile(r'<break\s+time="([\d.]+)(ms|s)"\s*/>|<[^>]*>|([^<]+)')
+        for match in pattern.finditer(text):
+            if match.group(1):
+                value = float(match.group(1))
+                yield "break", int(value * 1000 if match.group(2) == "s" else value)
+            elif match.group(3):
+                for char in match.group(3):
+                    if char.isalnum():
+                        yield "char", char
+
+    def _tone(self, samples: int, sample_rate: int, volume: int) -> bytes:
+        """生成（并缓存）一段带淡入淡出的提示音"""
+        key = (samples, sample_rate, volume)
+        with self._tone_lock:
+            if key not in self._tone_cache:
+                amplitude = 32767 * 0.3 * volume / 100
+                fade = max(1, min(samples // 10, sample_rate // 100))
+                frames = bytearray()
+                for i in range(samples):
+                    envelope = min(1.0, i / fade, (samples - 1 - i) / fade)
+                    phase = 2 * math.pi * self.tone_hz * i / sample_rate
+                    value = amplitude * envelope * math.sin(phase)
+                    frames += struct.pack("<h", int(value))
+                self._tone_cache[key] = bytes(frames)
+            return self._tone_cache[key]
+
+    def synthesize(
+        self,
+        text: str,
+        output_path: str,
+        config: TTSConfig = None
+    ) -> dict:
+        """合成离线音频，返回结构与 AliyunTTS.synthesize 一致"""
+        config = config or TTSConfig()
+        if config.format not in ("wav", "pcm"):
+            raise ValueError(f"离线后端只支持 wav/pcm 格式: {config.format}")
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+        factor = self._speech_factor(config, text)
+        sample_rate = config.sample_rate
+        timestamps = []
+        cursor_ms = 0
+
+        output_path = Path(output_path)
+        raw = config.format == "pcm"
+        with WavStreamWriter(output_path, sample_rate=sample_rate, raw=raw) as writer:
+            for kind, value in self._tokens(text):
+                if kind == "break":
+                    duration_ms = int(value)
+                else:
+                    weight = 0.4 if value.isascii() else 1.0
+                    duration_ms = int(self.char_ms * weight / factor)
+                    timestamps.append({
+                        "text": value,
+                        "begin_time": cursor_ms,
+                        "end_time": cursor_ms + duration_ms,
+                        "begin_index": len(timestamps),
+                        "end_index": len(timestamps) + 1
+                    })
+                samples = duration_ms * sample_rate // 1000
+                if kind == "break" or self.silent:
+                    writer.write(bytes(samples * 2))
+                else:
+                    writer.write(self._tone(samples, sample_rate, config.volume))
+                cursor_ms += duration_ms
+
+        timestamps_path = output_path.with_suffix(".timestamps.json")
+        with open(timestamps_path, "w", encoding="utf-8") as f:
+            json.dump({"subtitles": timestamps}, f, ensure_ascii=False, indent=2)
+
+        return {
+            "audio_path": str(output_path),
+            "timestamps_path": str(timestamps_path),
+            "duration_ms": timestamps[-1]["end_time"] if timestamps else 0,
+            "subtitle_count": len(timestamps),
+            "character_count": len(text)
+        }
+
+    @staticmethod
+    def estimate_cost(text: str, rate_per_10k_chars: float = 0.0) -> dict:
+        """离线后端不产生费用"""
+        return AliyunTTS.estimate_cost(text, rate_per_10k_chars)
+
+
+# 句末标点（停顿 pause_after_period）与句中标点（停顿 pause_after_comma）
+PERIOD_MARKS = "。！？"
+COMMA_MARKS = "，；"
+
+
+def glossary_replacements(glossary: dict) -> tuple:
+    """
+    提取术语表中的发音替换规则
+
+    Returns:
+        tuple: ((术语, 替换文本), ...)，ssml 优先于 alias，两者都没有的术语不替换
+    """
+    replacements = []
+    for term, info in (glossary or {}).get("terms", {}).items():
+        if not term:
+            continue
+        if "ssml" in info:
+            replacements.append((term, info["ssml"]))
+        elif "alias" in info:
+            replacements.append((term, info["alias"]))
+    return tuple(replacements)
+
+
+def _trie_pattern(terms) -> str:
+    """
+    将术语列表编译为前缀树形式的正则
+
+    同一位置只会有一个分支继续匹配，终止节点的分支为可选分组，
+    因此在每个位置总是取最长的术语，且匹配耗时与术语数量无关。
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if "" in node else group
+
+    return build(trie)
+
+
+@lru_cache(maxsize=256)
+def compile_glossary(replacements: tuple) -> tuple:
+    """
+    编译术语匹配器（按替换规则缓存）
+
+    术语与停顿标点合并为一个正则，prepare_ssml 只需从左到右扫描一次，
+    替换结果不会再被其他术语或标点规则匹配。
+
+    Returns:
+        tuple: (编译后的正则, {术语: 替换文本})
+    """
+    mapping = dict(replacements)
+    marks = f"[{re.escape(PERIOD_MARKS + COMMA_MARKS)}]"
+    terms = _trie_pattern(mapping)
+    pattern = re.compile(f"{terms}|{marks}" if terms else marks)
+    return pattern, mapping
+
+
+def prepare_ssml(
+    text: str,
+    glossary: dict = None,
+    speed: float = 1.0,
+    pause_after_period: int = 300,
+    pause_after_comma: int = 150
+) -> str:
+    """
+    将普通文本转换为 SSML 格式
+
+    术语替换与标点停顿在同一次扫描中完成，同一位置优先匹配最长的术语。
+
+    Args:
+        text: 原始文本
+        glossary: 术语表（包含发音信息）
+        speed: 语速倍率
+        pause_after_period: 句号后停顿（毫秒）
+        pause_after_comma: 逗号后停顿（毫秒）
+
+    Returns:
+        str: SSML 格式文本
+    """
+    pattern, mapping = compile_glossary(glossary_replacements(glossary))
+
+    def replace(match) -> str:
+        token = match.group(0)
+        if token in mapping:
+            return mapping[token]
+        pause = pause_after_period if token in PERIOD_MARKS else pause_after_comma
+        return f'{token}<break time="{pause}ms"/>'
+
+    ssml_text = pattern.sub(replace, text)
+
+    # 包装为完整 SSML
+    ssml = f'''<speak>
+    <prosody rate="{speed}">
+        {ssml_text}
+    </prosody>
+</speak>'''
+
+    return ssml
+
+
+# 已注册的 TTS 后端
+TTS_BACKENDS = {
+    "aliyun": AliyunTTS,
+    "offline": OfflineTTS,
+}
+
+
+def create_tts(backend: str = None, **kwargs) -> TTSBackend:
+    """
+    创建 TTS 后端
+
+    Args:
+        backend: 后端名称（默认读取 LESSONFLOW_TTS_BACKEND，未设置时为 aliyun）
+        **kwargs: 传给后端构造函数的参数
+    """
+    name = backend or DEFAULT_BACKEND
+    if name not in TTS_BACKENDS:
+        raise ValueError(f"Unknown TTS backend: {name}. Available: {list(TTS_BACKENDS.keys())}")
+    return TTS_BACKENDS[name](**kwargs)
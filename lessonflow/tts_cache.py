@@ -0,0 +1,383 @@
+"""
+LessonFlowAI - TTS 音频缓存
+
+按「TTS 后端 + 规范化 SSML + 全部 TTSConfig 字段」的内容哈希缓存合成结果：
+- 音频与 .timestamps.json 一起存放，命中时直接复制到目标路径
+- 总大小超过上限时按最近访问时间（LRU，音频文件 mtime）淘汰
+- 多进程可共享同一缓存目录（写入与清理持有文件锁，命中不改写索引）
+- 记录命中次数与节省的字符数，用于估算节省的费用
+"""
+
+import atexit
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, is_dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from lessonflow.build import content_hash
+from lessonflow.tts import TTSConfig
+
+# 缓存目录（可通过 LESSONFLOW_CACHE_DIR 指定）
+DEFAULT_CACHE_DIR = Path(
+    os.getenv("LESSONFLOW_CACHE_DIR", Path.home() / ".cache" / "lessonflow")
+) / "tts"
+
+# 缓存大小上限（MB，可通过 LESSONFLOW_TTS_CACHE_MB 指定）
+DEFAULT_MAX_MB = int(os.getenv("LESSONFLOW_TTS_CACHE_MB", "2048"))
+
+# TTS 计费标准（元/万字符），与 AliyunTTS.estimate_cost 默认值一致
+DEFAULT_RATE_PER_10K_CHARS = 2.0
+
+
+def normalize_ssml(ssml: str) -> str:
+    """规范化 SSML：去掉标签间空白、合并连续空白，避免排版差异导致缓存失效"""
+    ssml = re.sub(r">\s+<", "><", ssml.strip())
+    ssml = re.sub(r">\s+", ">", ssml)
+    ssml = re.sub(r"\s+<", "<", ssml)
+    return re.sub(r"\s+", " ", ssml)
+
+
+def cache_key(ssml: str, config, backend: str = "aliyun") -> str:
+    """计算缓存 key：规范化 SSML + 全部配置字段 + 后端名称（config 为 None 时按默认 TTSConfig）"""
+    config = TTSConfig() if config is None else config
+    config_fields = asdict(config) if is_dataclass(config) else dict(config)
+    payload = {"ssml": normalize_ssml(ssml), "config": config_fields, "backend": backend}
+    return content_hash(payload)
+
+
+class TTSCache:
+    """
+    磁盘 TTS 缓存
+
+    每个条目由音频、时间戳与元数据（<key>.meta.json，最后写入）三个文件组成，
+    元数据存在即条目有效；最近访问时间取音频文件的 mtime（命中时 touch）。
+    命中只读条目文件，不改写共享索引；index.json 只保存命中统计。
+    写入、淘汰、孤立文件清理与统计合并都持有缓存目录下的文件锁，多进程共享缓存时互不覆盖。
+    """
+
+    def __init__(self, root: Path = None, max_bytes: int = None):
+        self.root = Path(root or DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes if max_bytes is not None else DEFAULT_MAX_MB * 1024 * 1024
+        self.index_path = self.root / "index.json"
+        self.lock_path = self.root / ".lock"
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        # 尚未合并到 index.json 的统计增量
+        self._pending = {"hits": 0, "misses": 0, "characters_saved": 0}
+        atexit.register(self.flush)
+
+    @contextmanager
+    def _locked(self):
+        """进程内线程锁 + 跨进程文件锁（无 fcntl 的平台只有线程锁）"""
+        with self._lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(self.lock_path, "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_index(self) -> dict:
+        if self.index_path.is_file():
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except (json.JSONDecodeError, OSError):
+                pass
+        return {"stats": {"hits": 0, "misses": 0, "characters_saved": 0}}
+
+    def _save_index(self, index: dict):
+        """写入 index.json（调用方持有文件锁）"""
+        tmp_path = self.index_path.with_suffix(f".json.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    def _paths(self, key: str) -> tuple:
+        base = self.root / key[:2] / key
+        return base.with_suffix(".wav"), base.with_suffix(".timestamps.json")
+
+    def _meta_path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.meta.json"
+
+    def _read_meta(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._meta_path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_meta(self, key: str, meta: dict):
+        meta_path = self._meta_path(key)
+        tmp_path = meta_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+
+    def _count(self, field: str, amount: int = 1):
+        with self._stats_lock:
+            self._pending[field] += amount
+
+    def get(self, key: str, output_path: str) -> Optional[dict]:
+        """
+        查找缓存，命中时复制音频和时间戳到 output_path
+
+        Returns:
+            dict | None: 与 AliyunTTS.synthesize 相同结构的结果，未命中返回 None
+        """
+        audio_path, timestamps_path = self._paths(key)
+        meta = self._read_meta(key)
+        output_path = Path(output_path)
+        output_timestamps = output_path.with_suffix(".timestamps.json")
+        try:
+            if meta is None:
+                raise FileNotFoundError(key)
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(audio_path, output_path)
+            shutil.copyfile(timestamps_path, output_timestamps)
+            # 更新 LRU 访问时间
+            os.utime(audio_path)
+        except FileNotFoundError:
+            # 未命中，或复制过程中条目被其他进程淘汰
+            self._count("misses")
+            return None
+
+        self._count("hits")
+        self._count("characters_saved", meta["character_count"])
+        return {
+            "audio_path": str(output_path),
+            "timestamps_path": str(output_timestamps),
+            "duration_ms": meta["duration_ms"],
+            "subtitle_count": meta["subtitle_count"],
+            "character_count": meta["character_count"],
+            "cached": True,
+        }
+
+    def put(self, key: str, result: dict):
+        """将合成结果存入缓存"""
+        audio_path, timestamps_path = self._paths(key)
+        with self._locked():
+            audio_path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(result["audio_path"], audio_path)
+            shutil.copyfile(result["timestamps_path"], timestamps_path)
+            self._write_meta(key, {
+                "created": time.time(),
+                "duration_ms": result.get("duration_ms", 0),
+                "subtitle_count": result.get("subtitle_count", 0),
+                "character_count": result.get("character_count", 0),
+            })
+            self._evict(self.max_bytes)
+
+    def _entries(self) -> dict:
+        """扫描缓存目录：{key: {"size", "last_access"}}（只包含元数据完整的条目）"""
+        entries = {}
+        if not self.root.is_dir():
+            return entries
+        for meta_path in self.root.glob("*/*.meta.json"):
+            key = meta_path.name.split(".", 1)[0]
+            try:
+                audio = self._paths(key)[0].stat()
+                size = audio.st_size + sum(
+                    path.stat().st_size for path in (self._paths(key)[1], meta_path)
+                )
+            except FileNotFoundError:
+                continue
+            entries[key] = {"size": size, "last_access": audio.st_mtime}
+        return entries
+
+    def _remove(self, key: str):
+        for path in (*self._paths(key), self._meta_path(key)):
+            path.unlink(missing_ok=True)
+
+    def _evict(self, max_bytes: int, older_than: float = None) -> dict:
+        """按 LRU 淘汰条目直到总大小不超过 max_bytes（调用方持有文件锁）"""
+        entries = self._entries()
+        total = sum(e["size"] for e in entries.values())
+        removed = {"entries": 0, "bytes": 0}
+
+        for key, entry in sorted(entries.items(), key=lambda kv: kv[1]["last_access"]):
+            expired = older_than is not None and entry["last_access"] < older_than
+            if total <= max_bytes and not expired:
+                continue
+            self._remove(key)
+            total -= entry["size"]
+            removed["entries"] += 1
+            removed["bytes"] += entry["size"]
+
+        return removed
+
+    def _sweep_orphans(self) -> int:
+        """删除没有元数据的缓存文件与残留临时文件（如写入中途被中断，调用方持有文件锁）"""
+        removed = 0
+        if not self.root.is_dir():
+            return removed
+        for path in self.root.glob("*/*"):
+            if path.name.endswith(".meta.json"):
+                continue
+            key = path.name.split(".", 1)[0]
+            if path.suffix == ".tmp" or not self._meta_path(key).is_file():
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+    def flush(self):
+        """把本进程的命中统计合并到 index.json"""
+        with self._stats_lock:
+            pending, self._pending = self._pending, dict.fromkeys(self._pending, 0)
+        if not any(pending.values()):
+            return
+        with self._locked():
+            index = self._load_index()
+            for field, amount in pending.items():
+                index["stats"][field] = index["stats"].get(field, 0) + amount
+            self._save_index(index)
+
+    def prune(self, max_bytes: int = None, older_than_days: float = None) -> dict:
+        """
+        清理缓存
+
+        Args:
+            max_bytes: 淘汰到不超过该大小（默认使用缓存上限）
+            older_than_days: 同时删除超过该天数未访问的条目
+
+        Returns:
+            dict: 删除的条目数、字节数与孤立文件数
+        """
+        older_than = time.time() - older_than_days * 86400 if older_than_days is not None else None
+        with self._locked():
+            removed = self._evict(
+                self.max_bytes if max_bytes is None else max_bytes,
+                older_than=older_than,
+            )
+            removed["orphans"] = self._sweep_orphans()
+        return removed
+
+    def stats(self, rate_per_10k_chars: float = DEFAULT_RATE_PER_10K_CHARS) -> dict:
+        """缓存统计信息"""
+        self.flush()
+        with self._locked():
+            entries = self._entries()
+            stats = self._load_index()["stats"]
+        lookups = stats["hits"] + stats["misses"]
+        return {
+            "path": str(self.root),
+            "entries": len(entries),
+            "size_bytes": sum(e["size"] for e in entries.values()),
+            "max_bytes": self.max_bytes,
+            "hits": stats["hits"],
+            "misses": stats["misses"],
+            "hit_rate": round(stats["hits"] / lookups, 3) if lookups else 0.0,
+            "characters_saved": stats["characters_saved"],
+            "cost_saved_cny": round(stats["characters_saved"] / 10000 * rate_per_10k_chars, 2),
+        }
+
+
+class CachedTTS:
+    """
+    带缓存的 TTS 包装
+
+    与 TTSBackend 接口一致。底层 TTS 在首次未命中时才创建，
+    全部命中时不需要任何 TTS 凭证，也不会发起请求。
+    不同后端的合成结果互不复用（backend 参与缓存 key）。
+    """
+
+    def __init__(self, tts_factory: Callable, cache: TTSCache = None, backend: str = "aliyun"):
+        self._tts_factory = tts_factory
+        self.backend = backend
+        self._tts = None
+        self._tts_lock = threading.Lock()
+        self._session_lock = threading.Lock()
+        self.cache = cache or TTSCache()
+        self.session = {"hits": 0, "misses": 0, "characters_saved": 0, "characters_billed": 0}
+
+    @property
+    def tts(self):
+        with self._tts_lock:
+            if self._tts is None:
+                self._tts = self._tts_factory()
+            return self._tts
+
+    def _store(self, key: str, result: dict):
+        """写入缓存；磁盘已满、无权限等错误只影响缓存，不影响已合成的结果"""
+        try:
+            self.cache.put(key, result)
+        except OSError as e:
+            print(f"   ⚠️ TTS 缓存写入失败（{result.get('audio_path')}）: {e}")
+
+    def synthesize(self, text: str, output_path: str, config=None) -> dict:
+        key = cache_key(text, config, self.backend)
+        result = self.cache.get(key, output_path)
+        if result is not None:
+            with self._session_lock:
+                self.session["hits"] += 1
+                self.session["characters_saved"] += result["character_count"]
+            return result
+
+        result = self.tts.synthesize(text, output_path, config)
+        self._store(key, result)
+        with self._session_lock:
+            self.session["misses"] += 1
+            self.session["characters_billed"] += result.get("character_count", 0)
+        return result
+
+    def synthesize_many(self, items: list, max_concurrency: int = None, qps: float = None) -> list:
+        """
+        批量合成：先查缓存，只把未命中的任务交给底层 TTS 并发合成
+
+        Args:
+            items: 任务列表，每项为 {"text", "output_path", "config"(可选)}
+
+        Returns:
+            list: 与 items 顺序一致的结果（结构同 AliyunTTS.synthesize_many）
+        """
+        results = [None] * len(items)
+        misses, keys = [], []
+        for i, item in enumerate(items):
+            key = cache_key(item["text"], item.get("config"), self.backend)
+            cached = self.cache.get(key, item["output_path"])
+            if cached is not None:
+                results[i] = {"ok": True, **cached}
+                with self._session_lock:
+                    self.session["hits"] += 1
+                    self.session["characters_saved"] += cached["character_count"]
+            else:
+                misses.append(i)
+                keys.append(key)
+
+        if misses:
+            synthesized = self.tts.synthesize_many(
+                [items[i] for i in misses], max_concurrency=max_concurrency, qps=qps
+            )
+            for i, key, result in zip(misses, keys, synthesized):
+                results[i] = result
+                if not result.get("ok"):
+                    continue
+                self._store(key, result)
+                with self._session_lock:
+                    self.session["misses"] += 1
+                    self.session["characters_billed"] += result.get("character_count", 0)
+
+        self.cache.flush()
+        return results
+
+    def session_stats(self, rate_per_10k_chars: float = DEFAULT_RATE_PER_10K_CHARS) -> dict:
+        """本次运行的缓存统计"""
+        saved = self.session["characters_saved"]
+        return {
+            **self.session,
+            "cost_saved_cny": round(saved / 10000 * rate_per_10k_chars, 2),
+        }
@@ -0,0 +1,399 @@
+"""
+LessonFlowAI - Storyboard 验证
+
+进程内的验证库：
+- JSON Schema 验证器按 schema 路径 + 修改时间缓存，同一进程内只编译一次
+- 业务规则单次遍历检查，返回结构化诊断与统计信息
+- 支持一次验证多个文件（路径、glob、目录），可选多进程并行
+- validate_tree() 扫描整个课程目录，按文件类型选择 schema，逐文件计时
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from jsonschema import Draft7Validator
+
+from lessonflow import SCHEMA_DIR
+
+# 默认 storyboard schema
+STORYBOARD_SCHEMA = SCHEMA_DIR / "storyboard.schema.json"
+
+# 各类文档使用的 schema
+SCHEMAS = {
+    "storyboard": STORYBOARD_SCHEMA,
+    "glossary": SCHEMA_DIR / "glossary.schema.json",
+    "style_guide": SCHEMA_DIR / "style_guide.schema.json",
+}
+
+# 扫描课程目录时跳过的目录（渲染与合成产物）
+SKIP_DIRS = {"media", "renders", "audio", "segments", "final", "subs", "__pycache__"}
+
+# 已编译的验证器: schema 绝对路径 -> (mtime_ns, 验证器)
+_VALIDATOR_CACHE = {}
+_VALIDATOR_LOCK = threading.Lock()
+
+
+@dataclass
+class Diagnostic:
+    """单条验证结果"""
+    rule: str  # json / schema / duration / duplicate_id / arrow_ref / animation_target / must_show
+    message: str
+    scene_id: str = None
+    path: str = None  # JSON 路径
+    severity: str = "error"
+
+    def __str__(self) -> str:
+        return self.message
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def load_json(path: Path) -> dict:
+    """加载 JSON 文件"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def get_validator(schema_path: Path = None) -> Draft7Validator:
+    """
+    获取编译好的 JSON Schema 验证器
+
+    schema 文件修改后（mtime 变化）自动重新编译。
+    """
+    path = Path(schema_path or STORYBOARD_SCHEMA).resolve()
+    mtime = path.stat().st_mtime_ns
+    with _VALIDATOR_LOCK:
+        cached = _VALIDATOR_CACHE.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+    validator = Draft7Validator(load_json(path))
+    with _VALIDATOR_LOCK:
+        _VALIDATOR_CACHE[path] = (mtime, validator)
+    return validator
+
+
+def check_business_rules(storyboard: dict) -> tuple:
+    """
+    单次遍历验证业务规则
+
+    场景 ID 计数、元素 ID 集合在遍历中一次建立，
+    箭头引用、动画目标、must_show 与总时长在同一次遍历中检查。
+
+    Returns:
+        tuple: (诊断列表, 统计信息)
+    """
+    meta = storyboard.get("meta", {})
+    scenes = storyboard.get("scenes", [])
+
+    scene_diagnostics = []
+    scene_id_counts = Counter()
+    total_duration = 0
+    total_elements = 0
+    total_steps = 0
+
+    for index, scene in enumerate(scenes):
+        scene_id = scene.get("id", "unknown")
+        scene_path = f"$.scenes[{index}]"
+        scene_id_counts[scene.get("id")] += 1
+        total_duration += scene.get("duration_s", 0)
+
+        elements = scene.get("visual", {}).get("elements", [])
+        element_ids = {e.get("id") for e in elements}
+        total_elements += len(elements)
+
+        # 规则 3: 检查箭头引用
+        for elem_index, elem in enumerate(elements):
+            if elem.get("type") != "arrow":
+                continue
+            for key in ("from", "to"):
+                ref = elem.get(key)
+                if ref and ref not in element_ids:
+                    scene_diagnostics.append(Diagnostic(
+                        "arrow_ref",
+                        f"场景 {scene_id}: 箭头 '{elem.get('id')}' 引用了不存在的元素 '{ref}'",
+                        scene_id=scene_id,
+                        path=f"{scene_path}.visual.elements[{elem_index}].{key}",
+                    ))
+
+        # 规则 3: 检查动画目标
+        steps = scene.get("animation", {}).get("steps", [])
+        total_steps += len(steps)
+        for step_index, step in enumerate(steps):
+            if step.get("action") == "wait":
+                continue
+            targets = step.get("target", [])
+            if isinstance(targets, str):
+                targets = [targets]
+            for target in targets:
+                if target not in element_ids:
+                    scene_diagnostics.append(Diagnostic(
+                        "animation_target",
+                        f"场景 {scene_id}: 动画引用了不存在的元素 '{target}'",
+                        scene_id=scene_id,
+                        path=f"{scene_path}.animation.steps[{step_index}].target",
+                    ))
+
+        # 规则 4: 检查 must_show 元素
+        for elem_id in scene.get("checks", {}).get("must_show", []):
+            if elem_id not in element_ids:
+                scene_diagnostics.append(Diagnostic(
+                    "must_show",
+                    f"场景 {scene_id}: must_show 包含不存在的元素 '{elem_id}'",
+                    scene_id=scene_id,
+                    path=f"{scene_path}.checks.must_show",
+                ))
+
+    diagnostics = []
+
+    # 规则 1: 检查总时长
+    target_duration = meta.get("duration_target_s", 180)
+    tolerance = target_duration * 0.1  # 10% 容差
+    if abs(total_duration - target_duration) > tolerance:
+        diagnostics.append(Diagnostic(
+            "duration",
+            f"总时长 ({total_duration}s) 与目标时长 ({target_duration}s) 差异超过 10%",
+            path="$.meta.duration_target_s",
+        ))
+
+    # 规则 2: 检查场景 ID 唯一性
+    duplicates = {scene_id for scene_id, count in scene_id_counts.items() if count > 1}
+    if duplicates:
+        diagnostics.append(
+            Diagnostic("duplicate_id", f"场景 ID 重复: {duplicates}", path="$.scenes")
+        )
+
+    diagnostics.extend(scene_diagnostics)
+
+    stats = {
+        "scene_count": len(scenes),
+        "total_duration_s": total_duration,
+        "total_elements": total_elements,
+        "total_steps": total_steps,
+    }
+    return diagnostics, stats
+
+
+def validate_storyboard_data(storyboard: dict, schema_path: Path = None) -> dict:
+    """
+    验证已加载的 storyboard
+
+    Returns:
+        dict: {"ok": bool, "diagnostics": [Diagnostic], "stats": dict | None}
+    """
+    try:
+        validator = get_validator(schema_path)
+    except FileNotFoundError:
+        message = f"Schema 文件不存在: {schema_path or STORYBOARD_SCHEMA}"
+        return {"ok": False, "diagnostics": [Diagnostic("schema", message)], "stats": None}
+
+    diagnostics = [
+        Diagnostic(
+            "schema", f"Schema 错误 [{error.json_path}]: {error.message}", path=error.json_path
+        )
+        for error in validator.iter_errors(storyboard)
+    ]
+    if diagnostics:
+        return {"ok": False, "diagnostics": diagnostics, "stats": None}
+
+    diagnostics, stats = check_business_rules(storyboard)
+    return {"ok": not diagnostics, "diagnostics": diagnostics, "stats": stats}
+
+
+def _load_document(path: Path) -> tuple:
+    """
+    读取 JSON 文档，读取失败时返回诊断而不是抛出异常
+
+    Returns:
+        tuple: (数据, [Diagnostic])，读取失败时数据为 None
+    """
+    try:
+        return load_json(path), []
+    except FileNotFoundError:
+        message = f"文件不存在: {path}"
+    except json.JSONDecodeError as e:
+        message = f"JSON 解析错误: {e}"
+    except (OSError, UnicodeDecodeError, ValueError) as e:
+        message = f"文件读取错误: {e}"
+    return None, [Diagnostic("json", message)]
+
+
+def validate_storyboard_file(storyboard_path: Path, schema_path: Path = None) -> dict:
+    """
+    验证 storyboard.json 文件
+
+    Returns:
+        dict: validate_storyboard_data 的结果，另含 "path"
+    """
+    storyboard, diagnostics = _load_document(storyboard_path)
+    if diagnostics:
+        result = {"ok": False, "diagnostics": diagnostics, "stats": None}
+    else:
+        result = validate_storyboard_data(storyboard, schema_path)
+    return {"path": str(storyboard_path), **result}
+
+
+def expand_paths(patterns: list, filename: str = "storyboard.json") -> list:
+    """
+    展开待验证的路径
+
+    - 文件：原样保留
+    - 目录：递归查找其中的 filename
+    - 其他：按 glob 模式展开（支持 **）
+    找不到任何匹配的模式原样保留，由验证时报告文件不存在。
+    """
+    paths = []
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            paths.extend(sorted(path.rglob(filename)))
+        elif path.is_file():
+            paths.append(path)
+        else:
+            matches = sorted(glob.glob(pattern, recursive=True))
+            if matches:
+                paths.extend(Path(m) for m in matches)
+            else:
+                paths.append(path)
+
+    # 去重并保持顺序
+    return list(dict.fromkeys(paths))
+
+
+def validate_paths(paths: list, schema_path: Path = None, workers: int = None) -> list:
+    """
+    批量验证 storyboard 文件
+
+    Args:
+        paths: 文件路径列表（可先用 expand_paths 展开）
+        schema_path: schema 路径（默认 schema/storyboard.schema.json）
+        workers: 并行进程数，None 或 1 表示在当前进程中依次验证
+
+    Returns:
+        list: 与 paths 顺序一致的 validate_storyboard_file 结果
+    """
+    if not workers or workers <= 1 or len(paths) <= 1:
+        return [validate_storyboard_file(path, schema_path) for path in paths]
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as executor:
+        return list(executor.map(
+            validate_storyboard_file, paths, [schema_path] * len(paths),
+            chunksize=max(1, len(paths) // (workers * 4)),
+        ))
+
+
+def document_kind(path: Path) -> str:
+    """按文件名判断文档类型，不需要验证的文件返回 None"""
+    path = Path(path)
+    if path.name == "storyboard.json":
+        return "storyboard"
+    if path.name == "glossary.json":
+        return "glossary"
+    if path.name == "style_guide.json" or (
+        path.suffix == ".json" and path.parent.name == "style_guides"
+    ):
+        return "style_guide"
+    return None
+
+
+def discover_documents(root: Path) -> list:
+    """
+    扫描目录树，找出所有 storyboard / glossary / style guide
+
+    单次 os.walk，跳过隐藏目录与产物目录。
+
+    Returns:
+        list: [(路径, 类型), ...]，按路径排序
+    """
+    documents = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".") and d not in SKIP_DIRS]
+        for filename in filenames:
+            path = Path(dirpath) / filename
+            kind = document_kind(path)
+            if kind:
+                documents.append((path, kind))
+    return sorted(documents)
+
+
+def validate_document(path: Path, kind: str = None) -> dict:
+    """
+    按类型验证单个文档并计时
+
+    storyboard 额外检查业务规则，其余类型只做 Schema 验证。
+
+    Returns:
+        dict: {"path", "kind", "ok", "diagnostics", "stats", "elapsed_ms"}
+    """
+    started = time.perf_counter()
+    kind = kind or document_kind(path) or "storyboard"
+
+    if kind == "storyboard":
+        result = validate_storyboard_file(path)
+    else:
+        data, diagnostics = _load_document(path)
+        if not diagnostics:
+            diagnostics = [
+                Diagnostic(
+                    "schema", f"Schema 错误 [{error.json_path}]: {error.message}",
+                    path=error.json_path,
+                )
+                for error in get_validator(SCHEMAS[kind]).iter_errors(data)
+            ]
+        result = {
+            "path": str(path), "ok": not diagnostics, "diagnostics": diagnostics, "stats": None,
+        }
+
+    return {
+        **result,
+        "kind": kind,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
+
+
+def _validate_document_args(args: tuple) -> dict:
+    return validate_document(*args)
+
+
+def validate_tree(root: Path, workers: int = None):
+    """
+    验证目录树下的所有文档
+
+    使用进程池并行验证，每个子进程各自缓存编译好的验证器；
+    结果按路径顺序逐个产出，便于边验证边写报告。
+
+    Args:
+        root: 课程根目录（如 COURSES_DIR）
+        workers: 进程数（默认 CPU 核数，1 表示在当前进程中验证）
+
+    Yields:
+        dict: validate_document 的结果
+    """
+    documents = discover_documents(root)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(documents) <= 1:
+        for document in documents:
+            yield validate_document(*document)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(documents))) as executor:
+        yield from executor.map(
+            _validate_document_args, documents,
+            chunksize=max(1, len(documents) // (workers * 8)),
+        )
+
+
+def report_line(result: dict) -> str:
+    """将验证结果序列化为一行 JSON（JSON Lines 报告）"""
+    return json.dumps(
+        {**result, "diagnostics": [d.to_dict() for d in result["diagnostics"]]},
+        ensure_ascii=False,
+    )
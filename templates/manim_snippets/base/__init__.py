@@ -3,12 +3,19 @@ LessonFlowAI - Manim 代码片段基础模块
 """
 
 from .grid_layout import GridLayoutScene, ANCHOR_POSITIONS, AnchorType
+from .mobject_cache import cached_math_tex, cached_text
+from .qa import build_qa_report, snapshot_boxes, write_qa_report
 from .style_mixin import StyleMixin, StyleConfig, STYLE_PRESETS
 
 __all__ = [
     "GridLayoutScene",
     "ANCHOR_POSITIONS",
     "AnchorType",
+    "cached_math_tex",
+    "cached_text",
+    "build_qa_report",
+    "snapshot_boxes",
+    "write_qa_report",
     "StyleMixin",
     "StyleConfig",
     "STYLE_PRESETS",
@@ -7,6 +7,12 @@ LessonFlowAI - Manim 网格布局基类
 from manim import *
 from typing import Literal
 
+from .mobject_cache import cached_math_tex, cached_text
+from .qa import (
+    boxes_to_dict, build_qa_report, check_bounds, find_overlaps,
+    snapshot_boxes, write_qa_report,
+)
+
 # 3x3 网格锚点位置定义
 GRID_ANCHORS = {
     # 行名: (y坐标)
@@ -45,6 +51,9 @@ class GridLayoutScene(Scene):
     
     所有 LessonFlowAI 生成的场景都应继承此类，
     确保元素位置可控、统一。
+    
+    dry_run_layout() 以布局模式执行 construct()：play/wait 只推进虚拟时钟
+    并直接应用动画的最终状态，不光栅化、不写视频，返回元素几何时间线与场景总时长。
     """
     
     # 默认配置
@@ -56,8 +65,14 @@ class GridLayoutScene(Scene):
     
     def setup(self):
         """场景初始化"""
-        super().setup()
         self.elements = {}  # 元素注册表，用于按 ID 查找
+        self._element_ids = {}  # id(mobject) -> 元素 ID
+        self._connector_ids = set()  # 连接元素的箭头，不参与重叠检测
+        self._shown_ids = set()  # 出现过的元素 ID（must_show 检查）
+        self.layout_mode = False  # 布局模式：不渲染帧
+        self.virtual_time = 0.0  # 布局模式下的虚拟时钟（秒）
+        self.layout_timeline = []  # 每次 play/wait 后的元素几何
+        super().setup()
         
         if self.CONFIG.get("show_grid", False):
             self._draw_grid()
@@ -89,7 +104,7 @@ class GridLayoutScene(Scene):
         # 锚点标记
         for name, pos in ANCHOR_POSITIONS.items():
             dot = Dot(pos, color=YELLOW, radius=0.05)
-            label = Text(name, font_size=12, color=GRAY).next_to(dot, DOWN, buff=0.1)
+            label = cached_text(name, font_size=12, color=GRAY).next_to(dot, DOWN, buff=0.1)
             grid_lines.add(dot, label)
         
         self.add(grid_lines)
@@ -107,6 +122,78 @@ class GridLayoutScene(Scene):
     def register_element(self, element_id: str, mobject: Mobject):
         """注册元素到查找表"""
         self.elements[element_id] = mobject
+        self._element_ids[id(mobject)] = element_id
+    
+    def add(self, *mobjects: Mobject):
+        """添加到场景，同时记录出现过的注册元素"""
+        for mobject in mobjects:
+            for member in mobject.get_family():
+                element_id = self._element_ids.get(id(member))
+                if element_id:
+                    self._shown_ids.add(element_id)
+        return super().add(*mobjects)
+    
+    def play(self, *args, **kwargs):
+        """播放动画；布局模式下直接应用最终状态并推进虚拟时钟"""
+        if not self.layout_mode:
+            return super().play(*args, **kwargs)
+        
+        kwargs.pop("subcaption", None)
+        kwargs.pop("subcaption_duration", None)
+        kwargs.pop("subcaption_offset", None)
+        animations = self.compile_animations(*args, **kwargs)
+        self.add_mobjects_from_animations(animations)
+        for animation in animations:
+            animation._setup_scene(self)
+            animation.begin()
+        for animation in animations:
+            animation.finish()
+            animation.clean_up_from_scene(self)
+        
+        run_time = self.get_run_time(animations)
+        self.update_mobjects(run_time)
+        self._advance_layout_clock("play", run_time, animations)
+    
+    def wait(self, duration: float = DEFAULT_WAIT_TIME, *args, **kwargs):
+        """等待；布局模式下只推进虚拟时钟"""
+        if not self.layout_mode:
+            return super().wait(duration, *args, **kwargs)
+        self.update_mobjects(duration)
+        self._advance_layout_clock("wait", duration)
+    
+    def _advance_layout_clock(self, event: str, duration: float, animations: list = ()):
+        """推进虚拟时钟，记录当前在场元素的几何"""
+        self.virtual_time += duration
+        on_scene = {id(m) for m in self.get_mobject_family_members()}
+        visible = {
+            element_id: mobject for element_id, mobject in self.elements.items()
+            if id(mobject) in on_scene
+        }
+        ids, boxes = snapshot_boxes(visible)
+        self.layout_timeline.append({
+            "t": round(self.virtual_time, 3),
+            "event": event,
+            "duration_s": round(duration, 3),
+            "animations": [type(animation).__name__ for animation in animations],
+            "visible": ids,
+            "boxes": boxes_to_dict(ids, boxes),
+        })
+    
+    def dry_run_layout(self) -> dict:
+        """
+        以布局模式执行场景（不渲染帧、不写文件）
+        
+        Returns:
+            dict: {"duration_s": 场景总时长, "timeline": [每次 play/wait 后的元素几何]}
+        """
+        self.setup()
+        self.layout_mode = True
+        try:
+            self.construct()
+            self.tear_down()
+        finally:
+            self.layout_mode = False
+        return {"duration_s": round(self.virtual_time, 3), "timeline": self.layout_timeline}
     
     def get_element(self, element_id: str) -> Mobject:
         """按 ID 获取元素"""
@@ -124,7 +211,7 @@ class GridLayoutScene(Scene):
     ) -> Text:
         """创建文本元素并放置到锚点"""
         font_sizes = {"small": 24, "medium": 36, "large": 48}
-        text = Text(content, font_size=font_sizes.get(size, 36), color=color)
+        text = cached_text(content, font_size=font_sizes.get(size, 36), color=color)
         self.place_at_anchor(text, anchor)
         
         if element_id:
@@ -142,7 +229,7 @@ class GridLayoutScene(Scene):
     ) -> MathTex:
         """创建 LaTeX 公式元素"""
         scale_map = {"small": 0.7, "medium": 1.0, "large": 1.3}
-        formula = MathTex(latex, color=color).scale(scale_map.get(size, 1.0))
+        formula = cached_math_tex(latex, color=color).scale(scale_map.get(size, 1.0))
         self.place_at_anchor(formula, anchor)
         
         if element_id:
@@ -171,7 +258,7 @@ class GridLayoutScene(Scene):
         group = VGroup(box)
         
         if label:
-            text = Text(label, font_size=24, color=color)
+            text = cached_text(label, font_size=24, color=color)
             text.move_to(box.get_center())
             group.add(text)
         
@@ -213,6 +300,7 @@ class GridLayoutScene(Scene):
         
         if element_id:
             self.register_element(element_id, arrow)
+            self._connector_ids.add(element_id)
         
         return arrow
     
@@ -221,63 +309,59 @@ class GridLayoutScene(Scene):
         获取所有注册元素的边界盒信息
         用于质量检测（边界检查、重叠检测）
         """
-        boxes = {}
-        for elem_id, mobject in self.elements.items():
-            boxes[elem_id] = {
-                "center": mobject.get_center().tolist(),
-                "width": mobject.width,
-                "height": mobject.height,
-                "left": mobject.get_left()[0],
-                "right": mobject.get_right()[0],
-                "top": mobject.get_top()[1],
-                "bottom": mobject.get_bottom()[1],
-            }
-        return boxes
+        ids, boxes = snapshot_boxes(self.elements)
+        return boxes_to_dict(ids, boxes)
     
     def check_bounds(self, margin: float = 0.5) -> list:
         """
         检查元素是否越界
         返回越界元素列表
         """
-        violations = []
-        screen_bounds = {
-            "left": -7 + margin,
-            "right": 7 - margin,
-            "top": 4 - margin,
-            "bottom": -4 + margin,
-        }
-        
-        for elem_id, mobject in self.elements.items():
-            if mobject.get_left()[0] < screen_bounds["left"]:
-                violations.append({"id": elem_id, "issue": "out_of_left_bound"})
-            if mobject.get_right()[0] > screen_bounds["right"]:
-                violations.append({"id": elem_id, "issue": "out_of_right_bound"})
-            if mobject.get_top()[1] > screen_bounds["top"]:
-                violations.append({"id": elem_id, "issue": "out_of_top_bound"})
-            if mobject.get_bottom()[1] < screen_bounds["bottom"]:
-                violations.append({"id": elem_id, "issue": "out_of_bottom_bound"})
-        
-        return violations
+        ids, boxes = snapshot_boxes(self.elements)
+        return check_bounds(ids, boxes, margin)
     
     def check_overlaps(self, threshold: float = 0.3) -> list:
         """
         检查元素重叠
         返回重叠元素对列表
-        """
-        overlaps = []
-        elem_ids = list(self.elements.keys())
         
-        for i, id1 in enumerate(elem_ids):
-            for id2 in elem_ids[i+1:]:
-                m1, m2 = self.elements[id1], self.elements[id2]
-                
-                # 简单的边界盒重叠检测
-                h_overlap = not (m1.get_right()[0] < m2.get_left()[0] or 
-                                m2.get_right()[0] < m1.get_left()[0])
-                v_overlap = not (m1.get_top()[1] < m2.get_bottom()[1] or 
-                                m2.get_top()[1] < m1.get_bottom()[1])
-                
-                if h_overlap and v_overlap:
-                    overlaps.append({"elements": [id1, id2], "issue": "overlap"})
+        边界盒只快照一次，按排序扫描线比较；
+        相交面积占较小元素面积的比例超过 threshold 才记为重叠。
+        """
+        ids, boxes = snapshot_boxes(self.elements)
+        return find_overlaps(ids, boxes, threshold)
+    
+    def qa_report(
+        self,
+        scene_id: str = None,
+        must_show: list = None,
+        no_overlap: bool = True,
+        bounds_check: bool = True,
+        threshold: float = 0.3
+    ) -> dict:
+        """
+        生成 QA 报告（一次快照完成越界、重叠、must_show 检查）
         
-        return overlaps
+        连接元素的箭头不参与重叠检测；must_show 要求元素注册且出现过。
+        """
+        ids, boxes = snapshot_boxes(self.elements)
+        report = build_qa_report(
+            scene_id or self.__class__.__name__,
+            ids,
+            boxes,
+            shown=self._shown_ids,
+            must_show=must_show,
+            exclude_from_overlap=self._connector_ids,
+            no_overlap=no_overlap,
+            bounds_check=bounds_check,
+            margin=self.CONFIG.get("margin", 0.5),
+            threshold=threshold,
+        )
+        if self.layout_timeline:
+            report["duration_s"] = round(self.virtual_time, 3)
+            report["timeline"] = self.layout_timeline
+        return report
+    
+    def write_qa_report(self, path: str, **kwargs) -> str:
+        """生成并写入 qa_report.json"""
+        return write_qa_report(self.qa_report(**kwargs), path)
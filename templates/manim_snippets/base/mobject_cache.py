@@ -0,0 +1,93 @@
+"""
+LessonFlowAI - Text / MathTex 构造缓存
+
+同一进程内按 (类型, 内容, 全部构造参数) 缓存构造好的 Mobject，
+命中时返回深拷贝，调用方可以自由移动、缩放、变色而不影响缓存。
+
+MathTex 需要调用 LaTeX + dvisvgm，Text 需要 Pango 排版生成 SVG；
+Manim 本身会按内容哈希把 SVG 缓存到 tex_dir / text_dir，但默认位于各自的
+media_dir 下，并行渲染的场景之间无法共享。设置 LESSONFLOW_SVG_CACHE_DIR 后，
+导入本模块时会把两者指向该目录，跨进程、跨课程复用排版结果。
+"""
+
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+from manim import MathTex, Text, config
+
+# 进程内缓存的 Mobject 数量上限
+MOBJECT_CACHE_SIZE = int(os.getenv("LESSONFLOW_MOBJECT_CACHE_SIZE", "512"))
+
+_CACHE = OrderedDict()
+_STATS = {"hits": 0, "misses": 0}
+
+
+def _freeze(value):
+    """将构造参数转换为可哈希的 key"""
+    if isinstance(value, (str, int, float, bool, type(None))):
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return repr(value)  # 颜色对象、数组等
+
+
+def cached_mobject(mobject_class, *args, **kwargs):
+    """
+    构造 Mobject（带进程内 LRU 缓存）
+
+    Returns:
+        Mobject: 缓存原型的拷贝
+    """
+    key = (mobject_class.__name__, _freeze(args), _freeze(kwargs))
+    prototype = _CACHE.get(key)
+    if prototype is None:
+        _STATS["misses"] += 1
+        prototype = mobject_class(*args, **kwargs)
+        _CACHE[key] = prototype
+        if len(_CACHE) > MOBJECT_CACHE_SIZE:
+            _CACHE.popitem(last=False)
+    else:
+        _STATS["hits"] += 1
+        _CACHE.move_to_end(key)
+    return prototype.copy()
+
+
+def cached_text(text: str, **kwargs) -> Text:
+    """带缓存的 Text（参数与 Text 相同）"""
+    return cached_mobject(Text, text, **kwargs)
+
+
+def cached_math_tex(*tex_strings: str, **kwargs) -> MathTex:
+    """带缓存的 MathTex（参数与 MathTex 相同）"""
+    return cached_mobject(MathTex, *tex_strings, **kwargs)
+
+
+def cache_info() -> dict:
+    """缓存统计"""
+    return {**_STATS, "size": len(_CACHE), "max_size": MOBJECT_CACHE_SIZE}
+
+
+def clear_cache():
+    _CACHE.clear()
+    _STATS.update(hits=0, misses=0)
+
+
+def use_svg_cache(root) -> Path:
+    """
+    将 Manim 的 Tex / Text SVG 缓存目录指向共享目录
+
+    文件名是内容哈希，多个进程写入同一文件时内容相同。
+    """
+    root = Path(root).expanduser()
+    (root / "Tex").mkdir(parents=True, exist_ok=True)
+    (root / "texts").mkdir(parents=True, exist_ok=True)
+    config.tex_dir = str(root / "Tex")
+    config.text_dir = str(root / "texts")
+    return root
+
+
+if os.getenv("LESSONFLOW_SVG_CACHE_DIR"):
+    use_svg_cache(os.environ["LESSONFLOW_SVG_CACHE_DIR"])
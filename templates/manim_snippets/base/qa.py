@@ -0,0 +1,207 @@
+"""
+LessonFlowAI - 布局质量检测
+
+将所有注册元素的边界盒一次性快照为 NumPy 数组，再在数组上做越界、重叠、
+must_show 检测并生成 qa_report.json，避免对每个元素反复调用 Mobject 的
+get_left/get_right 等方法。
+
+边界盒数组形状为 (N, 4)，列依次为 left, bottom, right, top。
+本模块只依赖 NumPy，不依赖 Manim。
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+# 边界盒数组的列
+LEFT, BOTTOM, RIGHT, TOP = range(4)
+
+
+def snapshot_boxes(elements: dict) -> tuple:
+    """
+    计算所有元素的边界盒（每个元素只读取一次点集）
+
+    Args:
+        elements: {元素ID: Mobject}
+
+    Returns:
+        tuple: (元素ID列表, (N, 4) 边界盒数组)
+    """
+    ids = list(elements.keys())
+    boxes = np.zeros((len(ids), 4))
+    for i, mobject in enumerate(elements.values()):
+        points = mobject.get_points_defining_boundary()
+        if len(points) == 0:
+            center = mobject.get_center()
+            boxes[i] = (center[0], center[1], center[0], center[1])
+            continue
+        mins = points.min(axis=0)
+        maxs = points.max(axis=0)
+        boxes[i] = (mins[0], mins[1], maxs[0], maxs[1])
+    return ids, boxes
+
+
+def find_overlaps(ids: list, boxes: np.ndarray, threshold: float = 0.3) -> list:
+    """
+    排序扫描线检测重叠
+
+    按 left 排序后，每个元素只与 left 落在其 [left, right] 区间内的后续元素比较，
+    纵向相交与重叠面积对这一批候选一次性向量化计算。
+
+    重叠比例 = 相交面积 / 两者中较小的面积，超过 threshold 才记为重叠；
+    面积为 0 的元素（如水平线、箭头）只要与其他元素相交即记为重叠。
+
+    Returns:
+        list: [{"elements": [id1, id2], "issue": "overlap", "overlap_ratio": float}, ...]
+              元素对按注册顺序排列
+    """
+    if len(ids) < 2:
+        return []
+
+    order = np.argsort(boxes[:, LEFT], kind="stable")
+    sorted_boxes = boxes[order]
+    lefts = sorted_boxes[:, LEFT]
+    widths = sorted_boxes[:, RIGHT] - sorted_boxes[:, LEFT]
+    areas = widths * (sorted_boxes[:, TOP] - sorted_boxes[:, BOTTOM])
+
+    overlaps = []
+    for i in range(len(order) - 1):
+        # 后续元素中 left <= 当前 right 的才可能横向相交
+        end = np.searchsorted(lefts, sorted_boxes[i, RIGHT], side="right")
+        if end <= i + 1:
+            continue
+        box = sorted_boxes[i]
+        candidates = sorted_boxes[i + 1:end]
+
+        width = (np.minimum(box[RIGHT], candidates[:, RIGHT])
+                 - np.maximum(box[LEFT], candidates[:, LEFT]))
+        height = (np.minimum(box[TOP], candidates[:, TOP])
+                  - np.maximum(box[BOTTOM], candidates[:, BOTTOM]))
+        intersecting = (width >= 0) & (height >= 0)
+        if not intersecting.any():
+            continue
+
+        smaller = np.minimum(areas[i], areas[i + 1:end])
+        inter = np.clip(width, 0, None) * np.clip(height, 0, None)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.where(smaller > 0, inter / smaller, 1.0)
+
+        for offset in np.nonzero(intersecting & (ratio > threshold))[0]:
+            a, b = sorted((int(order[i]), int(order[i + 1 + offset])))
+            overlaps.append((a, b, round(float(ratio[offset]), 3)))
+
+    return [
+        {"elements": [ids[a], ids[b]], "issue": "overlap", "overlap_ratio": ratio}
+        for a, b, ratio in sorted(overlaps)
+    ]
+
+
+def boxes_to_dict(ids: list, boxes: np.ndarray) -> dict:
+    """将边界盒数组转换为 {元素ID: 边界信息}（get_bounding_boxes 的返回格式）"""
+    centers = np.stack(
+        [(boxes[:, LEFT] + boxes[:, RIGHT]) / 2, (boxes[:, BOTTOM] + boxes[:, TOP]) / 2], axis=1
+    )
+    widths = boxes[:, RIGHT] - boxes[:, LEFT]
+    heights = boxes[:, TOP] - boxes[:, BOTTOM]
+    return {
+        elem_id: {
+            "center": [float(centers[i, 0]), float(centers[i, 1]), 0.0],
+            "width": float(widths[i]),
+            "height": float(heights[i]),
+            "left": float(boxes[i, LEFT]),
+            "right": float(boxes[i, RIGHT]),
+            "top": float(boxes[i, TOP]),
+            "bottom": float(boxes[i, BOTTOM]),
+        }
+        for i, elem_id in enumerate(ids)
+    }
+
+
+def check_bounds(
+    ids: list,
+    boxes: np.ndarray,
+    margin: float = 0.5,
+    frame_width: float = 14.0,
+    frame_height: float = 8.0,
+) -> list:
+    """
+    向量化越界检查（画面中心为原点）
+
+    Returns:
+        list: [{"id": 元素ID, "issue": "out_of_<side>_bound"}, ...]，按注册顺序
+    """
+    if not ids:
+        return []
+    half_w = frame_width / 2 - margin
+    half_h = frame_height / 2 - margin
+    violations = np.stack([
+        boxes[:, LEFT] < -half_w,
+        boxes[:, RIGHT] > half_w,
+        boxes[:, TOP] > half_h,
+        boxes[:, BOTTOM] < -half_h,
+    ], axis=1)
+    sides = ("left", "right", "top", "bottom")
+    return [
+        {"id": ids[i], "issue": f"out_of_{sides[j]}_bound"}
+        for i, j in zip(*np.nonzero(violations))
+    ]
+
+
+def build_qa_report(
+    scene_id: str,
+    ids: list,
+    boxes: np.ndarray,
+    shown: set = None,
+    must_show: list = None,
+    exclude_from_overlap: set = None,
+    no_overlap: bool = True,
+    bounds_check: bool = True,
+    margin: float = 0.5,
+    threshold: float = 0.3,
+) -> dict:
+    """
+    生成场景 QA 报告
+
+    Args:
+        scene_id: 场景 ID
+        ids, boxes: snapshot_boxes 的结果
+        shown: 出现过的元素 ID（None 表示不检查是否出现，只检查是否注册）
+        must_show: 必须出现的元素 ID（storyboard checks.must_show）
+        exclude_from_overlap: 不参与重叠检测的元素（如连接两个元素的箭头）
+        no_overlap / bounds_check: 是否启用对应检查
+
+    Returns:
+        dict: 包含 passed、各项问题与元素边界盒
+    """
+    registered = set(ids)
+    missing = [
+        elem_id for elem_id in (must_show or [])
+        if elem_id not in registered or (shown is not None and elem_id not in shown)
+    ]
+
+    bounds = check_bounds(ids, boxes, margin) if bounds_check else []
+
+    overlaps = []
+    if no_overlap:
+        keep = [i for i, elem_id in enumerate(ids) if elem_id not in (exclude_from_overlap or ())]
+        overlaps = find_overlaps([ids[i] for i in keep], boxes[keep], threshold)
+
+    return {
+        "scene_id": scene_id,
+        "passed": not (missing or bounds or overlaps),
+        "element_count": len(ids),
+        "missing": missing,
+        "out_of_bounds": bounds,
+        "overlaps": overlaps,
+        "boxes": boxes_to_dict(ids, boxes),
+    }
+
+
+def write_qa_report(report: dict, path) -> str:
+    """写入 qa_report.json"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return str(path)
@@ -0,0 +1,174 @@
+"""
+LessonFlowAI - Storyboard 解释执行场景
+
+执行 lessonflow.animator 编译出的扁平操作列表（.lessonflow/ops/<scene_id>.ops.json）。
+加载时把每个操作预先绑定到对应的构造/动画函数，construct() 只按顺序调用，
+不再解析 storyboard，也不需要为每个场景生成完整的 Manim 代码。
+"""
+
+import json
+import sys
+from pathlib import Path
+
+from manim import *
+
+from .grid_layout import GridLayoutScene
+from .style_mixin import STYLE_PRESETS, StyleMixin
+
+
+class StoryboardScene(GridLayoutScene, StyleMixin):
+    """
+    Storyboard 解释执行场景
+
+    子类只需设置 ops_path（相对场景文件或绝对路径）并在 construct() 中调用 run_ops()。
+    """
+
+    ops_path: str = ""
+
+    def setup(self):
+        self.compiled = self.load_ops()
+        self.style = STYLE_PRESETS.get(self.compiled.get("style"), self.style)
+        self.camera.background_color = self.style.background
+        super().setup()
+        self.program = [self._bind(op) for op in self.compiled["ops"]]
+
+    @classmethod
+    def load_ops(cls) -> dict:
+        """读取编译结果（相对路径以场景文件所在目录为基准）"""
+        path = Path(cls.ops_path)
+        if not path.is_absolute():
+            module_file = getattr(sys.modules.get(cls.__module__), "__file__", None)
+            base = Path(module_file).parent if module_file else Path.cwd()
+            path = base / path
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def run_ops(self):
+        """按顺序执行预绑定的操作"""
+        for handler, op in self.program:
+            handler(op)
+
+    def _bind(self, op: dict) -> tuple:
+        """操作 -> (处理函数, 操作)，分派只在加载时做一次"""
+        if op["op"] == "build":
+            return self.ELEMENT_BUILDERS[op["type"]].__get__(self), op
+        if op["op"] == "wait":
+            return self._wait, op
+
+        animations = self.ACTION_BUILDERS[op["action"]].__get__(self)
+
+        def play(op):
+            mobjects = [self.get_element(target) for target in op["targets"]]
+            self.play(*animations(mobjects, op["params"]), run_time=op["run_time"])
+
+        return play, op
+
+    # ---------- 颜色 ----------
+
+    def resolve_color(self, name: str):
+        """风格颜色名（primary 等）、Manim 颜色常量名或十六进制"""
+        color = self.get_color(name)
+        if color == name and isinstance(name, str) and not name.startswith("#"):
+            return globals().get(name.upper(), name)
+        return color
+
+    # ---------- 元素构造 ----------
+
+    def _build_text(self, op: dict):
+        self.create_text(
+            op["content"], op["anchor"], op["id"], op["size"], self.resolve_color(op["color"])
+        )
+
+    def _build_formula(self, op: dict):
+        self.create_formula(
+            op["content"], op["anchor"], op["id"], op["size"], self.resolve_color(op["color"])
+        )
+
+    def _build_box(self, op: dict):
+        self.create_box(
+            op.get("label") or op.get("content"),
+            op["anchor"],
+            op["id"],
+            color=self.resolve_color(op["color"]),
+        )
+
+    def _build_circle(self, op: dict):
+        radius = {"small": 0.5, "medium": 1.0, "large": 1.5}.get(op["size"], 1.0)
+        circle = self.styled_circle(radius=radius, color_name=op["color"])
+        self.place_at_anchor(circle, op["anchor"])
+        self.register_element(op["id"], circle)
+
+    def _build_arrow(self, op: dict):
+        self.create_arrow_between(
+            op["from"],
+            op["to"],
+            op["id"],
+            color=self.resolve_color(op["color"]),
+            style="solid" if op.get("style", "solid") == "solid" else "dashed",
+        )
+
+    ELEMENT_BUILDERS = {
+        "text": _build_text,
+        "formula": _build_formula,
+        "box": _build_box,
+        "circle": _build_circle,
+        "arrow": _build_arrow,
+    }
+
+    # ---------- 动画 ----------
+
+    def _color_param(self, params: dict):
+        return self.resolve_color(params["color"]) if params.get("color") else self.style.accent
+
+    def _anim_create(self, mobjects, params):
+        return [Create(m) for m in mobjects]
+
+    def _anim_write(self, mobjects, params):
+        return [Write(m) for m in mobjects]
+
+    def _anim_fade_in(self, mobjects, params):
+        return [FadeIn(m) for m in mobjects]
+
+    def _anim_fade_out(self, mobjects, params):
+        return [FadeOut(m) for m in mobjects]
+
+    def _anim_undraw(self, mobjects, params):
+        return [Uncreate(m) for m in mobjects]
+
+    def _anim_indicate(self, mobjects, params):
+        return [Indicate(m, color=self._color_param(params)) for m in mobjects]
+
+    def _anim_highlight(self, mobjects, params):
+        return [m.animate.set_color(self._color_param(params)) for m in mobjects]
+
+    def _anim_scale(self, mobjects, params):
+        return [m.animate.scale(params.get("scale_factor", 1.2)) for m in mobjects]
+
+    def _anim_rotate(self, mobjects, params):
+        return [Rotate(m, angle=params.get("angle", PI / 2)) for m in mobjects]
+
+    def _anim_move_to(self, mobjects, params):
+        position = self.get_anchor_position(params["to_anchor"])
+        return [m.animate.move_to(position) for m in mobjects]
+
+    def _anim_transform(self, mobjects, params):
+        source, target = mobjects
+        return [ReplacementTransform(source, target)]
+
+    ACTION_BUILDERS = {
+        "create": _anim_create,
+        "draw": _anim_create,
+        "write": _anim_write,
+        "fade_in": _anim_fade_in,
+        "fade_out": _anim_fade_out,
+        "undraw": _anim_undraw,
+        "indicate": _anim_indicate,
+        "highlight": _anim_highlight,
+        "scale": _anim_scale,
+        "rotate": _anim_rotate,
+        "move_to": _anim_move_to,
+        "transform": _anim_transform,
+    }
+
+    def _wait(self, op: dict):
+        self.wait(op["run_time"])
@@ -9,6 +9,8 @@ from manim import *
 from dataclasses import dataclass
 from typing import Optional
 
+from .mobject_cache import cached_text
+
 
 @dataclass
 class StyleConfig:
@@ -137,7 +139,7 @@ class StyleMixin:
         
         text_color = self.get_color(color) if color else self.style.text_color
         
-        return Text(
+        return cached_text(
             content,
             font_size=size_map.get(style, self.style.body_size),
             font=font_map.get(style, self.style.body_font),
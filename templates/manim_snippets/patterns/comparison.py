@@ -8,6 +8,7 @@ LessonFlowAI - 对比图动画模板
 from manim import *
 from ..base.grid_layout import GridLayoutScene
 from ..base.style_mixin import StyleMixin
+from ..base.mobject_cache import cached_text
 
 
 class ComparisonScene(GridLayoutScene, StyleMixin):
@@ -92,7 +93,7 @@ class ComparisonScene(GridLayoutScene, StyleMixin):
         # 优点
         for pro in pros:
             item = VGroup(
-                Text("✓", font_size=24, color=self.get_color("secondary")),
+                cached_text("✓", font_size=24, color=self.get_color("secondary")),
                 self.styled_text(pro, style="small")
             ).arrange(RIGHT, buff=0.2)
             item.move_to([x_pos, y_offset, 0])
@@ -104,7 +105,7 @@ class ComparisonScene(GridLayoutScene, StyleMixin):
         # 缺点
         for con in cons:
             item = VGroup(
-                Text("✗", font_size=24, color=self.get_color("error")),
+                cached_text("✗", font_size=24, color=self.get_color("error")),
                 self.styled_text(con, style="small")
             ).arrange(RIGHT, buff=0.2)
             item.move_to([x_pos, y_offset, 0])
@@ -8,6 +8,7 @@ LessonFlowAI - 流程图动画模板
 from manim import *
 from ..base.grid_layout import GridLayoutScene, ANCHOR_POSITIONS
 from ..base.style_mixin import StyleMixin
+from ..base.mobject_cache import cached_text
 
 
 class FlowchartScene(GridLayoutScene, StyleMixin):
@@ -41,7 +42,7 @@ class FlowchartScene(GridLayoutScene, StyleMixin):
             stroke_width=self.style.stroke_width
         ).round_corners(self.style.corner_radius)
         
-        text = Text(
+        text = cached_text(
             label,
             font_size=24,
             color=self.style.text_color
@@ -72,7 +73,7 @@ class FlowchartScene(GridLayoutScene, StyleMixin):
             stroke_width=self.style.stroke_width
         ).rotate(PI/4)
         
-        text = Text(
+        text = cached_text(
             label,
             font_size=20,
             color=self.style.text_color
@@ -136,7 +137,7 @@ class FlowchartScene(GridLayoutScene, StyleMixin):
         result = VGroup(arrow)
         
         if label:
-            label_text = Text(
+            label_text = cached_text(
                 label,
                 font_size=18,
                 color=self.get_color("muted")
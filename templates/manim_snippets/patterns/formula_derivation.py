@@ -8,6 +8,7 @@ LessonFlowAI - 公式推导动画模板
 from manim import *
 from ..base.grid_layout import GridLayoutScene
 from ..base.style_mixin import StyleMixin
+from ..base.mobject_cache import cached_math_tex
 
 
 class FormulaDerivationScene(GridLayoutScene, StyleMixin):
@@ -28,7 +29,7 @@ class FormulaDerivationScene(GridLayoutScene, StyleMixin):
         element_id: str = None
     ) -> MathTex:
         """创建公式步骤"""
-        formula = MathTex(latex, color=self.style.text_color)
+        formula = cached_math_tex(latex, color=self.style.text_color)
         self.place_at_anchor(formula, anchor)
         if element_id:
             self.register_element(element_id, formula)
@@ -54,7 +55,7 @@ class FormulaDerivationScene(GridLayoutScene, StyleMixin):
         duration: float = None
     ) -> tuple:
         """变换公式并返回新公式对象"""
-        new_formula = MathTex(new_latex, color=self.style.text_color)
+        new_formula = cached_math_tex(new_latex, color=self.style.text_color)
         new_formula.move_to(old_formula.get_center())
         
         dur = duration or self.default_animation_duration()
@@ -116,7 +117,7 @@ class QuadraticFormulaDerivation(FormulaDerivationScene):
         # 步骤 2: 两边除以 a
         self.play(FadeOut(explanation1))
         
-        step2 = MathTex(
+        step2 = cached_math_tex(
             r"x^2 + \frac{b}{a}x + \frac{c}{a} = 0",
             color=self.style.text_color
         )
@@ -136,7 +137,7 @@ class QuadraticFormulaDerivation(FormulaDerivationScene):
         # 步骤 3: 配方
         self.play(FadeOut(explanation2))
         
-        step3 = MathTex(
+        step3 = cached_math_tex(
             r"\left(x + \frac{b}{2a}\right)^2 = \frac{b^2 - 4ac}{4a^2}",
             color=self.style.text_color
         )
@@ -156,7 +157,7 @@ class QuadraticFormulaDerivation(FormulaDerivationScene):
         # 步骤 4: 最终公式
         self.play(FadeOut(explanation3))
         
-        step4 = MathTex(
+        step4 = cached_math_tex(
             r"x = \frac{-b \pm \sqrt{b^2 - 4ac}}{2a}",
             color=self.style.text_color
         )
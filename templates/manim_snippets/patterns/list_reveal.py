@@ -8,6 +8,7 @@ LessonFlowAI - 列表逐项显示模板
 from manim import *
 from ..base.grid_layout import GridLayoutScene
 from ..base.style_mixin import StyleMixin
+from ..base.mobject_cache import cached_text
 
 
 class ListRevealScene(GridLayoutScene, StyleMixin):
@@ -45,7 +46,7 @@ class ListRevealScene(GridLayoutScene, StyleMixin):
             if bullet_style == "number":
                 bullet = self.styled_text(f"{i+1}.", style="body", color="primary")
             else:
-                bullet = Text(
+                bullet = cached_text(
                     bullet_chars.get(bullet_style, "●"),
                     font_size=24,
                     color=self.get_color("primary")
@@ -146,7 +147,7 @@ class ListRevealScene(GridLayoutScene, StyleMixin):
         item = list_group[index]
         checkbox = item[0]
         
-        checkmark = Text(
+        checkmark = cached_text(
             "✓",
             font_size=24,
             color=self.get_color("secondary")
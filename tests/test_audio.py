@@ -0,0 +1,64 @@
+import json
+import wave
+
+import numpy as np
+import pytest
+
+from lessonflow.audio import build_narration_track, lesson_slots, read_wav
+from lessonflow.timing import MAX_TEMPO
+
+SAMPLE_RATE = 16000
+
+
+def _write_tone(path, seconds: float):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    pcm = (np.sin(2 * np.pi * 440 * t) * 0.3 * 32767).astype("<i2")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm.tobytes())
+
+
+@pytest.fixture
+def lesson(tmp_path):
+    narration = {"vo_text": "旁白", "pause_before_s": 0.2, "pause_after_s": 0.3}
+    storyboard = {
+        "meta": {"title": "test"},
+        "scenes": [
+            {"id": "scene_001", "duration_s": 5, "narration": narration},
+            {"id": "scene_002", "duration_s": 5, "narration": narration},
+        ],
+    }
+    (tmp_path / "storyboard.json").write_text(json.dumps(storyboard), encoding="utf-8")
+    _write_tone(tmp_path / "audio" / "scene_001.wav", 3.0)
+    # 第二个场景的配音比画面长
+    _write_tone(tmp_path / "audio" / "scene_002.wav", 6.0)
+    return tmp_path
+
+
+def test_default_slots_make_room_for_long_narration(lesson):
+    slots = lesson_slots(lesson)
+
+    assert [slot.start_s for slot in slots] == [0.0, 5.0]
+    assert slots[1].slot_s == pytest.approx(6.5)
+
+
+def test_video_timeline_slots_follow_storyboard(lesson):
+    slots = lesson_slots(lesson, video_timeline=True)
+
+    assert [(slot.start_s, slot.slot_s) for slot in slots] == [(0.0, 5.0), (5.0, 5.0)]
+    assert slots[0].tempo == 1.0
+    assert slots[1].tempo == pytest.approx(MAX_TEMPO)
+    # 字幕时间换算：前置停顿 + 加速
+    assert slots[1].map_time(1.15) == pytest.approx(0.2 + 1.15 / MAX_TEMPO)
+
+
+def test_video_timeline_track_matches_video_length(lesson):
+    result = build_narration_track(lesson, video_timeline=True)
+    samples, rate = read_wav(lesson / "audio" / "full_lesson.wav")
+
+    assert result["duration_s"] == 10.0
+    assert len(samples) == 10 * rate
+    assert result["measured_lufs"] is not None
@@ -0,0 +1,40 @@
+import pytest
+
+from lessonflow import latex
+
+
+class _SingleStringMathTex:
+    def _get_modified_expression(self, expression):
+        return expression
+
+
+@pytest.mark.parametrize("manim_version", ["0.18.0", "0.18.1", "0.19.0"])
+def test_supported_manim_versions(monkeypatch, manim_version):
+    monkeypatch.setattr(latex, "version", lambda name: manim_version)
+    assert latex.check_manim_tex_api(_SingleStringMathTex) == manim_version
+
+
+@pytest.mark.parametrize("manim_version", ["0.17.3", "0.20.0", "1.0.0"])
+def test_unsupported_manim_version_fails_loudly(monkeypatch, manim_version):
+    monkeypatch.setattr(latex, "version", lambda name: manim_version)
+    with pytest.raises(RuntimeError, match=manim_version):
+        latex.check_manim_tex_api(_SingleStringMathTex)
+
+
+def test_missing_internal_api_fails_loudly(monkeypatch):
+    monkeypatch.setattr(latex, "version", lambda name: "0.19.0")
+    with pytest.raises(RuntimeError, match="_get_modified_expression"):
+        latex.check_manim_tex_api(object)
+
+
+def test_batch_document_puts_each_formula_on_its_own_page():
+    class Template:
+        documentclass = "\\documentclass[preview]{standalone}"
+        placeholder_text = "YourTextHere"
+        body = documentclass + "\n\\begin{document}\nYourTextHere\n\\end{document}"
+
+    document = latex._batch_document(Template, ["a^2", "b^2"])
+
+    assert document.startswith("\\documentclass[multi=lfformula,preview]{standalone}")
+    assert document.count("\\begin{lfformula}") == 2
+    assert "\\begin{align*}\na^2\n\\end{align*}" in document
@@ -0,0 +1,62 @@
+from lessonflow.schedule import schedule_scene
+from lessonflow.storyboard import Scene
+
+
+def _timestamps(text: str, char_ms: int = 200) -> list:
+    """每个字一个时间戳（毫秒）"""
+    return [
+        {"text": char, "begin_time": i * char_ms, "end_time": (i + 1) * char_ms}
+        for i, char in enumerate(text)
+    ]
+
+
+def _scene(steps: list, duration_s: float = 10.0, vo_text: str = "今天我们学习注意力机制") -> Scene:
+    return Scene.model_validate({
+        "id": "scene_001",
+        "duration_s": duration_s,
+        "visual": {"elements": [{"type": "text", "id": "t", "content": "注意力"}]},
+        "animation": {"steps": steps},
+        "narration": {"vo_text": vo_text, "pause_before_s": 0, "pause_after_s": 0.5},
+    })
+
+
+def test_scene_without_cues_ignores_narration():
+    steps = [
+        {"action": "write", "target": "t", "duration_s": 1.0},
+        {"action": "wait", "target": [], "duration_s": 2.0},
+    ]
+    scene = _scene(steps)
+    short = schedule_scene(scene, _timestamps("今天"))
+    long = schedule_scene(scene, _timestamps("今天我们学习注意力机制" * 8))
+
+    assert short == long
+    assert short["duration_s"] == 10.0
+    assert [step["duration_s"] for step in short["steps"]] == [1.0, 2.0]
+
+
+def test_cue_step_starts_when_keyword_is_spoken():
+    steps = [
+        {"action": "wait", "target": [], "duration_s": 0.5},
+        {"action": "write", "target": "t", "duration_s": 1.0, "cue": "注意力"},
+    ]
+    result = schedule_scene(_scene(steps), _timestamps("今天我们学习注意力机制"))
+
+    # 「注」是第 7 个字：1.2s 开始读出
+    assert result["cues"] == [{"step": 2, "cue": "注意力", "spoken_s": 1.2, "start_s": 1.2}]
+    assert result["steps"][0]["duration_s"] == 1.2
+    assert not result["warnings"]
+
+
+def test_scheduled_scene_never_shorter_than_storyboard():
+    steps = [{"action": "write", "target": "t", "duration_s": 1.0, "cue": "今天"}]
+    result = schedule_scene(_scene(steps, duration_s=10.0), _timestamps("今天我们"))
+
+    assert result["duration_s"] == 10.0
+
+
+def test_missing_cue_keeps_duration_and_warns():
+    steps = [{"action": "write", "target": "t", "duration_s": 1.5, "cue": "不存在"}]
+    result = schedule_scene(_scene(steps), _timestamps("今天我们"))
+
+    assert result["steps"][0]["duration_s"] == 1.5
+    assert len(result["warnings"]) == 1
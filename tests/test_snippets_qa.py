@@ -0,0 +1,86 @@
+import importlib.util
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# base/__init__.py 导入 Manim，这里只按文件加载不依赖 Manim 的 qa 模块
+_ROOT = Path(__file__).resolve().parent.parent
+_QA_PATH = _ROOT / "templates" / "manim_snippets" / "base" / "qa.py"
+_spec = importlib.util.spec_from_file_location("snippets_qa", _QA_PATH)
+qa = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(qa)
+
+
+def _brute_force(ids, boxes, threshold):
+    found = []
+    for a in range(len(ids)):
+        for b in range(a + 1, len(ids)):
+            width = min(boxes[a, 2], boxes[b, 2]) - max(boxes[a, 0], boxes[b, 0])
+            height = min(boxes[a, 3], boxes[b, 3]) - max(boxes[a, 1], boxes[b, 1])
+            if width < 0 or height < 0:
+                continue
+            areas = [(box[2] - box[0]) * (box[3] - box[1]) for box in (boxes[a], boxes[b])]
+            smaller = min(areas)
+            ratio = width * height / smaller if smaller > 0 else 1.0
+            if ratio > threshold:
+                found.append([ids[a], ids[b]])
+    return found
+
+
+def test_overlap_ratio_uses_smaller_box():
+    ids = ["title", "label"]
+    boxes = np.array([[0.0, 0.0, 4.0, 2.0], [3.0, 0.0, 5.0, 2.0]])
+
+    overlaps = qa.find_overlaps(ids, boxes, threshold=0.3)
+
+    assert overlaps == [
+        {"elements": ["title", "label"], "issue": "overlap", "overlap_ratio": 0.5}
+    ]
+    assert qa.find_overlaps(ids, boxes, threshold=0.6) == []
+
+
+def test_zero_area_elements_overlap_on_any_contact():
+    ids = ["box", "line", "far_line"]
+    boxes = np.array([
+        [0.0, 0.0, 2.0, 2.0],
+        [1.0, 1.0, 3.0, 1.0],  # 水平线穿过 box
+        [5.0, 1.0, 6.0, 1.0],
+    ])
+
+    overlaps = qa.find_overlaps(ids, boxes, threshold=0.3)
+
+    assert [o["elements"] for o in overlaps] == [["box", "line"]]
+    assert overlaps[0]["overlap_ratio"] == 1.0
+
+
+def test_pairs_are_reported_in_registration_order():
+    ids = ["right", "left"]
+    boxes = np.array([[1.0, 0.0, 3.0, 2.0], [0.0, 0.0, 2.0, 2.0]])
+
+    assert qa.find_overlaps(ids, boxes, threshold=0.3)[0]["elements"] == ["right", "left"]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_sweep_line_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    count = 60
+    lefts, bottoms = rng.uniform(-7, 7, count), rng.uniform(-4, 4, count)
+    widths, heights = rng.uniform(0, 2, count), rng.uniform(0, 1, count)
+    heights[::7] = 0  # 部分零面积元素
+    boxes = np.stack([lefts, bottoms, lefts + widths, bottoms + heights], axis=1)
+    ids = [f"e{i}" for i in range(count)]
+
+    found = [o["elements"] for o in qa.find_overlaps(ids, boxes, threshold=0.2)]
+
+    assert found == _brute_force(ids, boxes, 0.2)
+
+
+def test_check_bounds_reports_each_side():
+    ids = ["inside", "wide"]
+    boxes = np.array([[-1.0, -1.0, 1.0, 1.0], [-7.0, -1.0, 7.0, 1.0]])
+
+    assert qa.check_bounds(ids, boxes) == [
+        {"id": "wide", "issue": "out_of_left_bound"},
+        {"id": "wide", "issue": "out_of_right_bound"},
+    ]
@@ -0,0 +1,45 @@
+import re
+
+from lessonflow.subtitles import SubtitleRules, align_cues, wrap_text
+
+
+def _timestamps(tokens: list, token_ms: int = 150) -> list:
+    return [
+        {"text": token, "begin_time": i * token_ms, "end_time": (i + 1) * token_ms}
+        for i, token in enumerate(tokens)
+    ]
+
+
+def test_wrap_text_keeps_short_lines():
+    assert wrap_text("注意力机制", 18) == "注意力机制"
+
+
+def test_wrap_text_prefers_soft_break_near_middle():
+    assert wrap_text("首先计算相似度，然后做归一化处理", 10) == "首先计算相似度，\n然后做归一化处理"
+
+
+def test_wrap_text_never_splits_latin_words():
+    assert wrap_text("注意力机制是Transformer的核心。", 12) == "注意力机制是\nTransformer的核心。"
+    assert wrap_text("模型大小为 GPT4o 与 Llama3 相当", 10).count("\n") == 1
+    for text in ["注意力机制是Transformer的核心。", "使用BERTbase和RoBERTa进行对比实验"]:
+        wrapped = wrap_text(text, 8)
+        assert not re.search(r"[A-Za-z0-9]\n[A-Za-z0-9]", wrapped)
+        assert wrapped.replace("\n", "") == text
+
+
+def test_wrap_text_leaves_single_long_word():
+    assert wrap_text("Transformer", 6) == "Transformer"
+
+
+def test_align_cues_mixed_cjk_and_latin():
+    text = "注意力机制是Transformer的核心。它让模型关注重要的信息。"
+    tokens = ["注", "意", "力", "机", "制", "是", "Transformer", "的", "核", "心",
+              "它", "让", "模", "型", "关", "注", "重", "要", "的", "信", "息"]
+    cues = list(align_cues(text, _timestamps(tokens), SubtitleRules(max_line_chars=12)))
+
+    assert [cue["text"] for cue in cues] == [
+        "注意力机制是\nTransformer的核心。",
+        "它让模型关注重要的信息。",
+    ]
+    assert cues[0]["start"] == 0.0
+    assert cues[1]["start"] == 1.5
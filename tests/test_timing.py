@@ -0,0 +1,54 @@
+import pytest
+
+from lessonflow.timing import TOLERANCE_S, plan_timing
+
+
+def test_short_narration_pads_audio_and_keeps_stream_copy():
+    plan = plan_timing("scene_001", video_s=5.0, audio_s=3.0, pause_before_s=0.2,
+                       pause_after_s=0.3)
+
+    assert plan.action == "pad_audio"
+    assert (plan.target_s, plan.video_pad_s, plan.tempo) == (5.0, 0.0, 1.0)
+    assert plan.audio_pad_s == pytest.approx(1.8)
+    assert plan.video_filter() == ""
+    assert plan.audio_filter() == "adelay=200:all=1,apad=pad_dur=1.800"
+
+
+def test_near_equal_narration_trims_trailing_pause():
+    # 超出画面 30ms（小于 TOLERANCE_S）：缩短末尾停顿，不定格画面
+    plan = plan_timing("scene_001", video_s=5.0, audio_s=4.53, pause_before_s=0.2,
+                       pause_after_s=0.3)
+
+    assert 0 < 0.2 + 4.53 + 0.3 - 5.0 < TOLERANCE_S
+    assert plan.action == "none"
+    assert (plan.target_s, plan.video_pad_s, plan.tempo) == (5.0, 0.0, 1.0)
+    assert plan.audio_pad_s == pytest.approx(0.27)
+    assert plan.video_filter() == ""
+
+
+def test_slightly_long_narration_speeds_up():
+    plan = plan_timing("scene_001", video_s=5.0, audio_s=4.8, pause_before_s=0.2,
+                       pause_after_s=0.3, max_tempo=1.15)
+
+    assert plan.action == "tempo"
+    assert plan.tempo == pytest.approx(4.8 / 4.5, abs=1e-4)
+    assert (plan.target_s, plan.video_pad_s) == (5.0, 0.0)
+
+
+def test_long_narration_speeds_up_then_freezes_last_frame():
+    plan = plan_timing("scene_001", video_s=5.0, audio_s=6.0, pause_before_s=0.2,
+                       pause_after_s=0.3, max_tempo=1.15)
+
+    assert plan.action == "tempo+pad_video"
+    assert plan.tempo == 1.15
+    assert plan.target_s == pytest.approx(0.2 + 6.0 / 1.15 + 0.3, abs=1e-3)
+    assert plan.video_pad_s == pytest.approx(plan.target_s - 5.0, abs=1e-3)
+    assert plan.video_filter().startswith("tpad=stop_mode=clone")
+
+
+def test_map_time_applies_pause_and_tempo():
+    plan = plan_timing("scene_001", video_s=5.0, audio_s=6.0, pause_before_s=0.5,
+                       pause_after_s=0.0, max_tempo=1.2)
+
+    assert plan.map_time(0.0) == 0.5
+    assert plan.map_time(1.2) == pytest.approx(0.5 + 1.2 / plan.tempo)
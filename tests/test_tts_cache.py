@@ -0,0 +1,134 @@
+import multiprocessing
+import os
+import time
+
+from lessonflow.tts import OfflineTTS, TTSConfig
+from lessonflow.tts_cache import CachedTTS, TTSCache, cache_key
+
+
+def _result(tmp_path, name: str, size: int = 100) -> dict:
+    audio = tmp_path / f"{name}.wav"
+    audio.write_bytes(b"x" * size)
+    timestamps = tmp_path / f"{name}.timestamps.json"
+    timestamps.write_text('{"subtitles": []}', encoding="utf-8")
+    return {
+        "audio_path": str(audio),
+        "timestamps_path": str(timestamps),
+        "duration_ms": 1000,
+        "subtitle_count": 0,
+        "character_count": 5,
+    }
+
+
+def _key(n: int) -> str:
+    return f"{n:064x}"
+
+
+def test_hit_copies_files_and_counts(tmp_path):
+    cache = TTSCache(tmp_path / "cache")
+    cache.put(_key(1), _result(tmp_path, "a"))
+
+    assert cache.get(_key(2), str(tmp_path / "out" / "miss.wav")) is None
+    hit = cache.get(_key(1), str(tmp_path / "out" / "hit.wav"))
+    assert hit["cached"] and hit["character_count"] == 5
+    assert (tmp_path / "out" / "hit.wav").read_bytes() == b"x" * 100
+    assert (tmp_path / "out" / "hit.timestamps.json").is_file()
+
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 1)
+    assert stats["characters_saved"] == 5
+
+
+def test_hit_does_not_rewrite_index(tmp_path):
+    cache = TTSCache(tmp_path / "cache")
+    cache.put(_key(1), _result(tmp_path, "a"))
+    cache.flush()
+    before = cache.index_path.stat().st_mtime_ns if cache.index_path.exists() else None
+
+    cache.get(_key(1), str(tmp_path / "hit.wav"))
+
+    after = cache.index_path.stat().st_mtime_ns if cache.index_path.exists() else None
+    assert before == after
+
+
+def test_prune_evicts_least_recently_used(tmp_path):
+    cache = TTSCache(tmp_path / "cache")
+    for n in range(3):
+        cache.put(_key(n), _result(tmp_path, str(n)))
+    # key 0 最早写入，但最近被访问
+    old = time.time() - 100
+    for n in range(3):
+        os.utime(cache._paths(_key(n))[0], (old + n, old + n))
+    cache.get(_key(0), str(tmp_path / "hit.wav"))
+
+    removed = cache.prune(max_bytes=cache.stats()["size_bytes"] - 1)
+
+    assert removed["entries"] == 1
+    assert cache.get(_key(1), str(tmp_path / "evicted.wav")) is None
+    assert cache.get(_key(0), str(tmp_path / "kept.wav")) is not None
+
+
+def test_prune_removes_orphans(tmp_path):
+    cache = TTSCache(tmp_path / "cache")
+    cache.put(_key(1), _result(tmp_path, "a"))
+    orphan = cache._paths(_key(2))[0]
+    orphan.parent.mkdir(parents=True, exist_ok=True)
+    orphan.write_bytes(b"partial")
+
+    assert cache.prune()["orphans"] == 1
+    assert not orphan.exists()
+    assert cache.get(_key(1), str(tmp_path / "hit.wav")) is not None
+
+
+def _put_and_prune(args):
+    root, worker = args
+    cache = TTSCache(root)
+    source = root.parent / f"src{worker}"
+    source.mkdir(exist_ok=True)
+    for n in range(10):
+        key = _key(worker * 100 + n)
+        cache.put(key, _result(source, str(n)))
+        assert cache.get(key, str(source / f"out{n}.wav")) is not None
+        cache.prune()
+    cache.flush()
+
+
+def test_processes_sharing_cache_keep_each_others_entries(tmp_path):
+    root = tmp_path / "cache"
+    with multiprocessing.get_context("fork").Pool(3) as pool:
+        pool.map(_put_and_prune, [(root, worker) for worker in range(3)])
+
+    stats = TTSCache(root).stats()
+    assert stats["entries"] == 30
+    assert stats["hits"] == 30
+
+
+def test_cache_key_treats_none_as_default_config():
+    assert cache_key("你好", None) == cache_key("你好", TTSConfig())
+    assert cache_key("你好", None) != cache_key("你好", TTSConfig(speech_rate=100))
+    assert cache_key("<speak> 你好 </speak>", None) == cache_key("<speak>你好</speak>", None)
+
+
+def test_cache_key_depends_on_backend():
+    keys = {cache_key("你好", None, backend) for backend in ("aliyun", "offline", "other")}
+    assert len(keys) == 3
+
+
+def test_cache_write_failure_keeps_synthesized_results(tmp_path, monkeypatch):
+    cache = TTSCache(tmp_path / "cache")
+
+    def fail(key, result):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(cache, "put", fail)
+    tts = CachedTTS(lambda: OfflineTTS(char_ms=20), cache=cache, backend="offline")
+    items = [
+        {"text": "第一句", "output_path": str(tmp_path / "a.wav")},
+        {"text": "第二句", "output_path": str(tmp_path / "b.wav")},
+    ]
+
+    results = tts.synthesize_many(items)
+
+    assert [result["ok"] for result in results] == [True, True]
+    assert (tmp_path / "a.wav").is_file() and (tmp_path / "b.wav").is_file()
+    assert tts.synthesize("第三句", str(tmp_path / "c.wav"))["character_count"] == 3
@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+from lessonflow.validation import validate_document, validate_storyboard_data, validate_tree
+
+
+def _scene(scene_id: str) -> dict:
+    return {
+        "id": scene_id,
+        "duration_s": 15,
+        "visual": {
+            "layout": {"grid": "3x3"},
+            "elements": [{"type": "text", "id": "t", "content": "注意力"}],
+        },
+        "animation": {"steps": [{"action": "write", "target": "t", "duration_s": 1}]},
+        "narration": {"vo_text": "今天我们学习注意力机制。"},
+    }
+
+
+def _storyboard(*scene_ids) -> dict:
+    return {
+        "meta": {
+            "title": "注意力机制",
+            "duration_target_s": 30,
+            "audience": "general",
+            "language": "zh-CN",
+            "style": "tech-minimal",
+        },
+        "scenes": [_scene(scene_id) for scene_id in scene_ids],
+    }
+
+
+def _write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if isinstance(data, bytes):
+        path.write_bytes(data)
+    else:
+        path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+
+@pytest.fixture
+def courses(tmp_path):
+    _write(tmp_path / "good" / "storyboard.json", _storyboard("scene_001", "scene_002"))
+    _write(tmp_path / "good" / "glossary.json", {"terms": {}})
+    _write(tmp_path / "duplicate" / "storyboard.json", _storyboard("scene_001", "scene_001"))
+    _write(tmp_path / "broken" / "storyboard.json", b'{"meta": ')
+    _write(tmp_path / "gbk" / "storyboard.json", '{"meta": "注意"}'.encode("gbk"))
+    _write(tmp_path / "gbk" / "glossary.json", b"\xff\xfe\x00")
+    # 产物目录与隐藏目录不扫描
+    _write(tmp_path / "good" / "final" / "storyboard.json", b"not json")
+    _write(tmp_path / ".lessonflow" / "storyboard.json", b"not json")
+    return tmp_path
+
+
+def test_valid_storyboard_passes():
+    result = validate_storyboard_data(_storyboard("scene_001", "scene_002"))
+    assert result["ok"], [d.message for d in result["diagnostics"]]
+    assert result["stats"]["scene_count"] == 2
+
+
+def test_duplicate_scene_ids_are_reported():
+    result = validate_storyboard_data(_storyboard("scene_001", "scene_001"))
+    assert [d.rule for d in result["diagnostics"]] == ["duplicate_id"]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_validate_tree_reports_every_file(courses, workers):
+    results = {
+        str(r["path"])[len(str(courses)) + 1:]: r for r in validate_tree(courses, workers)
+    }
+
+    assert sorted(results) == [
+        "broken/storyboard.json",
+        "duplicate/storyboard.json",
+        "gbk/glossary.json",
+        "gbk/storyboard.json",
+        "good/glossary.json",
+        "good/storyboard.json",
+    ]
+    assert results["good/storyboard.json"]["ok"]
+    assert results["good/glossary.json"]["ok"]
+    assert [d.rule for d in results["duplicate/storyboard.json"]["diagnostics"]] == [
+        "duplicate_id"
+    ]
+    for name in ["broken/storyboard.json", "gbk/storyboard.json", "gbk/glossary.json"]:
+        assert not results[name]["ok"]
+        assert [d.rule for d in results[name]["diagnostics"]] == ["json"]
+
+
+def test_unreadable_file_is_a_diagnostic(tmp_path):
+    # 目录无法按文件读取（IsADirectoryError）
+    (tmp_path / "storyboard.json").mkdir()
+    result = validate_document(tmp_path / "storyboard.json")
+
+    assert not result["ok"]
+    assert result["diagnostics"][0].rule == "json"